@@ -46,6 +46,20 @@ PATH_BUILDINDEX = r"E:\數位專案\HPM2.0\2025-11RC\建築工程總指數251030
 # DGIS 實價成交明細
 PATH_AP = r"D:\DGIS\workbench\202510\上傳DGIS\GEOM_CTBC_RealPriceDetail.csv"
 
+# 實價明細實際用到的欄位（只解析這些欄位，並使用 parquet 快取）
+AP_COLUMNS = [
+    "DRPD_City",
+    "DRPD_ZipCode",
+    "DRPD_MainMaterial",
+    "DRPD_MainPurpose",
+    "DRPD_NoteFlag",
+    "DRPD_TotalFloorFlag",
+    "DRPD_TransFloorFlag",
+    "DRPD_TradeDate",
+    "DRPD_CompletionDate",
+    "DRPD_UnitPriceRevised",
+]
+
 # 房地分離土地拆分區資料夾
 PATH_LANDSPLIT = r"E:\數位專案\HPM2.0\2025-11RC"
 
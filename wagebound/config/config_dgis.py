@@ -12,6 +12,9 @@ from os.path import join
 DGIS_RAW_ROOT = r"D:\DGIS\原始資料"
 DGIS_WB_ROOT = r"D:\DGIS\workbench"
 
+# 實價明細 parquet 快取（不可放在「上傳DGIS」等會整包上傳的資料夾）
+PATH_REALPRICE_CACHE = join(DGIS_WB_ROOT, "_cache", "realprice")
+
 # 月份區間設定
 DATE_START = "2021-04"   # 第一個月份
 DATE_PERIODS = 38        # 月數（MS = Month Start）
@@ -28,6 +28,10 @@ from wagebound.config.config import (
     cityname_change,
     seg_price_num,
 )
+from wagebound.config.config_buildcost import AP_COLUMNS
+from wagebound.config.config_dgis import PATH_REALPRICE_CACHE
+from wagebound.utils.realprice_loader import DRPD_DATE_COLS, load_realprice
+from wagebound.utils.reference_data import REFERENCE
 
 # ----------------------------------------------------------------------
 # 參數設定
@@ -49,8 +53,6 @@ VAR2_STEP = 0.5
 START_DATE_STR = "2025-04-01"
 
 # 檔案路徑
-PATH_VARTABLE = r"E:\數位專案\HPM2.0\2025-11RC\策略系統參數表彙整_20250528.xlsx"
-PATH_BUILDINDEX = r"E:\數位專案\HPM2.0\2025-11RC\建築工程總指數251030.xlsx"
 PATH_AP = r"D:\DGIS\workbench\202510\上傳DGIS\GEOM_CTBC_RealPriceDetail.csv"
 PATH_LANDSPLIT = r"E:\數位專案\HPM2.0\2025-11RC"
 
@@ -229,9 +231,11 @@ def main():
     # -------------------------
     # 1. 讀檔
     # -------------------------
-    data_var = pd.read_excel(PATH_VARTABLE, sheet_name=None)
+    # 參數表 / 總指數走參考資料 registry（路徑見 config_buildcost，parquet 快取）
+    # registry 回傳共用物件，各 sheet 先 copy 再往下處理
+    data_var = {sheet: df.copy() for sheet, df in REFERENCE.get("vartable").items()}
 
-    data_buildindex = pd.read_excel(PATH_BUILDINDEX, sheet_name="月").rename(
+    data_buildindex = REFERENCE.get("buildindex").rename(
         columns={"統計期": "apply_date", "建築工程總指數": "buildindex"}
     )
     data_buildindex["apply_date"] = parse_roc_month(data_buildindex["apply_date"])
@@ -252,12 +256,8 @@ def main():
         columns={"Main_Material_Code": "Main_Material_Code_ref"}
     )
 
-    data_ap = pd.read_csv(
-        PATH_AP,
-        sep="|",
-        parse_dates=["DRPD_TradeDate", "DRPD_CompletionDate"],
-        low_memory=False,
-        dtype={"DRPD_ZipCode": str},
+    data_ap = load_realprice(
+        PATH_AP, columns=AP_COLUMNS, parse_dates=DRPD_DATE_COLS, cache=True, cache_dir=PATH_REALPRICE_CACHE
     )
 
     data_ctbc = pd.read_excel(join(PATH_LANDSPLIT, "ctbc_inside.xlsx"))
@@ -30,12 +30,14 @@ from wagebound.config.config_buildcost import (
     VAR2_STEP,
     SPECIAL_MIN_PRICE,
     GENERAL_MIN_PRICE,
-    PATH_VARTABLE,
-    PATH_BUILDINDEX,
     PATH_AP,
+    AP_COLUMNS,
     PATH_LANDSPLIT,
     GROUP_LEVELS,
 )
+from wagebound.config.config_dgis import PATH_REALPRICE_CACHE
+from wagebound.utils.realprice_loader import DRPD_DATE_COLS, load_realprice
+from wagebound.utils.reference_data import REFERENCE
 
 # ----------------------------------------------------------------------
 # 小工具函式區
@@ -145,11 +147,12 @@ def main():
 
     # ---- 1. 讀取資料 ----
 
-    # 策略系統變數表（多 sheet）
-    data_var = pd.read_excel(PATH_VARTABLE, sheet_name=None)
+    # 策略系統變數表（多 sheet，參考資料 registry：第一次讀 Excel，之後讀 parquet 快取）
+    # registry 回傳共用物件，各 sheet 先 copy
+    data_var = {sheet: df.copy() for sheet, df in REFERENCE.get("vartable").items()}
 
-    # 建築工程總指數
-    data_buildindex = pd.read_excel(PATH_BUILDINDEX, sheet_name="月")
+    # 建築工程總指數（registry 回傳共用物件，下面會加欄位，先 copy）
+    data_buildindex = REFERENCE.get("buildindex").copy()
     # 統計期 → apply_date（月初）
     data_buildindex["apply_date"] = (
         data_buildindex["統計期"]
@@ -183,12 +186,8 @@ def main():
     )
 
     # DGIS 成交明細
-    data_ap = pd.read_csv(
-        PATH_AP,
-        sep="|",
-        parse_dates=["DRPD_TradeDate", "DRPD_CompletionDate"],
-        dtype={"DRPD_ZipCode": str},
-        low_memory=False,
+    data_ap = load_realprice(
+        PATH_AP, columns=AP_COLUMNS, parse_dates=DRPD_DATE_COLS, cache=True, cache_dir=PATH_REALPRICE_CACHE
     )
 
     # CTBC 內部資料
@@ -14,7 +14,10 @@ DGIS AccurateEstimation 測試呼叫腳本
 """
 
 import requests
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from wagebound.utils.fast_json import loads
+from wagebound.utils.response_cache import ResponseCache, cacheable_response
 
 # ----------------------------------------------------------------------
 # 常數設定
@@ -123,6 +126,7 @@ def call_accurate_estimation(
     payload: Dict[str, Any] | None = None,
     url: str = DGIS_URL,
     timeout: int = 15,
+    cache: Optional[ResponseCache] = None,
 ) -> Dict[str, Any]:
     """
     呼叫 DGIS AccurateEstimation API，回傳 JSON 結果。
@@ -135,6 +139,8 @@ def call_accurate_estimation(
         API endpoint。
     timeout : int
         requests 的 timeout 秒數。
+    cache : ResponseCache, optional
+        回應快取（以 payload + url 為 key），命中時不呼叫 API；只寫入 Success 為真的回應。
 
     Returns
     -------
@@ -149,9 +155,18 @@ def call_accurate_estimation(
     if payload is None:
         payload = DEFAULT_PAYLOAD
 
+    if cache is not None:
+        cached = cache.get(payload, url)
+        if cached is not None:
+            return cached
+
     resp = requests.post(url, json=payload, timeout=timeout)
     resp.raise_for_status()  # 非 2xx 會丟錯，方便除錯
-    return resp.json()
+    resjson = loads(resp.content)
+
+    if cache is not None and cacheable_response(resjson):
+        cache.set(payload, resjson, url)
+    return resjson
 
 
 # ----------------------------------------------------------------------
@@ -7,14 +7,24 @@ Created on Tue Apr 16 09:24:36 2024
 用途：
 1. 讀取單筆相似度 JSON（CollateralData + Result）
 2. 展開 CompareCase → CTBC_Inside 與 LVR，整理成 3 個 sheet
-3. 每檔 JSON 輸出一份「相似度分析{檔名}.xlsx」
-4. 再將所有「相似度分析*.xlsx」統整成「相似度分析_統整.xlsx」
+3. 每檔 JSON 輸出一份「相似度分析{檔名}」（OUTPUT_FORMAT：parquet / feather 資料夾或 .xlsx）
+4. 再將所有「相似度分析*」統整成「相似度分析_統整」，EXPORT_EXCEL 時另外轉出 .xlsx
+
+aggregate_similarity_json：直接由整個資料夾的 JSON 一次統整（可多程序），
+實價旗標只在統整表上 merge 一次，逐案輸出改為選用（WRITE_CASE_OUTPUTS）。
 """
 
-import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from typing import Dict, Iterable, Optional
+
 import pandas as pd
 from os.path import join
 from wagebound.config.config import comparecase_clean, comparecase_select
+from wagebound.utils.fast_json import loads
+from wagebound.utils.frame_store import export_excel, is_frame_dir, read_frames, write_frames
+from wagebound.utils.realprice_loader import load_realprice
 from StevenTricks.io.file_utils import PathWalk_df
 
 
@@ -30,6 +40,15 @@ TEMP_PATH = r"C:\Users\z00188600\Desktop"
 # 這裡可以一次放多個檔名，例如 ["LV1", "LV2", "LV3"]
 CASE_FILES = ["LV3"]
 
+# 逐案輸出與統整的格式：excel / parquet / feather；統整檔在欄式格式時 EXPORT_EXCEL 決定是否轉出 Excel
+OUTPUT_FORMAT = "parquet"
+EXPORT_EXCEL = True
+
+# 直接由 JSON 統整時，是否仍輸出逐案的「相似度分析{檔名}」
+WRITE_CASE_OUTPUTS = False
+
+CASE_SHEETS = ("collateral", "ctbc_inside", "lvr")
+
 
 # ----------------------------------------------------------------------
 # 小工具
@@ -40,24 +59,25 @@ def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def load_actualprice(path: str) -> pd.DataFrame:
-    """讀取實價明細，只保留後面要用到的欄位。"""
-    df = pd.read_csv(path, sep="|")
-    return df[["DRPD_Number", "DRPD_SpecialTradeFlag"]].rename(
-        columns={"DRPD_Number": "Id"}
-    )
+    """讀取實價明細，只解析後面要用到的欄位（parquet 快取）。"""
+    df = load_realprice(path, columns=["DRPD_Number", "DRPD_SpecialTradeFlag"], cache=True)
+    return df.rename(columns={"DRPD_Number": "Id"})
+
+
+def merge_actualprice(lvr: pd.DataFrame, actualprice: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """接上實價的特殊交易旗標；沒有實價資料或 lvr 沒有 Id 欄（無符合案件）時原樣回傳。"""
+    if actualprice is None or "Id" not in lvr.columns:
+        return lvr
+    return lvr.merge(actualprice, on="Id", how="left")
 
 
 # ----------------------------------------------------------------------
 # 處理單一 JSON 檔案
 # ----------------------------------------------------------------------
-def process_case_json(case_name: str,
-                      temp_path: str,
-                      actualprice: pd.DataFrame) -> None:
-    """讀取單一 JSON 檔案並輸出相似度分析 Excel。"""
-
-    json_path = join(temp_path, f"{case_name}.json")
-    with open(json_path, encoding="utf-8") as f:
-        temp_data = json.load(f)
+def build_case_frames(json_path: str) -> Dict[str, pd.DataFrame]:
+    """讀取單一 JSON，回傳 collateral / ctbc_inside / lvr 三張表（尚未接實價旗標）。"""
+    with open(json_path, "rb") as f:
+        temp_data = loads(f.read())
 
     # 1. 拆出 input / output
     upload_dict = temp_data["CollateralData"]
@@ -81,62 +101,145 @@ def process_case_json(case_name: str,
     lvr = pd.DataFrame(output_dict["CompareCase"]["LVR"])
 
     # 4. 欄位名稱清理
-    collateral = rename_columns(collateral)
-    ctbc = rename_columns(ctbc)
-    lvr = rename_columns(lvr)
+    return {
+        "collateral": rename_columns(collateral),
+        "ctbc_inside": rename_columns(ctbc),
+        "lvr": rename_columns(lvr),
+    }
+
+
+def process_case_json(case_name: str,
+                      temp_path: str,
+                      actualprice: pd.DataFrame,
+                      fmt: str = OUTPUT_FORMAT) -> None:
+    """讀取單一 JSON 檔案並輸出相似度分析（fmt 為 excel 時輸出 Excel）。"""
+    frames = build_case_frames(join(temp_path, f"{case_name}.json"))
 
     # 5. 接上實價的特殊交易旗標
-    lvr = lvr.merge(actualprice, on="Id", how="left")
+    frames["lvr"] = merge_actualprice(frames["lvr"], actualprice)
+
+    # 6. 輸出（每個 JSON 一份）
+    write_frames(frames, join(temp_path, f"相似度分析{case_name}"), fmt=fmt)
 
-    # 6. 輸出 Excel（每個 JSON 一份）
-    out_path = join(temp_path, f"相似度分析{case_name}.xlsx")
-    with pd.ExcelWriter(out_path) as writer:
-        collateral.to_excel(writer, sheet_name="collateral", index=False)
-        ctbc.to_excel(writer, sheet_name="ctbc_inside", index=False)
-        lvr.to_excel(writer, sheet_name="lvr", index=False)
+    print(f"完成：ApplNo={frames['collateral']['CaseNo'].iloc[0]}, File={case_name}")
 
-    print(f"完成：ApplNo={appnbr}, File={case_name}")
+
+# ----------------------------------------------------------------------
+# 直接由 JSON 統整（不經逐案檔案）
+# ----------------------------------------------------------------------
+def _case_task(json_path: str) -> tuple:
+    """(json_path, frames, 錯誤訊息)；在 worker 內接住例外，單一檔案壞掉不影響整批。"""
+    try:
+        return json_path, build_case_frames(json_path), None
+    except Exception as e:
+        return json_path, None, f"{type(e).__name__}: {e}"
+
+
+def aggregate_similarity_json(temp_path: str,
+                              case_names: Optional[Iterable[str]] = None,
+                              actualprice: Optional[pd.DataFrame] = None,
+                              n_workers: int = 1,
+                              fmt: str = OUTPUT_FORMAT,
+                              to_excel: bool = EXPORT_EXCEL,
+                              write_cases: bool = WRITE_CASE_OUTPUTS) -> Dict[str, pd.DataFrame]:
+    """
+    一次處理 temp_path 下的案件 JSON，輸出「相似度分析_統整」並回傳三張統整表。
+
+    case_names 不給時處理資料夾內全部 *.json；n_workers > 1 時以多程序解析。
+    實價旗標在統整後的 lvr 上只 merge 一次；write_cases 為 True 時另外輸出逐案檔案。
+    """
+    if case_names is None:
+        json_paths = sorted(glob(join(temp_path, "*.json")))
+    else:
+        json_paths = [join(temp_path, f"{name}.json") for name in case_names]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_case_task, json_paths, chunksize=max(1, len(json_paths) // (4 * n_workers))))
+    else:
+        results = [_case_task(path) for path in json_paths]
+
+    parts = {sheet: [] for sheet in CASE_SHEETS}
+    for json_path, frames, error in results:
+        if error is not None:
+            print(f"略過：{json_path}（{error}）")
+            continue
+        for sheet in CASE_SHEETS:
+            parts[sheet].append(frames[sheet])
+        if write_cases:
+            case_name = os.path.splitext(os.path.basename(json_path))[0]
+            case_frames = {**frames, "lvr": merge_actualprice(frames["lvr"], actualprice)}
+            write_frames(case_frames, join(temp_path, f"相似度分析{case_name}"), fmt=fmt)
+
+    if not parts["collateral"]:
+        print("找不到任何可處理的 JSON 檔案，略過統整。")
+        return {sheet: pd.DataFrame() for sheet in CASE_SHEETS}
+
+    merged = {sheet: pd.concat(dfs, ignore_index=True) for sheet, dfs in parts.items()}
+    merged["lvr"] = merge_actualprice(merged["lvr"], actualprice)
+
+    out_path = write_frames(merged, join(temp_path, "相似度分析_統整"), fmt=fmt)
+    if fmt != "excel" and to_excel:
+        out_path = export_excel(out_path)
+    print(f"統整完成：{out_path}（{len(parts['collateral'])} 件）")
+    return merged
 
 
 # ----------------------------------------------------------------------
-# 統整所有「相似度分析*.xlsx」
+# 統整所有「相似度分析*」
 # ----------------------------------------------------------------------
+def _case_outputs(temp_path: str, include_keyword: str, exclude_keywords, fmt: str) -> list:
+    """逐案輸出的路徑：excel 為 .xlsx 檔，欄式格式為 frame_store 資料夾。"""
+    if fmt == "excel":
+        df_path = PathWalk_df(
+            temp_path,
+            fileinclude=[include_keyword],
+            fileexclude=exclude_keywords,
+        )
+        return list(df_path["path"])
+    return [
+        join(temp_path, name)
+        for name in sorted(os.listdir(temp_path))
+        if include_keyword in name
+        and not any(word in name for word in exclude_keywords)
+        and is_frame_dir(join(temp_path, name))
+    ]
+
+
 def aggregate_similarity_excels(temp_path: str,
                                 include_keyword: str = "相似度分析",
-                                exclude_keywords=None) -> None:
-    """將所有相似度分析 Excel 彙總成一份統整檔。"""
+                                exclude_keywords=None,
+                                fmt: str = OUTPUT_FORMAT,
+                                to_excel: bool = EXPORT_EXCEL) -> None:
+    """將所有相似度分析結果彙總成一份統整檔。"""
     if exclude_keywords is None:
         exclude_keywords = [".zip", "統整"]
 
-    df_path = PathWalk_df(
-        temp_path,
-        fileinclude=[include_keyword],
-        fileexclude=exclude_keywords,
-    )
-
     collateral_list = []
     ctbc_list = []
     lvr_list = []
 
-    for path_file in df_path["path"]:
-        sheets = pd.read_excel(path_file, sheet_name=None)
+    for path_file in _case_outputs(temp_path, include_keyword, exclude_keywords, fmt):
+        sheets = read_frames(path_file)
         collateral_list.append(sheets["collateral"])
         ctbc_list.append(sheets["ctbc_inside"])
         lvr_list.append(sheets["lvr"])
 
     if not collateral_list:
-        print("找不到任何『相似度分析*.xlsx』檔案，略過統整。")
+        print("找不到任何『相似度分析*』檔案，略過統整。")
         return
 
     collateral = pd.concat(collateral_list, ignore_index=True)
     case_ctbc = pd.concat(ctbc_list, ignore_index=True)
     case_lvr = pd.concat(lvr_list, ignore_index=True)
 
-    out_path = join(temp_path, "相似度分析_統整.xlsx")
-    with pd.ExcelWriter(out_path) as writer:
-        collateral.to_excel(writer, sheet_name="collateral", index=False)
-        case_ctbc.to_excel(writer, sheet_name="ctbc_inside", index=False)
-        case_lvr.to_excel(writer, sheet_name="lvr", index=False)
+    out_path = write_frames(
+        {"collateral": collateral, "ctbc_inside": case_ctbc, "lvr": case_lvr},
+        join(temp_path, "相似度分析_統整"),
+        fmt=fmt,
+    )
+    if fmt != "excel" and to_excel:
+        out_path = export_excel(out_path)
 
     print(f"統整完成：{out_path}")
 
@@ -148,11 +251,7 @@ if __name__ == "__main__":
     # 實價資料（只讀一次，後面每個 JSON 共用）
     actualprice_df = load_actualprice(ACTUALPRICE_PATH)
 
-    # 逐檔 JSON 處理
-    for case in CASE_FILES:
-        process_case_json(case_name=case,
-                          temp_path=TEMP_PATH,
-                          actualprice=actualprice_df)
-
-    # 統整所有相似度分析結果
-    aggregate_similarity_excels(TEMP_PATH)
+    # 直接由 JSON 統整（逐案檔案依 WRITE_CASE_OUTPUTS 決定是否輸出）
+    aggregate_similarity_json(TEMP_PATH,
+                              case_names=CASE_FILES,
+                              actualprice=actualprice_df)
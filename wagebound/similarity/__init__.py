@@ -1,8 +1,29 @@
 # similarity/__init__.py
 
-from .engine import run_similarity
-
-__all__ = ["run_similarity"]
+from .case_encoding import encode_collateral, encode_compare_cases, load_compare_cases
+from .collateral_index import CollateralIndex
+from .similarity_batch import score_components, similarity_caculate_batch
+from .similarity_pipeline import run_similarity_pipeline, similarity_caculate_parallel
+from .similarity_sweep import rank_change_summary, similarity_sweep
+from .similarity_topk import stream_topk, topk_per_group
+from .threshold_rule import ThresholdRule, compile_score_parameter
+
+__all__ = [
+    "CollateralIndex",
+    "ThresholdRule",
+    "compile_score_parameter",
+    "score_components",
+    "similarity_caculate_batch",
+    "similarity_sweep",
+    "rank_change_summary",
+    "topk_per_group",
+    "stream_topk",
+    "run_similarity_pipeline",
+    "similarity_caculate_parallel",
+    "encode_compare_cases",
+    "encode_collateral",
+    "load_compare_cases",
+]
 
 
 
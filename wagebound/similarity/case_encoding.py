@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+比對案件 / 擔保品欄位的精簡編碼
+
+HouseTypeCode、OutlierTxn、FloorCode、CommunityNbr、addressNearLevel ...
+原本都是 Python object 字串，每一列各存一個 str 物件，
+比較時（case_ingore、score3_community_or_alley）也是逐列做字串比較。
+這些欄位的種類很少，轉成 category 後：
+    - 記憶體：每列只剩 int8 / int16 code，字串只存一份
+    - 計分：similarity_batch 直接比 codes，'B' 地下樓層 / 998、999 樓層只對 categories 解碼一次
+
+category 欄位保留原始值（不做 strip、不轉數字），逐列版本 similarity_caculate 也能直接使用。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+# CSV 讀取時維持字串的欄位（避免 "01" → 1、"B1" 與數字混型）
+CSV_DTYPES: Dict[str, Any] = {
+    "ApplNo": str,
+    "HouseTypeCode": str,
+    "OutlierTxn": str,
+    "FloorCode": str,
+    "TotalFloorCode": str,
+    "CommunityNbr": str,
+}
+
+# 比對案件端轉 category 的欄位
+NEARCASE_CATEGORY_COLS: List[str] = [
+    "HouseTypeCode",
+    "OutlierTxn",
+    "FloorCode",
+    "TotalFloorCode",
+    "CommunityNbr",
+    "addressNearLevel",
+]
+
+# 擔保品端轉 category 的欄位
+COLLATERAL_CATEGORY_COLS: List[str] = [
+    "HouseType",
+    "HouseType_decode",
+    "FloorCode",
+    "TotalFloor",
+    "CommunityNbr",
+]
+
+# 比對案件端的數值欄位：object 字串先轉成 float，計分時不用再逐塊 to_numeric
+NEARCASE_NUMERIC_COLS: List[str] = [
+    "TimeDiffOfMonth",
+    "Distance",
+    "BuildingArea",
+    "Age",
+]
+
+
+def to_category(s: pd.Series) -> pd.Series:
+    """
+    object / string 欄位轉 category，保留原始值（'01' 與 1 仍是不同類別）。
+    已是 category 或數值欄位原樣回傳。
+    """
+    if not (s.dtype == object or isinstance(s.dtype, pd.StringDtype)):
+        return s
+    # categories 固定為 object，避免 pandas 把 '1'、1 之類的值推斷成同一型別
+    uniques = pd.unique(s.dropna())
+    return pd.Series(
+        pd.Categorical(s, categories=pd.Index(uniques, dtype=object)),
+        index=s.index,
+        name=s.name,
+    )
+
+
+def encode_columns(df: pd.DataFrame, columns: Iterable[str], copy: bool = True) -> pd.DataFrame:
+    """把 df 中存在的 columns 轉成 category（不存在的欄位略過）。"""
+    out = df.copy() if copy else df
+    for col in columns:
+        if col in out.columns:
+            out[col] = to_category(out[col])
+    return out
+
+
+def encode_compare_cases(
+    df: pd.DataFrame,
+    category_cols: Sequence[str] = NEARCASE_CATEGORY_COLS,
+    numeric_cols: Sequence[str] = NEARCASE_NUMERIC_COLS,
+    copy: bool = True,
+) -> pd.DataFrame:
+    """
+    比對案件（dfCompareCases）精簡編碼：
+        category_cols → category
+        numeric_cols  → float（無法轉換為 NaN，與計分時的 to_numeric 行為相同）
+    """
+    out = encode_columns(df, category_cols, copy=copy)
+    for col in numeric_cols:
+        if col in out.columns and out[col].dtype == object:
+            out[col] = pd.to_numeric(out[col], errors="coerce")
+    return out
+
+
+def encode_collateral(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+    """擔保品（dfCollateral）精簡編碼。"""
+    return encode_columns(df, COLLATERAL_CATEGORY_COLS, copy=copy)
+
+
+def load_compare_cases(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    讀取比對案件檔（.parquet / .csv / .pkl）並完成精簡編碼。
+    CSV 以字串讀入代碼欄位（避免 '01' → 1），再轉成 category。
+    """
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=list(columns) if columns else None)
+    elif lower.endswith(".pkl"):
+        df = pd.read_pickle(path)
+        if columns:
+            df = df[list(columns)]
+    else:
+        dtype = {k: v for k, v in CSV_DTYPES.items() if columns is None or k in columns}
+        df = pd.read_csv(path, usecols=columns, dtype=dtype)
+    return encode_compare_cases(df, copy=False)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """逐欄比較編碼前後的記憶體用量（MB）。"""
+    b = before.memory_usage(deep=True, index=False) / 1024 ** 2
+    a = after.memory_usage(deep=True, index=False) / 1024 ** 2
+    res = pd.DataFrame({"before_mb": b, "after_mb": a.reindex(b.index)})
+    res["dtype"] = after.dtypes.astype(str).reindex(res.index)
+    return res.round(3)
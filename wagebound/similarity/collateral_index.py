@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+擔保品索引（ApplNo → 擔保品資訊）
+
+原本 similarity_caculate 每一筆比對案件都做一次
+    dfCollateral[dfCollateral["ApplNo"] == NearCase["ApplNo"]].iloc[0]
+等於每筆都掃一次整張擔保品表，整體是 O(案件數 × 擔保品數)。
+
+CollateralIndex 預先以 key（預設 ApplNo，也可多欄）建好 hash 索引：
+    - lookup(key)      → 單筆查詢，給逐列版本用（取代 boolean filter）
+    - positions(df)    → 整批取位置（-1 = 找不到）
+    - contains(df)     → 整批判斷 key 是否存在（給 verify 腳本篩選用）
+    - attach(df)       → 整批把擔保品欄位對齊到 df 每一列（給批次計分用）
+同一 key 重複時保留第一筆，與 .iloc[0] 行為一致。
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+KeyType = Union[str, Sequence[str]]
+
+
+class CollateralIndex:
+    """以 ApplNo（或多欄 key）建立的擔保品 hash 索引。"""
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        key: KeyType = "ApplNo",
+        columns: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.key: List[str] = [key] if isinstance(key, str) else list(key)
+
+        frame = df.drop_duplicates(self.key, keep="first")
+        if columns is not None:
+            frame = frame[self.key + [c for c in columns if c not in self.key]]
+        # drop=False：lookup 回傳的 Series 仍帶有 key 欄位，與原本 .iloc[0] 相同
+        self.frame: pd.DataFrame = frame.set_index(self.key, drop=False)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __contains__(self, key) -> bool:
+        return key in self.frame.index
+
+    def __repr__(self) -> str:
+        return f"CollateralIndex(key={self.key}, size={len(self)})"
+
+    # ------------------------------------------------------------------
+    # 單筆
+    # ------------------------------------------------------------------
+    def lookup(self, key) -> pd.Series:
+        """取單一擔保品資訊；找不到時丟 KeyError。"""
+        return self.frame.iloc[self.frame.index.get_loc(key)]
+
+    # ------------------------------------------------------------------
+    # 整批
+    # ------------------------------------------------------------------
+    def _keys_of(self, df: pd.DataFrame, on: Optional[KeyType]):
+        cols = self.key if on is None else ([on] if isinstance(on, str) else list(on))
+        if len(cols) != len(self.key):
+            raise ValueError(f"on={cols} 與索引 key={self.key} 欄位數不一致")
+        if len(cols) == 1:
+            return df[cols[0]]
+        return pd.MultiIndex.from_frame(df[cols])
+
+    def positions(self, df: pd.DataFrame, on: Optional[KeyType] = None) -> np.ndarray:
+        """回傳 df 每一列在索引中的位置，找不到為 -1。on 可指定 df 端的 key 欄名。"""
+        return self.frame.index.get_indexer(self._keys_of(df, on))
+
+    def contains(self, df: pd.DataFrame, on: Optional[KeyType] = None) -> np.ndarray:
+        """回傳 df 每一列的 key 是否存在於索引（bool 陣列）。"""
+        return self.positions(df, on) >= 0
+
+    def attach(
+        self,
+        df: pd.DataFrame,
+        on: Optional[KeyType] = None,
+        columns: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        依 key 把擔保品欄位逐列對齊到 df，回傳與 df 同長度、RangeIndex 的 DataFrame。
+        有任何 key 找不到時丟 KeyError（與逐列版本 .iloc[0] 取不到資料時一樣會中斷）。
+        """
+        pos = self.positions(df, on)
+        if (pos < 0).any():
+            missing = pd.unique(np.asarray(self._keys_of(df, on))[pos < 0])
+            raise KeyError(f"索引中找不到 {self.key}：{list(missing[:10])}")
+
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.iloc[pos].reset_index(drop=True)
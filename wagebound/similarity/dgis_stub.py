@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+本機 DGIS AccurateEstimation 替身伺服器（測試 / 壓測用）
+
+只用標準函式庫（http.server），不需要連到 UAT：
+    - 回傳與 payload 對應的假估價結果，結構與正式 API 相同（fast_json.sample_response：
+      Success / Result.CaseNo / Result.CompareCase / PerformanceStatistic），CaseNo / CollateralNo 原樣帶回
+    - n_features  ：每筆回應 CompareCase 的 features 數
+    - latency     ：每筆回應前等待秒數
+    - fail_rate   ：回 503 的機率（驗證重試）
+    - fail_first  ：每個 CaseNo 前幾次請求固定回 503（可重現的重試情境）
+
+用法：
+    with StubDGISServer(latency=0.05, fail_rate=0.1) as server:
+        results = run_accurate_estimation_batch(payloads, url=server.url)
+        print(server.requests)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from wagebound.utils.fast_json import sample_response
+
+
+def fake_estimation(payload: Dict[str, Any], n_features: int = 10) -> Dict[str, Any]:
+    """依 payload 產生固定的假估價結果（同一 payload 結果相同），結構同正式 AccurateEstimation 回應。"""
+    coll = payload.get("CollateralData", {})
+    seed = int.from_bytes(hashlib.sha256(json.dumps(coll, sort_keys=True, default=str).encode("utf8")).digest()[:8], "big")
+    return sample_response(
+        n_features,
+        seed=seed,
+        case_no=coll.get("CaseNo"),
+        collateral_no=coll.get("CollateralNo"),
+        zip_code=coll.get("ZipCode"),
+    )
+
+
+def fake_failure(message: str = "stub failure") -> Dict[str, Any]:
+    """失敗回應（與正式 API 相同帶 Success=False / Message）。"""
+    return {"Success": False, "Message": message, "Result": None}
+
+
+class StubDGISServer:
+    """在背景執行緒啟動的假 DGIS 伺服器，port=0 時自動挑空的 port。"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        fail_first: int = 0,
+        seed: Optional[int] = 0,
+        n_features: int = 10,
+    ) -> None:
+        self.latency = latency
+        self.n_features = n_features
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.requests = 0
+        self.failures = 0
+        self._seen: Counter = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/dgis/dgisapi/AccurateEstimation"
+
+    def _should_fail(self, payload: Dict[str, Any]) -> bool:
+        case_no = payload.get("CollateralData", {}).get("CaseNo")
+        with self._lock:
+            self.requests += 1
+            self._seen[case_no] += 1
+            fail = self._seen[case_no] <= self.fail_first or self._rng.random() < self.fail_rate
+            self.failures += fail
+        return fail
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.loads(body or b"{}")
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if server._should_fail(payload):
+                    code, data = 503, fake_failure()
+                else:
+                    code, data = 200, fake_estimation(payload, server.n_features)
+
+                raw = json.dumps(data, ensure_ascii=False).encode("utf8")
+                try:
+                    self.send_response(code)
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                    self.send_header("Content-Length", str(len(raw)))
+                    self.end_headers()
+                    self.wfile.write(raw)
+                except (BrokenPipeError, ConnectionResetError):  # 用戶端已取消請求
+                    pass
+
+            def log_message(self, format, *args):  # 不輸出每筆存取紀錄
+                pass
+
+        return Handler
+
+    def start(self) -> "StubDGISServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubDGISServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+AccurateEstimation payload 樣板
+
+原本每個案件都 deepcopy(DEFAULT_PAYLOAD) 再改 CollateralData / Location，
+十萬筆 payload 光複製巢狀 dict 就要好幾分鐘。
+
+PayloadTemplate：
+    - 樣板在建立時複製一次，之後視為唯讀
+    - 每筆 payload 只重建有欄位對應的區塊（CollateralData / Location ...），
+      其餘區塊（RequestOption / LegacyItem / ParkingSpaces ...）直接共用同一個物件
+    - DataFrame 欄位依樣板預設值的型別一次轉好（"10" / 10.0 ...），缺值沿用樣板預設值；
+      字串欄位的 12.0 轉成 "12"，整數欄位遇到非整數值丟 ValueError
+    - iter_payload_bytes 只序列化有變動的區塊，未變動區塊的 JSON 先算好直接拼接
+      （有 orjson 時使用 orjson）
+
+注意：共用的子物件不可修改，需要修改時請先自行複製該區塊。
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from wagebound.similarity.SimilarityAPI import DEFAULT_PAYLOAD
+
+# 預設會依欄位名稱自動對應的區塊
+MAPPED_SECTIONS: Tuple[str, ...] = ("Location", "CollateralData")
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> bytes:
+        """序列化成 UTF-8 JSON bytes（orjson）。"""
+        return orjson.dumps(obj)
+
+except ImportError:  # pragma: no cover - 沒有 orjson 時退回標準庫
+
+    def dumps(obj: Any) -> bytes:
+        """序列化成 UTF-8 JSON bytes（標準庫 json）。"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+
+
+def _to_str(v: Any) -> str:
+    """字串欄位：整數值的 float 不帶 .0（有缺值的整數欄會被 pandas 轉成 float64，12 → 12.0）。"""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _to_int(v: Any) -> int:
+    """整數欄位：非整數值（2.7）丟 ValueError，不直接截斷。"""
+    if isinstance(v, float) and not v.is_integer():
+        raise ValueError(f"非整數值：{v!r}")
+    return int(v)
+
+
+def _caster(default: Any) -> Optional[Callable[[Any], Any]]:
+    """依樣板預設值的型別決定轉換函式（bool 與其他型別不轉換）。"""
+    if isinstance(default, bool):
+        return None
+    if isinstance(default, str):
+        return _to_str
+    if isinstance(default, float):
+        return float
+    if isinstance(default, int):
+        return _to_int
+    return None
+
+
+def _is_missing(v: Any) -> bool:
+    return v is None or (isinstance(v, float) and v != v)
+
+
+class PayloadTemplate:
+    """
+    以 DataFrame 欄位填入 AccurateEstimation payload。
+
+    Parameters
+    ----------
+    base : dict
+        樣板，預設為 SimilarityAPI.DEFAULT_PAYLOAD（建立時深複製一次）。
+    field_map : dict, optional
+        {DataFrame 欄位: "區塊.欄位"}，例如 {"CaseNo": "CollateralData.CaseNo"}。
+        不給時，欄位名稱與 MAPPED_SECTIONS 中的欄位同名者自動對應。
+    """
+
+    def __init__(self, base: Optional[Mapping[str, Any]] = None, field_map: Optional[Mapping[str, str]] = None) -> None:
+        self.base: Dict[str, Any] = copy.deepcopy(dict(DEFAULT_PAYLOAD if base is None else base))
+        self.field_map: Optional[Dict[str, Tuple[str, str]]] = None
+        if field_map is not None:
+            self.field_map = {col: self._split(path) for col, path in field_map.items()}
+        # 未變動區塊的 JSON 片段快取
+        self._section_bytes: Dict[str, bytes] = {k: dumps(v) for k, v in self.base.items()}
+
+    def __repr__(self) -> str:
+        return f"PayloadTemplate(sections={list(self.base)})"
+
+    # ------------------------------------------------------------------
+    # 欄位對應
+    # ------------------------------------------------------------------
+    def _split(self, path: str) -> Tuple[str, str]:
+        section, _, field = path.partition(".")
+        if not field:
+            if section not in self.base:
+                raise KeyError(f"樣板沒有欄位：{path}")
+            return section, ""
+        if not isinstance(self.base.get(section), dict):
+            raise KeyError(f"樣板沒有區塊：{section}")
+        return section, field
+
+    def resolve(self, columns) -> Dict[str, Tuple[str, str]]:
+        """回傳 {欄位: (區塊, 欄位)}；field_map 未指定時依欄位名稱自動對應。"""
+        if self.field_map is not None:
+            return {c: t for c, t in self.field_map.items() if c in columns}
+        mapping: Dict[str, Tuple[str, str]] = {}
+        for col in columns:
+            for section in MAPPED_SECTIONS:
+                if col in self.base.get(section, {}):
+                    mapping[col] = (section, col)
+                    break
+        return mapping
+
+    def _default(self, section: str, field: str) -> Any:
+        return self.base[section] if not field else self.base[section].get(field)
+
+    def _column_values(self, df: pd.DataFrame, mapping: Mapping[str, Tuple[str, str]]) -> Dict[str, List[Any]]:
+        """
+        每個欄位一次轉成 Python list，並依樣板預設值型別轉換（缺值為 None）。
+        無法轉換的值（例如整數欄位的 2.7）丟 ValueError，訊息帶欄位名稱。
+        """
+        values: Dict[str, List[Any]] = {}
+        for col, (section, field) in mapping.items():
+            cast = _caster(self._default(section, field))
+            raw = df[col].tolist()
+            if cast is None:
+                values[col] = [None if _is_missing(v) else v for v in raw]
+            else:
+                try:
+                    values[col] = [None if _is_missing(v) else cast(v) for v in raw]
+                except ValueError as e:
+                    raise ValueError(f"欄位 {col}（{section}.{field}）無法轉換：{e}") from e
+        return values
+
+    # ------------------------------------------------------------------
+    # 產生 payload
+    # ------------------------------------------------------------------
+    def build(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        """單筆：row 為 {欄位: 值}，回傳 payload dict。"""
+        mapping = self.resolve(row.keys())
+        frame = pd.DataFrame([{c: row[c] for c in mapping}])
+        return next(self.iter_payloads(frame))
+
+    def _iter_sections(self, df: pd.DataFrame) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """逐列回傳有變動的區塊 {區塊: 新 dict 或值}。"""
+        mapping = self.resolve(df.columns)
+        values = self._column_values(df, mapping)
+        by_section: Dict[str, List[Tuple[str, str]]] = {}
+        for col, (section, field) in mapping.items():
+            by_section.setdefault(section, []).append((col, field))
+
+        for i in range(len(df)):
+            changed: Dict[str, Any] = {}
+            for section, cols in by_section.items():
+                if cols[0][1] == "":  # 頂層欄位（SysType / Account ...）
+                    v = values[cols[0][0]][i]
+                    changed[section] = self.base[section] if v is None else v
+                    continue
+                updates = {field: values[col][i] for col, field in cols if values[col][i] is not None}
+                changed[section] = {**self.base[section], **updates} if updates else self.base[section]
+            yield changed
+
+    def iter_payloads(self, df: pd.DataFrame) -> Iterator[Dict[str, Any]]:
+        """逐列產生 payload dict（未變動的區塊與樣板共用同一物件）。"""
+        for changed in self._iter_sections(df):
+            yield {**self.base, **changed}
+
+    def iter_payload_bytes(self, df: pd.DataFrame) -> Iterator[bytes]:
+        """逐列產生已序列化的 JSON bytes：只序列化有變動的區塊，其餘使用快取片段。"""
+        keys = list(self.base)
+        heads = {k: dumps(k) + b":" for k in keys}
+        for changed in self._iter_sections(df):
+            parts = []
+            for k in keys:
+                v = changed.get(k, self.base[k])
+                parts.append(heads[k] + (self._section_bytes[k] if v is self.base[k] else dumps(v)))
+            yield b"{" + b",".join(parts) + b"}"
+
+
+def build_payloads(df: pd.DataFrame, field_map: Optional[Mapping[str, str]] = None, as_bytes: bool = False) -> List[Any]:
+    """
+    便利函式：DataFrame → payload list。
+    as_bytes=True 時回傳 JSON bytes（可直接交給 similarity_api_async 送出）。
+    """
+    template = PayloadTemplate(field_map=field_map)
+    it = template.iter_payload_bytes(df) if as_bytes else template.iter_payloads(df)
+    return list(it)
@@ -1,5 +1,12 @@
 from datetime import datetime
 import pandas as pd
+
+from wagebound.similarity.case_encoding import encode_collateral, encode_compare_cases
+from wagebound.similarity.collateral_index import CollateralIndex
+from wagebound.similarity.similarity_batch import similarity_caculate_batch
+from wagebound.similarity.similarity_topk import topk_per_group
+from wagebound.similarity.threshold_rule import ThresholdRule, compile_score_parameter
+
 # ----------------------------------------------------------------------
 # @Τpu
 # ----------------------------------------------------------------------
@@ -9,7 +16,10 @@ def score_by_threshold(value, rules):
     qΪeG
         rules ΦG[[threshold1, score1], [threshold2, score2], ...]
         ^ǲĤ@ value <= threshold  scoreA_h 0
+    rules YwsĶ ThresholdRuleAΤGjMd
     """
+    if isinstance(rules, ThresholdRule):
+        return rules.score(value)
     for threshold, score in rules:
         if value <= threshold:
             return score
@@ -203,8 +213,10 @@ def score7_alley(self, CollateralInfo, NearCase, similarityDict):
 # ~ȼhGۦ׭p
 # ----------------------------------------------------------------------
 def similarity_caculate(self, NearCase, similarityDict):
-    # 1. d߾O~T
-    collateral_info = self.dfCollateral[self.dfCollateral["ApplNo"] == NearCase["ApplNo"]].iloc[0]
+    # 1. d߾O~T]ApplNo hash ޥuؤ@AACi dfCollateral^
+    if getattr(self, "collateral_index", None) is None:
+        self.collateral_index = CollateralIndex(self.dfCollateral)
+    collateral_info = self.collateral_index.lookup(NearCase["ApplNo"])
 
     # 2. ư
     ignore_flag = self.case_ingore(collateral_info, NearCase)
@@ -243,42 +255,29 @@ scoreParameter_v2 = {
 }
 
 version_int = "2"
-use_score_parameter = scoreParameter_v2
+# eWhsĶ]Ƨ + ˬd^AvC / 妸piϥ
+use_score_parameter = compile_score_parameter(scoreParameter_v2)
 
-dfCompareCases_caculate = dfCompareCases.copy()
+# NX categoryGO֡A妸p codes
+dfCompareCases = encode_compare_cases(dfCompareCases)
 
-print("computing...")
-dfCompareCases_caculate[f"v{version_int}_result"] = dfCompareCases_caculate.apply(
-    lambda row: dgis.similarity_caculate(row, use_score_parameter), axis=1
-)
+# O~ޡGvC / 妸p@
+dgis.collateral_index = CollateralIndex(encode_collateral(dgis.dfCollateral))
 
-print("summarizing...")
-#  list i}WAv@ .apply(x[0]) bܦh
-result_cols = [
-    f"v{version_int}_ignore",
-    f"v{version_int}_s1_deal_datediff",
-    f"v{version_int}_s2_distance",
-    f"v{version_int}_s3_community_or_alley",
-    f"v{version_int}_s4_floor",
-    f"v{version_int}_s5_area",
-    f"v{version_int}_s6_age",
-]
-
-dfCompareCases_caculate[result_cols] = pd.DataFrame(
-    dfCompareCases_caculate[f"v{version_int}_result"].tolist(),
-    index=dfCompareCases_caculate.index,
+print("computing...")
+# VqƧ妸pG@⧹ ignore + s1~s6 + `AGPvC similarity_caculate ۦP
+dfCompareCases_caculate = dfCompareCases.join(
+    similarity_caculate_batch(dfCompareCases, dgis.collateral_index, use_score_parameter, version_int)
 )
 
-# `GӺcƥ[`
-score_cols = result_cols[1:]  # F ignore H~
-dfCompareCases_caculate[f"v{version_int}_similarity"] = dfCompareCases_caculate[
-    score_cols
-].sum(axis=1)
-
-print("sorting...")
-dfCompareCases_caculate = dfCompareCases_caculate.sort_values(
-    ["ApplNo", f"v{version_int}_similarity"], ascending=False
+print("selecting top-k...")
+# C ApplNo ue TOP_K W]P̶ZBt^AAiƧ
+# ưץ]ignore = "Y"^ѻPƦWAקKĮץ
+TOP_K = 10
+dfCompareCases_valid = dfCompareCases_caculate.loc[dfCompareCases_caculate[f"v{version_int}_ignore"] == "N"]
+dfCompareCases_top = topk_per_group(
+    dfCompareCases_valid, k=TOP_K, score_col=f"v{version_int}_similarity"
 ).reset_index(drop=True)
 
-dfCompareCases_caculate.head()
+dfCompareCases_top.head()
 datetime.now()
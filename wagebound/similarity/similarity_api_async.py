@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+DGIS AccurateEstimation 非同步批次呼叫
+
+SimilarityAPI.call_accurate_estimation 每次都是獨立的 requests.post（沒有連線重用），
+回放數萬筆 payload 時大部分時間都在等連線與回應。
+
+本模組以 asyncio + aiohttp：
+    - 共用一個 ClientSession（連線池，limit = concurrency）
+    - 同時在途的請求數固定為 concurrency，payload 可以是 generator，不會一次全部載入
+    - 每個請求各自的 timeout
+    - 連線錯誤 / timeout / 429 / 5xx 以指數退避重試，其他 4xx 不重試
+    - 依完成順序 yield 結果（index 對應輸入順序）
+    - 可搭配 ResponseCache：命中的 payload 不送出（attempts = 0），Success 為真的回應寫入快取；
+      快取讀寫在執行緒中進行，不阻塞 event loop
+
+用法（一般腳本）：
+    results = run_accurate_estimation_batch(payloads, concurrency=20)
+
+用法（Jupyter，已有 event loop）：
+    async for res in iter_accurate_estimation(payloads, concurrency=20):
+        ...
+（中途 break 時請以 contextlib.aclosing 包住，連線池才會立即關閉）
+
+本機測試可搭配 dgis_stub.StubDGISServer 取代 UAT 環境。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from wagebound.similarity.SimilarityAPI import DGIS_URL
+from wagebound.utils.fast_json import loads
+from wagebound.utils.response_cache import ResponseCache, cacheable_response
+
+# 需要重試的 HTTP 狀態碼（其餘非 2xx 直接回報錯誤）
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_DONE = object()
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("非同步批次呼叫需要安裝 aiohttp") from e
+    return aiohttp
+
+
+def _backoff_seconds(attempt: int, backoff: float) -> float:
+    """第 attempt 次重試前等待秒數：backoff × 2^(attempt-1)，加上最多 backoff 秒的隨機抖動。"""
+    return backoff * 2 ** (attempt - 1) + random.uniform(0, backoff)
+
+
+# ----------------------------------------------------------------------
+# 單筆
+# ----------------------------------------------------------------------
+async def post_with_retry(
+    session,
+    index: int,
+    payload: Union[Dict[str, Any], bytes],
+    url: str = DGIS_URL,
+    timeout: float = 15,
+    retries: int = 3,
+    backoff: float = 0.5,
+) -> Dict[str, Any]:
+    """
+    送出單筆 payload，回傳結果 dict（不丟錯，錯誤記在 error 欄位）：
+        index    : 輸入順序
+        payload  : 原始 payload（dict 或已序列化的 JSON bytes）
+        status   : 最後一次的 HTTP 狀態碼（連線失敗為 None）
+        response : 回傳 JSON（失敗為 None）
+        error    : 錯誤訊息（成功為 None）
+        attempts : 實際送出次數
+        seconds  : 含重試的總耗時
+    """
+    aiohttp = _require_aiohttp()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    start = time.perf_counter()
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+    # payload_builder 產生的 JSON bytes 直接送出，不再重新序列化
+    if isinstance(payload, (bytes, str)):
+        body = {"data": payload, "headers": {"Content-Type": "application/json"}}
+    else:
+        body = {"json": payload}
+
+    for attempt in range(1, retries + 2):
+        try:
+            async with session.post(url, timeout=client_timeout, **body) as resp:
+                status = resp.status
+                if resp.status < 300:
+                    raw = await resp.read()
+                    try:
+                        response = loads(raw)
+                    except ValueError as e:
+                        # 2xx 但內容不是合法 JSON：與非 2xx 相同記在 error，重送也不會變，不重試
+                        error = f"JSON 解析失敗（{type(e).__name__}: {e}）：{raw[:200]!r}"
+                        break
+                    return {
+                        "index": index,
+                        "payload": payload,
+                        "status": status,
+                        "response": response,
+                        "error": None,
+                        "attempts": attempt,
+                        "seconds": round(time.perf_counter() - start, 3),
+                    }
+                error = f"HTTP {resp.status}: {(await resp.text())[:200]}"
+                if resp.status not in RETRY_STATUS:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = None
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt <= retries:
+            await asyncio.sleep(_backoff_seconds(attempt, backoff))
+
+    return {
+        "index": index,
+        "payload": payload,
+        "status": status,
+        "response": None,
+        "error": error,
+        "attempts": attempt,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+# ----------------------------------------------------------------------
+# 批次
+# ----------------------------------------------------------------------
+async def iter_accurate_estimation(
+    payloads: Iterable[Dict[str, Any]],
+    url: str = DGIS_URL,
+    concurrency: int = 10,
+    timeout: float = 15,
+    retries: int = 3,
+    backoff: float = 0.5,
+    session=None,
+    cache: Optional[ResponseCache] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    依完成順序 yield 每筆 payload 的結果（格式見 post_with_retry）。
+
+    Parameters
+    ----------
+    payloads : iterable of dict
+        要送出的 payload，可為 generator（逐筆取用）。
+    url : str
+        API endpoint。
+    concurrency : int
+        同時在途的請求數，也是連線池上限。
+    timeout : float
+        單一請求（單次嘗試）的 timeout 秒數。
+    retries : int
+        失敗後最多重試次數。
+    backoff : float
+        指數退避的基準秒數。
+    session : aiohttp.ClientSession, optional
+        外部傳入的 session（不會被關閉）；不給時自行建立。
+    cache : ResponseCache, optional
+        回應快取（以 payload + url 為 key），只寫入 Success 為真的回應。
+    """
+    aiohttp = _require_aiohttp()
+    source = enumerate(payloads)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+
+    async def worker(sess) -> None:
+        # 各 worker 共用同一個 iterator：next() 之間沒有 await，不會重複取到同一筆
+        for index, payload in source:
+            # 快取是同步的磁碟讀寫（回應可達數 MB），交給執行緒，不卡住其他在途的請求
+            cached = None if cache is None else await asyncio.to_thread(cache.get, payload, url)
+            if cached is not None:
+                res = {
+                    "index": index,
+                    "payload": payload,
+                    "status": 200,
+                    "response": cached,
+                    "error": None,
+                    "attempts": 0,
+                    "seconds": 0.0,
+                }
+            else:
+                res = await post_with_retry(sess, index, payload, url, timeout, retries, backoff)
+                if cache is not None and res["error"] is None and cacheable_response(res["response"]):
+                    await asyncio.to_thread(cache.set, payload, res["response"], url)
+            await queue.put(res)
+
+    async def finish(workers) -> None:
+        try:
+            await asyncio.gather(*workers)
+        except Exception as e:  # worker 非預期錯誤交給呼叫端
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency))
+
+    workers = [asyncio.ensure_future(worker(session)) for _ in range(max(1, concurrency))]
+    finisher = asyncio.ensure_future(finish(workers))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for task in workers + [finisher]:
+            task.cancel()
+        await asyncio.gather(*workers, finisher, return_exceptions=True)
+        if own_session:
+            await session.close()
+
+
+async def collect_accurate_estimation(payloads: Iterable[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+    """收集 iter_accurate_estimation 的全部結果，依輸入順序排列。"""
+    results = [res async for res in iter_accurate_estimation(payloads, **kwargs)]
+    return sorted(results, key=lambda r: r["index"])
+
+
+def run_accurate_estimation_batch(payloads: Iterable[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+    """
+    同步介面：給一般 .py 腳本使用（Jupyter 內已有 event loop，請改用 await collect_accurate_estimation）。
+    參數同 iter_accurate_estimation。
+    """
+    return asyncio.run(collect_accurate_estimation(payloads, **kwargs))
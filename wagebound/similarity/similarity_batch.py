@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+相似度六大構面：向量化批次計分
+
+原本 similarity.py 以 DataFrame.apply(axis=1) 逐列呼叫
+case_ingore / score1_transaction_datediff ~ score6_age，
+回測時數百萬組（擔保品, 比對案件）會卡在這一步。
+
+本模組一次吃整張 dfCompareCases + scoreParameter_v2 形式的參數 dict，
+以 NumPy 陣列算出：
+    - ignore 旗標（Y=排除, N=保留）
+    - s1 交易日期 / s2 距離 / s3 社區或巷弄 / s4 樓層 / s5 坪數 / s6 屋齡
+
+計分規則與逐列版本完全一致（含 int() 轉換失敗、地下樓層 'B'、998/999 樓層等特例）。
+輸入欄位若已用 case_encoding 轉成 category，比較與解碼會直接沿用 codes / categories，
+每個不重複值只處理一次。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from wagebound.similarity.collateral_index import CollateralIndex
+from wagebound.similarity.threshold_rule import compile_score_parameter
+
+# 擔保品端需要的欄位（其餘欄位不帶進計算）
+COLLATERAL_COLS: List[str] = [
+    "HouseType",
+    "HouseType_decode",
+    "FloorCode",
+    "TotalFloor",
+    "ReCalFloorage",
+    "Age",
+    "CommunityNbr",
+]
+
+# 比對案件端需要的欄位
+NEARCASE_COLS: List[str] = [
+    "ApplNo",
+    "HouseTypeCode",
+    "OutlierTxn",
+    "FloorCode",
+    "TotalFloorCode",
+    "TimeDiffOfMonth",
+    "Distance",
+    "addressNearLevel",
+    "CommunityNbr",
+    "BuildingArea",
+    "Age",
+]
+
+# 與 similarity.py 尾段 result_cols 相同的命名
+RESULT_SUFFIX: Dict[str, str] = {
+    "ignore": "ignore",
+    "s1": "s1_deal_datediff",
+    "s2": "s2_distance",
+    "s3": "s3_community_or_alley",
+    "s4": "s4_floor",
+    "s5": "s5_area",
+    "s6": "s6_age",
+}
+
+
+# ----------------------------------------------------------------------
+# 共用小工具
+# ----------------------------------------------------------------------
+def result_columns(version_int: str = "2") -> List[str]:
+    """回傳 v{n}_ignore, v{n}_s1_deal_datediff ... v{n}_s6_age 欄位名稱。"""
+    return [f"v{version_int}_{suffix}" for suffix in RESULT_SUFFIX.values()]
+
+
+def _as_object(values) -> np.ndarray:
+    """轉成 object 陣列，讓比較運算沿用 Python 的 == / != 語意。"""
+    return np.asarray(values, dtype=object)
+
+
+def _is_category(values) -> bool:
+    return isinstance(getattr(values, "dtype", None), pd.CategoricalDtype)
+
+
+def _factorize(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    回傳 (codes, uniques)，缺值的 code 為 -1。
+    category 欄位直接沿用既有的 codes / categories，不再逐列 hash。
+    """
+    if _is_category(values):
+        cat = pd.Categorical(values)
+        return np.asarray(cat.codes, dtype=np.int64), np.asarray(cat.categories, dtype=object)
+    codes, uniques = pd.factorize(pd.Series(_as_object(values), dtype=object))
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _map_unique(values, func: Callable[[Any], Any], na_value: Any = None) -> np.ndarray:
+    """
+    只對「不重複值」呼叫 func，再依 factorize 的 codes 展開回原長度。
+    樓層、類型這類欄位的種類很少，比逐列呼叫快非常多。
+    缺值（None / NaN）一律回傳 na_value。
+    """
+    codes, uniques = _factorize(values)
+    mapped = np.empty(len(uniques) + 1, dtype=object)
+    mapped[:-1] = [func(u) for u in uniques]
+    mapped[-1] = na_value
+    return mapped[codes]
+
+
+def _equal(a, b) -> np.ndarray:
+    """
+    逐列 a == b（Python 語意）。
+    任一邊為 category 時，把另一邊的不重複值對到同一組 categories 後直接比 codes；
+    只有缺值或對不到的列才退回 object 比較（保留 None / NaN 的原始行為）。
+    """
+    if not _is_category(a):
+        a, b = b, a
+    if not _is_category(a):
+        return (_as_object(a) == _as_object(b)).astype(bool)
+
+    cat = pd.Categorical(a)
+    codes_a = np.asarray(cat.codes, dtype=np.int64)
+    codes, uniques = _factorize(b)
+    recode = np.append(cat.categories.get_indexer(pd.Index(uniques, dtype=object)), -1)
+    codes_b = recode[codes]
+
+    eq = (codes_a == codes_b) & (codes_a >= 0)
+    rest = np.flatnonzero((codes_a < 0) | (codes_b < 0))
+    if len(rest):
+        eq[rest] = (_as_object(a)[rest] == _as_object(b)[rest]).astype(bool)
+    return eq
+
+
+def _is_yes(x) -> bool:
+    return x == "Y"
+
+
+def _is_r1(x) -> bool:
+    return x == "R1"
+
+
+def _try_int(x) -> float:
+    """int(x) 成功回傳數值，失敗（TypeError / ValueError）回傳 NaN。"""
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _near_floor_int(x) -> float:
+    """比對案件樓層：str 後含 'B'（地下）或無法轉 int 時回傳 NaN。"""
+    s = str(x)
+    if "B" in s:
+        return np.nan
+    try:
+        return int(s)
+    except ValueError:
+        return np.nan
+
+
+def _to_float(values) -> np.ndarray:
+    return np.asarray(pd.to_numeric(pd.Series(values), errors="coerce"), dtype=float)
+
+
+def _not_in(arr: np.ndarray, codes) -> np.ndarray:
+    return ~np.isin(arr, list(codes))
+
+
+# ----------------------------------------------------------------------
+# 0 排除比對案件的規則
+# ----------------------------------------------------------------------
+def decode_near_floor(values) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    比對案件 FloorCode 只 factorize 一次，同時解出兩種樓層值：
+        floor_int   : int(x)，給樓層構面用（失敗為 NaN）
+        floor_valid : 排除規則用的樓層（含 'B' 地下樓層或 str 後無法轉 int 為 NaN）
+    998 / 999 等特殊樓層保留原值，由各構面自行判斷。
+    """
+    codes, uniques = _factorize(values)
+    floor_int = np.array([_try_int(u) for u in uniques] + [np.nan], dtype=float)
+    floor_valid = np.array([_near_floor_int(u) for u in uniques] + [np.nan], dtype=float)
+    return floor_int[codes], floor_valid[codes]
+
+
+def ignore_flags(near: pd.DataFrame, coll: pd.DataFrame, near_floor: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    case_ingore 的向量化版本，回傳 'Y' / 'N' 陣列。
+    near_floor 可傳入 decode_near_floor 的 floor_valid，避免重複解碼。
+    """
+    # 1. 建物類型不同
+    ignore = ~_equal(near["HouseTypeCode"], coll["HouseType_decode"])
+
+    # 2. 異常交易
+    ignore |= _map_unique(near["OutlierTxn"], _is_yes, na_value=False).astype(bool)
+
+    # 3. 地下樓層 / 無法轉 int / 小於 1 樓
+    if near_floor is None:
+        near_floor = decode_near_floor(near["FloorCode"])[1]
+    ignore |= np.isnan(near_floor) | (near_floor < 1)
+
+    # 4. 擔保品不在 1 樓時，排除 1 樓案件
+    #    只對前面尚未排除的列取 int(擔保品樓層)，與逐列版本相同會在格式錯誤時丟錯
+    pending = np.flatnonzero(~ignore & (near_floor == 1))
+    if len(pending):
+        coll_floor = _map_unique(
+            _as_object(coll["FloorCode"])[pending], int, na_value=None
+        )
+        if any(v is None for v in coll_floor):
+            raise ValueError("擔保品 FloorCode 有缺值，無法判斷一樓排除規則")
+        ignore[pending[coll_floor.astype(int) != 1]] = True
+
+    return np.where(ignore, "Y", "N")
+
+
+# ----------------------------------------------------------------------
+# 1 ~ 6 構面：原始特徵（與參數無關，只算一次）
+# ----------------------------------------------------------------------
+def build_features(near: pd.DataFrame, coll: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    把比對案件 / 擔保品整理成與計分參數無關的原始特徵：
+        ignore      : 'Y' / 'N'
+        is_r1       : 擔保品是否為 R1
+        month_diff  : 交易月份差
+        distance    : 距離
+        level_codes / level_uniques : addressNearLevel 的 factorize 結果
+        same_comm   : 同社區（且社區編號非空）
+        floor_diff  : |比對案件樓層 - 擔保品樓層|
+        floor_r2 / floor_r1_same / floor_r1_other : 樓層構面各分支的適用列
+        area_pct / area_zero : 坪數差異比例、擔保品坪數為 0
+        age_diff    : 屋齡差
+    多組參數（v1 / v2 / v3 ...）可共用同一份特徵，只重算查表的部分。
+    """
+    if len(near) != len(coll):
+        raise ValueError(f"near({len(near)}) 與 coll({len(coll)}) 長度不一致")
+
+    is_r1 = _map_unique(coll["HouseType"], _is_r1, na_value=False).astype(bool)
+
+    # 3. 社區 / 巷弄
+    level_codes, level_uniques = _factorize(near["addressNearLevel"])
+    same_comm = _equal(near["CommunityNbr"], coll["CommunityNbr"])
+    same_comm &= _map_unique(near["CommunityNbr"], bool, na_value=False).astype(bool)
+
+    # 4. 樓層：四個值任一無法 int() 即不給分
+    cf = _map_unique(coll["FloorCode"], _try_int, na_value=np.nan).astype(float)
+    ctf = _map_unique(coll["TotalFloor"], _try_int, na_value=np.nan).astype(float)
+    nf, near_floor = decode_near_floor(near["FloorCode"])
+    ntf = _map_unique(near["TotalFloorCode"], _try_int, na_value=np.nan).astype(float)
+    valid = ~(np.isnan(cf) | np.isnan(ctf) | np.isnan(nf) | np.isnan(ntf))
+
+    # 5. 坪數差異比例
+    collateral_area = _to_float(coll["ReCalFloorage"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        area_pct = np.abs(_to_float(near["BuildingArea"]) - collateral_area) / collateral_area
+
+    return {
+        "ignore": ignore_flags(near, coll, near_floor),
+        "is_r1": is_r1,
+        "month_diff": _to_float(near["TimeDiffOfMonth"]),
+        "distance": _to_float(near["Distance"]),
+        "level_codes": level_codes,
+        "level_uniques": level_uniques,
+        "same_comm": same_comm,
+        "floor_diff": np.abs(nf - cf),
+        # 非 R1：用樓層差距計分
+        "floor_r2": valid & ~is_r1 & _not_in(cf, (998, 999)) & _not_in(nf, (998, 999)),
+        # R1：同樓層 or 同為「其他樓」
+        "floor_r1_same": valid & is_r1 & (nf == cf) & _not_in(cf, (998, 999)),
+        "floor_r1_other": (
+            valid
+            & is_r1
+            & _not_in(cf, (1, 998, 999))
+            & (ctf != cf)
+            & (ntf != nf)
+            & _not_in(nf, (1, 998, 999))
+            & (nf > 0)
+        ),
+        "area_pct": area_pct,
+        "area_zero": collateral_area == 0,
+        "age_diff": np.abs(_to_float(near["Age"]) - _to_float(coll["Age"])),
+    }
+
+
+# ----------------------------------------------------------------------
+# 1 ~ 6 構面：依參數查表給分
+# ----------------------------------------------------------------------
+def _alley_score(level, alley_rules):
+    """與 score3_community_or_alley 的 R1 分支相同。"""
+    if level == alley_rules[0][0][0]:
+        return alley_rules[0][1]
+    elif level == alley_rules[1][0]:
+        return alley_rules[1][1]
+    elif level == alley_rules[2][0]:
+        return alley_rules[2][1]
+    return alley_rules[3][1]
+
+
+def score_features(features: Mapping[str, np.ndarray], similarityDict: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    以 build_features 的結果 + 一組參數，算出 s1 ~ s6（不含 ignore）。
+    只有查表與 np.where，單組參數的成本遠低於重新計分。
+    """
+    # 門檻型規則只編譯一次，六個構面共用
+    p = compile_score_parameter(similarityDict, validate=False)
+    is_r1 = features["is_r1"]
+    n = len(is_r1)
+
+    # 3. R1 巷弄等級只對不重複的 level 判斷一次，NaN / None 落到最後一級
+    alley_rules = p["Alley"]  # [[[3, 5000], 12], [2, 9], [1, 8], [0, 0]]
+    level_scores = np.array(
+        [_alley_score(level, alley_rules) for level in features["level_uniques"]] + [alley_rules[3][1]]
+    )
+    alley_score = level_scores[features["level_codes"]]
+    community_score = np.where(features["same_comm"], p["Community"][0][1], 0)
+
+    age_diff = features["age_diff"]
+    return {
+        "s1": p["DealMonthDiff"].scores(features["month_diff"]),
+        "s2": np.where(is_r1, p["Distance"].scores(features["distance"]), p["Distance_R2"].scores(features["distance"])),
+        "s3": np.where(is_r1, alley_score, community_score),
+        "s4": np.select(
+            [features["floor_r2"], features["floor_r1_same"], features["floor_r1_other"]],
+            [p["Floor_R2"].scores(features["floor_diff"]), np.full(n, p["Floor"][0][1]), np.full(n, p["Floor"][1][1])],
+            default=0,
+        ),
+        "s5": np.where(features["area_zero"], 0, p["Ping"].scores(features["area_pct"])),
+        "s6": np.where(is_r1, p["Age"].scores(age_diff), p["Age_R2"].scores(age_diff)),
+    }
+
+
+# ----------------------------------------------------------------------
+# 對外介面
+# ----------------------------------------------------------------------
+def score_components(
+    near: pd.DataFrame,
+    coll: pd.DataFrame,
+    similarityDict: Mapping[str, Any],
+) -> Dict[str, np.ndarray]:
+    """
+    計算 ignore 與 s1 ~ s6。
+
+    Parameters
+    ----------
+    near : DataFrame
+        比對案件（dfCompareCases），欄位見 NEARCASE_COLS。
+    coll : DataFrame
+        與 near 逐列對齊的擔保品資訊（同長度），欄位見 COLLATERAL_COLS。
+    similarityDict : dict
+        scoreParameter_v2 形式的參數。
+
+    Returns
+    -------
+    dict
+        {"ignore": array('Y'/'N'), "s1": array, ..., "s6": array}
+    """
+    features = build_features(near, coll)
+    return {"ignore": features["ignore"], **score_features(features, similarityDict)}
+
+
+def similarity_caculate_batch(
+    dfCompareCases: pd.DataFrame,
+    dfCollateral: Union[pd.DataFrame, CollateralIndex],
+    similarityDict: Mapping[str, Any],
+    version_int: str = "2",
+) -> pd.DataFrame:
+    """
+    similarity_caculate 的批次版本。
+
+    dfCollateral 可直接給擔保品 DataFrame，或重複使用已建好的 CollateralIndex
+    （多次計分 / 多個參數版本時只需建一次索引）。
+
+    回傳與 dfCompareCases 同 index 的 DataFrame，欄位為：
+        v{n}_ignore, v{n}_s1_deal_datediff, ..., v{n}_s6_age, v{n}_similarity
+    """
+    if not isinstance(dfCollateral, CollateralIndex):
+        dfCollateral = CollateralIndex(dfCollateral, columns=COLLATERAL_COLS)
+    coll = dfCollateral.attach(dfCompareCases, on="ApplNo", columns=COLLATERAL_COLS)
+    near = dfCompareCases.reset_index(drop=True)
+    scores = score_components(near, coll, similarityDict)
+
+    cols = result_columns(version_int)
+    out = pd.DataFrame(
+        {col: scores[key] for col, key in zip(cols, RESULT_SUFFIX)},
+        index=dfCompareCases.index,
+    )
+    # 總分：六個構面分數加總（不含 ignore）
+    out[f"v{version_int}_similarity"] = out[cols[1:]].sum(axis=1)
+    return out
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+分塊（out-of-core）相似度計分流程
+
+全年度回測時 dfCompareCases 本身 + v2_result list 欄位 + 展開後的副本
+會讓記憶體吃到三倍。這裡改成：
+    1. 分塊讀取比對案件（Parquet row group / CSV chunksize）
+    2. 依 ApplNo 重新切齊（同一 ApplNo 不會被切在兩塊）
+    3. 每塊用批次引擎計分（直接產生欄位，不經過 list 欄位）
+    4. 每塊寫成一個 part 檔（out_dir/part-00000.parquet ...）或附加到同一個 CSV
+
+n_workers > 1 時改用 process pool 平行計分：
+    - 以 ApplNo 切 partition，擔保品只送該 partition 用得到的列（查詢都在 worker 本地）
+    - 只送計分需要的欄位給 worker
+    - 結果依 partition 編號 / 原始列順序合併，與 n_workers=1 的輸出完全相同
+Windows 上使用多程序時，呼叫端需放在 if __name__ == "__main__": 之下。
+
+輸入需依 ApplNo 排序（或至少同一 ApplNo 連續），才能保證分塊不會切開同一擔保品；
+只做計分、不取前 K 名時，未排序也能得到正確分數。
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from os import cpu_count, makedirs, remove
+from os.path import exists, join
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from wagebound.similarity.case_encoding import CSV_DTYPES
+from wagebound.similarity.collateral_index import CollateralIndex
+from wagebound.similarity.similarity_batch import (
+    COLLATERAL_COLS,
+    NEARCASE_COLS,
+    similarity_caculate_batch,
+)
+from wagebound.similarity.similarity_topk import topk_per_group
+
+DEFAULT_CHUNKSIZE = 500_000
+
+
+# ----------------------------------------------------------------------
+# 讀取
+# ----------------------------------------------------------------------
+def read_compare_chunks(
+    path: str,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    分塊讀取比對案件檔（.parquet / .csv），一次只在記憶體保留一塊。
+    columns 可只讀需要的欄位（預設讀全部）。
+    """
+    if path.lower().endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("讀取 Parquet 需要安裝 pyarrow") from e
+
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=list(columns) if columns else None):
+            yield batch.to_pandas()
+    else:
+        dtype = {k: v for k, v in CSV_DTYPES.items() if columns is None or k in columns}
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns, dtype=dtype)
+
+
+def group_partitions(chunks: Iterable[pd.DataFrame], group_col: str = "ApplNo") -> Iterator[pd.DataFrame]:
+    """
+    把任意切法的 chunk 重新切齊到 group_col 邊界：
+    每塊最後一個 ApplNo 的資料暫留，併到下一塊再輸出。
+    """
+    carry: Optional[pd.DataFrame] = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        is_last = (chunk[group_col] == chunk[group_col].iloc[-1]).to_numpy()
+        carry = chunk.loc[is_last]
+        if (~is_last).any():
+            yield chunk.loc[~is_last].reset_index(drop=True)
+    if carry is not None and not carry.empty:
+        yield carry.reset_index(drop=True)
+
+
+# ----------------------------------------------------------------------
+# 計分 / 寫出
+# ----------------------------------------------------------------------
+def score_partition(
+    part: pd.DataFrame,
+    collateral: Union[pd.DataFrame, CollateralIndex],
+    similarityDict: Mapping[str, Any],
+    version_int: str = "2",
+    keep_cols: Optional[Sequence[str]] = None,
+    top_k: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    單一分塊計分：回傳 keep_cols（預設 NEARCASE_COLS 中存在的欄位）+ 計分結果欄位。
+    top_k 有值時每個 ApplNo 只留前 top_k 名（排除的案件 ignore = "Y" 不參與排名）。
+    """
+    if keep_cols is None:
+        keep_cols = [c for c in NEARCASE_COLS if c in part.columns]
+    scored = part[list(keep_cols)].join(
+        similarity_caculate_batch(part, collateral, similarityDict, version_int)
+    )
+    if top_k:
+        valid = scored.loc[scored[f"v{version_int}_ignore"] == "N"]
+        scored = topk_per_group(valid, k=top_k, score_col=f"v{version_int}_similarity").reset_index(drop=True)
+    return scored
+
+
+def write_part(df: pd.DataFrame, out_dir: str, part_no: int, fmt: str = "parquet") -> str:
+    """
+    寫出單一分塊：
+        parquet → out_dir/part-{part_no:05d}.parquet（每塊一檔，可直接 pd.read_parquet(out_dir)）
+        csv     → out_dir/similarity.csv（第一塊寫表頭，之後附加）
+    """
+    makedirs(out_dir, exist_ok=True)
+    if fmt == "parquet":
+        path = join(out_dir, f"part-{part_no:05d}.parquet")
+        df.to_parquet(path, index=False)
+    elif fmt == "csv":
+        path = join(out_dir, "similarity.csv")
+        first = part_no == 0 or not exists(path)
+        df.to_csv(path, mode="w" if first else "a", header=first, index=False, encoding="utf8")
+    else:
+        raise ValueError(f"不支援的輸出格式：{fmt}")
+    return path
+
+
+def clear_parts(out_dir: str) -> List[str]:
+    """
+    刪掉 out_dir 內前一次執行留下的輸出（part-*.parquet、similarity.csv），回傳刪除的檔案。
+    不刪的話，分塊數變少時舊的 part 檔會被 pd.read_parquet(out_dir) 一起讀進來。
+    """
+    removed = sorted(glob(join(out_dir, "part-*.parquet")))
+    if exists(join(out_dir, "similarity.csv")):
+        removed.append(join(out_dir, "similarity.csv"))
+    for path in removed:
+        remove(path)
+    return removed
+
+
+# ----------------------------------------------------------------------
+# 多程序
+# ----------------------------------------------------------------------
+def _collateral_subset(collateral: CollateralIndex, part: pd.DataFrame) -> pd.DataFrame:
+    """只取出 part 用得到的擔保品列（ApplNo + COLLATERAL_COLS），送給 worker。"""
+    pos = collateral.positions(part, on="ApplNo")
+    if (pos < 0).any():
+        missing = pd.unique(part["ApplNo"].to_numpy()[pos < 0])
+        raise KeyError(f"dfCollateral 找不到 ApplNo：{list(missing[:10])}")
+    cols = ["ApplNo"] + [c for c in COLLATERAL_COLS if c != "ApplNo"]
+    return collateral.frame.iloc[np.unique(pos)][cols].reset_index(drop=True)
+
+
+def _score_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """worker 端：在 partition 內建擔保品索引並計分（需為模組層級函式才能 pickle）。"""
+    start = time.perf_counter()
+    scored = score_partition(
+        task["part"],
+        CollateralIndex(task["collateral"]),
+        task["similarityDict"],
+        task["version_int"],
+        task["keep_cols"],
+        task["top_k"],
+    )
+    return {"scored": scored, "rows_in": len(task["part"]), "seconds": round(time.perf_counter() - start, 3)}
+
+
+def _ordered_map(func: Callable, tasks: Iterable, n_workers: int) -> Iterator:
+    """
+    依輸入順序回傳 func(task)。
+    n_workers <= 1 時直接在本程序執行；否則用 process pool，
+    同時在途的 task 最多 2 × n_workers 個，避免一次把所有分塊讀進記憶體。
+    """
+    if n_workers <= 1:
+        for task in tasks:
+            yield func(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        pending: deque = deque()
+        for task in tasks:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _resolve_workers(n_workers: Optional[int]) -> int:
+    return max(1, cpu_count() or 1) if n_workers is None else max(1, int(n_workers))
+
+
+def similarity_caculate_parallel(
+    dfCompareCases: pd.DataFrame,
+    dfCollateral: Union[pd.DataFrame, CollateralIndex],
+    similarityDict: Mapping[str, Any],
+    version_int: str = "2",
+    n_workers: Optional[int] = None,
+    n_partitions: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    similarity_caculate_batch 的多程序版本（記憶體內）。
+
+    ApplNo 依 factorize 代碼取餘數分到 n_partitions 個 partition（預設 4 × n_workers），
+    每個 partition 只帶 NEARCASE_COLS 與對應的擔保品列給 worker。
+    回傳值與 similarity_caculate_batch 相同（同 index、同欄位、同 dtype），
+    n_workers=1 時在本程序依相同 partition 執行，結果逐位元一致。
+    """
+    n_workers = _resolve_workers(n_workers)
+    n_partitions = n_partitions or 4 * n_workers
+
+    collateral = dfCollateral
+    if not isinstance(collateral, CollateralIndex):
+        collateral = CollateralIndex(collateral, columns=COLLATERAL_COLS)
+
+    near = dfCompareCases[[c for c in NEARCASE_COLS if c in dfCompareCases.columns]].reset_index(drop=True)
+    part_of_row = pd.factorize(near["ApplNo"])[0] % n_partitions
+    order = np.argsort(part_of_row, kind="stable")
+    bounds = np.searchsorted(part_of_row[order], np.arange(n_partitions + 1))
+
+    def tasks():
+        for i in range(n_partitions):
+            rows = order[bounds[i]:bounds[i + 1]]
+            if not len(rows):
+                continue
+            part = near.iloc[rows].reset_index(drop=True)
+            yield {
+                "part": part,
+                "collateral": _collateral_subset(collateral, part),
+                "similarityDict": similarityDict,
+                "version_int": version_int,
+                "keep_cols": [],
+                "top_k": None,
+            }
+
+    scored = pd.concat([res["scored"] for res in _ordered_map(_score_task, tasks(), n_workers)], ignore_index=True)
+    # partition 內保持原始順序，依 order 還原回 dfCompareCases 的列順序
+    restore = np.empty(len(order), dtype=np.int64)
+    restore[order] = np.arange(len(order))
+    scored = scored.iloc[restore]
+    scored.index = dfCompareCases.index
+    return scored
+
+
+def run_similarity_pipeline(
+    source: Union[str, Iterable[pd.DataFrame]],
+    dfCollateral: Union[pd.DataFrame, CollateralIndex],
+    similarityDict: Mapping[str, Any],
+    out_dir: str,
+    version_int: str = "2",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    columns: Optional[Sequence[str]] = None,
+    keep_cols: Optional[Sequence[str]] = None,
+    top_k: Optional[int] = None,
+    fmt: str = "parquet",
+    n_workers: int = 1,
+) -> pd.DataFrame:
+    """
+    分塊讀 → 計分 → 寫出，回傳每個 part 的執行紀錄
+    （part / rows_in / rows_out / path / seconds）。
+
+    source 可為檔案路徑（.parquet / .csv）或已切好的 DataFrame iterable。
+    n_workers > 1 時各分塊在 process pool 計分，寫檔仍在主程序依 part 順序進行，
+    輸出檔與 n_workers=1 完全相同。
+    開始前會清掉 out_dir 內上一次的 part 檔 / similarity.csv。
+    """
+    stale = clear_parts(out_dir)
+    if stale:
+        print(f"清除上一次的輸出 {len(stale)} 個檔案：{out_dir}")
+
+    collateral = dfCollateral
+    if not isinstance(collateral, CollateralIndex):
+        collateral = CollateralIndex(collateral, columns=COLLATERAL_COLS)
+
+    chunks = read_compare_chunks(source, chunksize, columns) if isinstance(source, str) else source
+
+    def tasks():
+        for part in group_partitions(chunks):
+            yield {
+                "part": part,
+                "collateral": _collateral_subset(collateral, part),
+                "similarityDict": similarityDict,
+                "version_int": version_int,
+                "keep_cols": keep_cols,
+                "top_k": top_k,
+            }
+
+    log: List[Dict[str, Any]] = []
+    for part_no, res in enumerate(_ordered_map(_score_task, tasks(), _resolve_workers(n_workers))):
+        scored = res["scored"]
+        path = write_part(scored, out_dir, part_no, fmt)
+        log.append(
+            {
+                "part": part_no,
+                "rows_in": res["rows_in"],
+                "rows_out": len(scored),
+                "path": path,
+                "seconds": res["seconds"],
+            }
+        )
+        print(f"part {part_no}: {res['rows_in']} → {len(scored)} 筆，{res['seconds']}s")
+
+    return pd.DataFrame(log, columns=["part", "rows_in", "rows_out", "path", "seconds"])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+相似度參數掃描（v1 / v2 / v3 ... 權重版本比較）
+
+過去每換一組 scoreParameter 就要對 dfCompareCases 整個重算一次。
+六個構面的原始特徵（月份差、距離、樓層差、坪數差異比例、屋齡差、巷弄等級 ...）
+其實與參數無關，這裡先用 build_features 算一次，
+再對每一組參數只做查表，輸出：
+    - v{n}_similarity：各版本總分
+    - v{n}_rank      ：各版本在同一 ApplNo 內的名次（分數高 → 1）
+    - v{n}_rank_chg  ：相對基準版本的名次變化（正值 = 名次往後掉）
+以及 rank_change_summary 彙總每個 ApplNo 的名次變動情形。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from wagebound.similarity.collateral_index import CollateralIndex
+from wagebound.similarity.similarity_batch import (
+    COLLATERAL_COLS,
+    RESULT_SUFFIX,
+    build_features,
+    score_features,
+)
+
+
+def similarity_sweep(
+    dfCompareCases: pd.DataFrame,
+    dfCollateral: Union[pd.DataFrame, CollateralIndex],
+    params: Mapping[str, Mapping[str, Any]],
+    base_version: Optional[str] = None,
+    exclude_ignored: bool = True,
+    keep_components: bool = False,
+) -> pd.DataFrame:
+    """
+    同一批比對案件套用多組參數。
+
+    Parameters
+    ----------
+    dfCompareCases : DataFrame
+        比對案件。
+    dfCollateral : DataFrame | CollateralIndex
+        擔保品資料或已建好的索引。
+    params : dict
+        {版本號: 參數 dict}，例如 {"1": scoreParameter_v1, "2": scoreParameter_v2}。
+    base_version : str, optional
+        名次變化的比較基準，預設為 params 的第一個版本。
+    exclude_ignored : bool
+        True 時 ignore = 'Y' 的案件不參與排名（名次為 NaN）。
+    keep_components : bool
+        True 時一併輸出各版本的 s1 ~ s6。
+
+    Returns
+    -------
+    DataFrame
+        與 dfCompareCases 同 index：ApplNo, ignore, 以及每個版本的
+        v{n}_similarity / v{n}_rank / v{n}_rank_chg（與 keep_components 時的 v{n}_s1... ）。
+    """
+    if not params:
+        raise ValueError("params 至少要有一組參數")
+    versions = [str(v) for v in params]
+    base_version = versions[0] if base_version is None else str(base_version)
+    if base_version not in versions:
+        raise KeyError(f"base_version={base_version} 不在 params 中：{versions}")
+
+    if not isinstance(dfCollateral, CollateralIndex):
+        dfCollateral = CollateralIndex(dfCollateral, columns=COLLATERAL_COLS)
+    coll = dfCollateral.attach(dfCompareCases, on="ApplNo", columns=COLLATERAL_COLS)
+    features = build_features(dfCompareCases.reset_index(drop=True), coll)
+
+    out = pd.DataFrame(
+        {"ApplNo": dfCompareCases["ApplNo"].to_numpy(), "ignore": features["ignore"]},
+        index=dfCompareCases.index,
+    )
+    rankable = out["ignore"] == "N" if exclude_ignored else pd.Series(True, index=out.index)
+
+    for version, similarityDict in zip(versions, params.values()):
+        scores = score_features(features, similarityDict)
+        if keep_components:
+            for key, arr in scores.items():
+                out[f"v{version}_{RESULT_SUFFIX[key]}"] = arr
+        out[f"v{version}_similarity"] = np.sum([scores[key] for key in scores], axis=0)
+
+        similarity = out[f"v{version}_similarity"].where(rankable)
+        out[f"v{version}_rank"] = similarity.groupby(out["ApplNo"]).rank(ascending=False, method="min")
+
+    for version in versions:
+        out[f"v{version}_rank_chg"] = out[f"v{version}_rank"] - out[f"v{base_version}_rank"]
+
+    out.attrs["base_version"] = base_version
+    return out
+
+
+def rank_change_summary(sweep: pd.DataFrame, base_version: Optional[str] = None, top_n: int = 1) -> pd.DataFrame:
+    """
+    依 ApplNo 彙總 similarity_sweep 的名次變化（base_version 預設沿用 sweep 當時的基準）：
+        cases                 : 參與排名的案件數
+        v{n}_changed          : 名次與基準版本不同的案件數
+        v{n}_mean_abs_chg     : 名次變化絕對值平均
+        v{n}_top{top_n}_same  : 前 top_n 名的案件集合是否與基準版本相同
+    """
+    versions = [c[1:-len("_rank_chg")] for c in sweep.columns if c.startswith("v") and c.endswith("_rank_chg")]
+    base = str(base_version) if base_version is not None else sweep.attrs["base_version"]
+
+    grouped = sweep.groupby("ApplNo", sort=True)
+    res = pd.DataFrame({"cases": grouped[f"v{base}_rank"].count()})
+
+    base_top = sweep[f"v{base}_rank"] <= top_n
+    for version in versions:
+        if version == base:
+            continue
+        chg = sweep[f"v{version}_rank_chg"]
+        res[f"v{version}_changed"] = (chg.fillna(0) != 0).groupby(sweep["ApplNo"]).sum()
+        res[f"v{version}_mean_abs_chg"] = chg.abs().groupby(sweep["ApplNo"]).mean()
+        top_diff = (sweep[f"v{version}_rank"] <= top_n) != base_top
+        res[f"v{version}_top{top_n}_same"] = ~top_diff.groupby(sweep["ApplNo"]).any()
+
+    return res.reset_index()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+每個 ApplNo 取相似度前 K 名（不做全表排序）
+
+similarity.py 最後用 sort_values(["ApplNo", "vN_similarity"]) 對上千萬列整張排序，
+但實際上每個擔保品只會用到前幾名比對案件。
+
+做法：
+    1. ApplNo、相似度各自 factorize（hash，O(n)），相似度的不重複值很少
+    2. 以 (ApplNo, 分數等級) 做 bincount，累加後得到每個 ApplNo 第 K 名的分數門檻
+    3. 只留下分數 >= 門檻的候選列（約 K × ApplNo 數，含同分），再對候選列排序
+同分時依 Distance（近 → 遠）、TimeDiffOfMonth（新 → 舊）、原始列順序決定名次，結果穩定可重現。
+
+stream_topk 可吃「依 ApplNo 連續排列」的分塊資料，逐塊輸出結果。
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# (ApplNo 數 × 分數等級數) 超過此值時，不建 bincount 表，直接對全部列排序
+MAX_HIST_CELLS = 50_000_000
+
+DEFAULT_TIE_COLS = ("Distance", "TimeDiffOfMonth")
+
+
+def _descending_levels(score: np.ndarray) -> tuple:
+    """回傳每列分數的「由高到低等級」（0 = 最高分，NaN 為最後一級）與等級數。"""
+    codes, uniques = pd.factorize(score)
+    order = np.argsort(-np.asarray(uniques, dtype=float), kind="stable")
+    rank_of_unique = np.empty(len(uniques) + 1, dtype=np.int64)
+    rank_of_unique[order] = np.arange(len(uniques))
+    rank_of_unique[-1] = len(uniques)  # codes = -1（NaN）
+    return rank_of_unique[codes], len(uniques) + 1
+
+
+def topk_positions(
+    group: np.ndarray,
+    score: np.ndarray,
+    k: int,
+    ties: Sequence[np.ndarray] = (),
+) -> tuple:
+    """
+    核心選取：回傳 (positions, ranks)，positions 為原始列位置，ranks 為 1 ~ k。
+    輸出依 group 首次出現順序、名次排列。
+    """
+    n = len(score)
+    if n == 0 or k <= 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    gcodes, guniques = pd.factorize(group)
+    levels, n_levels = _descending_levels(score)
+    n_groups = len(guniques)
+
+    # 1. 每個 group 第 K 名的分數等級（不足 K 筆的 group 全部保留）
+    if n_groups * n_levels <= MAX_HIST_CELLS:
+        hist = np.bincount(gcodes * n_levels + levels, minlength=n_groups * n_levels)
+        cum = hist.reshape(n_groups, n_levels).cumsum(axis=1)
+        reached = cum >= k
+        cutoff = np.where(reached.any(axis=1), reached.argmax(axis=1), n_levels - 1)
+        cand = np.flatnonzero(levels <= cutoff[gcodes])
+    else:
+        cand = np.arange(n)
+
+    # 2. 只對候選列排序：group → 分數高 → ties（小 → 大）→ 原始順序
+    keys = [cand]
+    for tie in reversed(list(ties)):
+        keys.append(np.asarray(tie, dtype=float)[cand])
+    keys += [levels[cand], gcodes[cand]]
+    ordered = cand[np.lexsort(keys)]
+
+    # 3. group 內名次
+    sorted_groups = gcodes[ordered]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    sizes = np.diff(np.r_[starts, len(ordered)])
+    ranks = np.arange(len(ordered)) - np.repeat(starts, sizes) + 1
+
+    keep = ranks <= k
+    return ordered[keep], ranks[keep]
+
+
+def topk_per_group(
+    df: pd.DataFrame,
+    k: int = 5,
+    score_col: str = "v2_similarity",
+    group_col: str = "ApplNo",
+    tie_cols: Sequence[str] = DEFAULT_TIE_COLS,
+    rank_col: Optional[str] = "rank",
+) -> pd.DataFrame:
+    """
+    每個 group_col 取 score_col 最高的前 k 筆。
+
+    Parameters
+    ----------
+    df : DataFrame
+        已計分的比對案件（例如 dfCompareCases_caculate）。
+    k : int
+        每組保留筆數。
+    score_col : str
+        相似度欄位，越高越好。
+    group_col : str
+        分組欄位，預設 ApplNo。
+    tie_cols : list[str]
+        同分時的排序欄位（越小越前面），df 沒有的欄位會略過。
+    rank_col : str, optional
+        名次欄位名稱（1 ~ k），None 則不加。
+
+    Returns
+    -------
+    DataFrame
+        依 group 首次出現順序、名次排列的前 k 筆，保留原始 index。
+    """
+    ties = [df[c].to_numpy() for c in tie_cols if c in df.columns]
+    pos, ranks = topk_positions(df[group_col].to_numpy(), df[score_col].to_numpy(), k, ties)
+    out = df.iloc[pos]
+    if rank_col:
+        out = out.assign(**{rank_col: ranks})
+    return out
+
+
+def stream_topk(
+    chunks: Iterable[pd.DataFrame],
+    k: int = 5,
+    score_col: str = "v2_similarity",
+    group_col: str = "ApplNo",
+    tie_cols: Sequence[str] = DEFAULT_TIE_COLS,
+    rank_col: Optional[str] = "rank",
+) -> Iterator[pd.DataFrame]:
+    """
+    逐塊輸出前 k 名。
+
+    chunks 需依 group_col 連續排列（同一 ApplNo 不會被其他 ApplNo 隔開），
+    但同一 ApplNo 可以跨兩個 chunk：每塊最後一個 ApplNo 的前 k 名會暫留，
+    與下一塊合併後再輸出。
+    """
+    kwargs = dict(k=k, score_col=score_col, group_col=group_col, tie_cols=tie_cols, rank_col=None)
+    carry: Optional[pd.DataFrame] = None
+
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        if chunk.empty:
+            continue
+
+        top = topk_per_group(chunk, **kwargs)
+        is_last = (top[group_col] == chunk[group_col].iloc[-1]).to_numpy()
+        carry = top.loc[is_last]
+        done = top.loc[~is_last]
+        if not done.empty:
+            yield _with_rank(done, group_col, rank_col)
+
+    if carry is not None and not carry.empty:
+        yield _with_rank(carry, group_col, rank_col)
+
+
+def _with_rank(top: pd.DataFrame, group_col: str, rank_col: Optional[str]) -> pd.DataFrame:
+    if not rank_col:
+        return top
+    return top.assign(**{rank_col: top.groupby(group_col, sort=False).cumcount().to_numpy() + 1})
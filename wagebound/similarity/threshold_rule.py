@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+門檻給分規則的編譯版本
+
+score_by_threshold 每次都線性走訪 [[threshold, score], ...]，
+而 DealMonthDiff / Distance / Ping / Age ... 這幾組規則在回測中會被用上百萬次。
+
+ThresholdRule 把規則先編譯成排序好的 thresholds / scores 陣列：
+    - 純量：rule.score(value)     → bisect 二分搜尋
+    - 向量：rule.scores(values)   → np.searchsorted 一次算完整個陣列
+語意與 score_by_threshold 相同：取第一個 value <= threshold 的 score，否則 0。
+
+ThresholdRule 本身仍可像原本的 list 一樣迭代出 [threshold, score]，
+所以編譯過的參數 dict 可以直接丟回舊的逐列函式使用。
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
+
+import numpy as np
+
+# scoreParameter 中屬於「門檻給分」型態的規則（其餘如 Alley / Floor / Community 為對照型）
+THRESHOLD_KEYS: List[str] = [
+    "DealMonthDiff",
+    "Distance",
+    "Distance_R2",
+    "Ping",
+    "Age",
+    "Age_R2",
+    "Floor_R2",
+]
+
+
+class ThresholdRule:
+    """
+    編譯後的門檻給分規則。
+
+    Parameters
+    ----------
+    rules : list
+        [[threshold1, score1], [threshold2, score2], ...]
+    validate : bool
+        True 時檢查規則是否單調：threshold 需嚴格遞增、score 不可遞增
+        （越接近分數越高），不符合丟 ValueError。
+        False 時不檢查，但仍保留「依原始順序第一個命中」的語意
+        （排在較大門檻之後、永遠不會命中的規則會被略過）。
+    default : 全部門檻都不符合時的分數，預設 0。
+    """
+
+    def __init__(self, rules: Sequence[Sequence[Any]], validate: bool = True, default: Any = 0) -> None:
+        pairs = [(float(threshold), score) for threshold, score in rules]
+
+        if validate:
+            for (t0, s0), (t1, s1) in zip(pairs, pairs[1:]):
+                if not t1 > t0:
+                    raise ValueError(f"門檻必須嚴格遞增：{t0} -> {t1}（rules={list(rules)}）")
+                if s1 > s0:
+                    raise ValueError(f"分數不可隨門檻遞增：{s0} -> {s1}（rules={list(rules)}）")
+
+        # 依原始順序保留「有機會命中」的規則 → 門檻自然遞增
+        thresholds: List[float] = []
+        scores: List[Any] = []
+        for threshold, score in pairs:
+            if not thresholds or threshold > thresholds[-1]:
+                thresholds.append(threshold)
+                scores.append(score)
+
+        self.rules = [list(r) for r in rules]
+        self.default = default
+        self.thresholds = thresholds
+        self._scores = scores
+        self._threshold_arr = np.asarray(thresholds, dtype=float)
+        # 最後一格放 default，searchsorted 超出範圍時直接取到
+        self._score_arr = np.asarray(scores + [default])
+
+    # 讓 ThresholdRule 仍可當作 [[threshold, score], ...] 迭代
+    def __iter__(self) -> Iterator[List[Any]]:
+        return iter(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __repr__(self) -> str:
+        return f"ThresholdRule({self.rules})"
+
+    def score(self, value) -> Any:
+        """純量版本：回傳第一個 value <= threshold 的 score，否則 default。"""
+        if value != value:  # NaN 與任何門檻比較都為 False
+            return self.default
+        idx = bisect_left(self.thresholds, value)
+        return self._scores[idx] if idx < len(self._scores) else self.default
+
+    __call__ = score
+
+    def scores(self, values) -> np.ndarray:
+        """向量版本：整個陣列一次查表（NaN → default）。"""
+        v = np.asarray(values, dtype=float)
+        return self._score_arr[np.searchsorted(self._threshold_arr, v, side="left")]
+
+
+def compile_score_parameter(similarityDict: Mapping[str, Any], validate: bool = True) -> Dict[str, Any]:
+    """
+    將 scoreParameter 中的門檻型規則（THRESHOLD_KEYS）編譯成 ThresholdRule，
+    其餘規則原樣保留，回傳新的 dict（不修改原參數）。
+    """
+    compiled = dict(similarityDict)
+    for key in THRESHOLD_KEYS:
+        if key in compiled and not isinstance(compiled[key], ThresholdRule):
+            compiled[key] = ThresholdRule(compiled[key], validate=validate)
+    return compiled
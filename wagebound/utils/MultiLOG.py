@@ -15,15 +15,33 @@ LOG 解譯工具
     - 輸出：
         * LOG_Collateral_uat.xlsx  （Collateral / LVR / ctbc_inside）
         * LOG_PCSM_uat.xlsx        （pcsm_input / pcsm_output / result）
+
+平行模式（ingest_logs）：
+    - 執行緒池讀檔（網路磁碟 I/O），每個檔只讀前 6 行
+    - 程序池解析 JSON / 組 DataFrame
+    - 回傳六張表與逐檔錯誤報告（讀檔失敗、行數不足、解析失敗），不再默默回傳空表
+
+增量模式（main(incremental=True)）：
+    - 解析結果存於 LOG_STORE_DIR（log_manifest.LogStore），只解析新增 / 變更的 LOG
+    - 再由儲存的表重新產生兩個 Excel
+
+輸出格式（OUTPUT_FORMAT）：
+    - "parquet" / "feather"：LOG_Collateral_uat/、LOG_PCSM_uat/ 資料夾（frame_store），EXPORT_EXCEL 時再轉出 Excel
+    - "excel"              ：直接寫兩個 Excel（原本的行為）
 """
 
-import ast
-import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from os.path import join
+from typing import Iterable, Iterator, Optional
 
 import pandas as pd
 
 from wagebound.config.config import comparecase_select, clean_colname
+from wagebound.utils.fast_json import loads, loads_log_literal
+from wagebound.utils.frame_store import export_excel, write_frames
+from wagebound.utils.log_manifest import LogStore
 from StevenTricks.io.file_utils import PathWalk_df
 
 # ----------------------------------------------------------------------
@@ -44,6 +62,18 @@ REPLACE_WORDS = [
     ('4"33""', "4分33秒"),
 ]
 
+# LOG 只用到前 6 行：ApplNo / ApplNoB / GuaraNo / Input / (空白) / Output
+LOG_HEAD_LINES = 6
+
+FRAME_KEYS = ("dgisinput", "lvr_out", "ctbc_inside_out", "pcsm_input", "pcsm_output", "result")
+
+# 增量模式的存放資料夾（位於 base_path 底下）
+LOG_STORE_DIR = "_log_store"
+
+# 輸出格式：excel / parquet / feather；欄式格式時 EXPORT_EXCEL 決定是否另外轉出 Excel
+OUTPUT_FORMAT = "parquet"
+EXPORT_EXCEL = True
+
 
 # ----------------------------------------------------------------------
 # 工具函式
@@ -68,13 +98,21 @@ def rename_clean(df: pd.DataFrame) -> pd.DataFrame:
     return df.rename(columns=clean_colname)
 
 
-def read_log_lines(path: str) -> list[str]:
+def read_log_head(path: str, n: int = LOG_HEAD_LINES) -> list[str]:
     """
-    讀取單一 LOG 檔，回傳「已去換行」的字串列表。
-    以 utf-8 為主，遇到異常字元忽略。
+    只讀 LOG 檔的前 n 行（已去換行），後面的內容不讀取。
     """
+    lines = []
     with open(path, "rb") as f:
-        return [line.decode("utf-8", errors="ignore").strip() for line in f.readlines()]
+        for line in f:
+            lines.append(line.decode("utf-8", errors="ignore").strip())
+            if len(lines) >= n:
+                break
+    return lines
+
+
+def empty_frames() -> dict[str, pd.DataFrame]:
+    return {key: pd.DataFrame() for key in FRAME_KEYS}
 
 
 def parse_single_log(path: str) -> dict[str, pd.DataFrame]:
@@ -89,32 +127,34 @@ def parse_single_log(path: str) -> dict[str, pd.DataFrame]:
             "result": df,
         }
     """
-    log_list = read_log_lines(path)
-    if len(log_list) < 6:
+    log_list = read_log_head(path)
+    if len(log_list) < LOG_HEAD_LINES:
         # 格式異常，直接略過
-        return {
-            "dgisinput": pd.DataFrame(),
-            "lvr_out": pd.DataFrame(),
-            "ctbc_inside_out": pd.DataFrame(),
-            "pcsm_input": pd.DataFrame(),
-            "pcsm_output": pd.DataFrame(),
-            "result": pd.DataFrame(),
-        }
+        return empty_frames()
+    return parse_log_lines(log_list)
+
+
+def parse_log_lines(log_list: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    解析 LOG 的前 6 行，回傳格式同 parse_single_log；行數不足時丟 ValueError。
+    """
+    if len(log_list) < LOG_HEAD_LINES:
+        raise ValueError(f"行數不足：{len(log_list)} < {LOG_HEAD_LINES}")
 
     # 基本頭三行：ApplNo / ApplNoB / GuaraNo
     appl_no = log_list[0].split(":")[-1].strip()
     # appl_no_b = log_list[1].split(":")[-1].strip()  # 若未使用，可忽略
     guara_no = log_list[2].split(":")[-1].strip()
 
-    # Input：第 4 行，去掉前 6 個字元（沿用原本邏輯）
+    # Input：第 4 行，去掉前 6 個字元（沿用原本邏輯）；JSON 格式走快速解碼，Python 字面值才用 literal_eval
     input_raw = log_list[3][6:]
-    input_json = ast.literal_eval(input_raw)
+    input_json = loads_log_literal(input_raw)
 
     # Output：第 6 行，去掉前 7 個字元，再把單引號改成雙引號
     output_raw = log_list[5][7:].replace("'", '"')
     for old, new in REPLACE_WORDS:
         output_raw = output_raw.replace(old, new)
-    output_json = json.loads(output_raw)
+    output_json = loads(output_raw)
 
     # -----------------------------
     # Collateral + Location
@@ -192,58 +232,151 @@ def parse_single_log(path: str) -> dict[str, pd.DataFrame]:
 
 
 # ----------------------------------------------------------------------
-# 主程式
+# 平行讀取 / 解析
 # ----------------------------------------------------------------------
 
 
-def main(base_path: str = BASE_LOG_PATH) -> None:
-    # 掃描所有 .txt LOG 檔
-    df_path = PathWalk_df(base_path, fileinclude=[".txt"])
-
-    all_dfs = {
-        "dgisinput": [],
-        "lvr_out": [],
-        "ctbc_inside_out": [],
-        "pcsm_input": [],
-        "pcsm_output": [],
-        "result": [],
+def _read_task(path: str) -> tuple:
+    """(path, 前 6 行, 錯誤)；讀檔失敗時行為 None。"""
+    try:
+        return path, read_log_head(path), None
+    except OSError as e:
+        return path, None, {"path": path, "stage": "read", "error": f"{type(e).__name__}: {e}"}
+
+
+def _parse_task(item: tuple) -> tuple:
+    """(path, frames, 錯誤)；在 worker 內接住例外，單一檔案壞掉不影響整批。"""
+    path, log_list, error = item
+    if error is not None:
+        return path, None, error
+    if len(log_list) < LOG_HEAD_LINES:
+        return path, None, {"path": path, "stage": "format", "error": f"行數不足：{len(log_list)} < {LOG_HEAD_LINES}"}
+    try:
+        return path, parse_log_lines(log_list), None
+    except Exception as e:
+        return path, None, {"path": path, "stage": "parse", "error": f"{type(e).__name__}: {e}"}
+
+
+def _bounded_map(pool, func, items: Iterable, limit: int) -> Iterator:
+    """依輸入順序回傳 func(item)，同時在途最多 limit 個（LOG 的 Output 行可達數 MB）。"""
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def ingest_logs(
+    paths: Iterable[str],
+    n_workers: Optional[int] = None,
+    io_workers: int = 8,
+    source_col: Optional[str] = None,
+) -> tuple[dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    平行讀取並解析多個 LOG 檔。
+
+    Parameters
+    ----------
+    paths : iterable of str
+        LOG 檔路徑。
+    n_workers : int, optional
+        解析用的程序數，預設為 CPU 核心數；1 表示在本程序解析。
+    io_workers : int
+        讀檔用的執行緒數。
+    source_col : str, optional
+        指定時在每張表加上此欄，值為來源 LOG 路徑（增量模式用）。
+
+    Returns
+    -------
+    (frames, errors)
+        frames：六張表（同 parse_single_log 的 key，依 paths 順序 concat）
+        errors：逐檔錯誤報告，欄位 path / stage（read / format / parse）/ error
+    """
+    n_workers = max(1, os.cpu_count() or 1) if n_workers is None else max(1, int(n_workers))
+    all_dfs = {key: [] for key in FRAME_KEYS}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool:
+        heads = _bounded_map(io_pool, _read_task, paths, 2 * io_workers)
+        if n_workers == 1:
+            n_files = _collect(map(_parse_task, heads), all_dfs, errors, source_col)
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                n_files = _collect(_bounded_map(pool, _parse_task, heads, 2 * n_workers), all_dfs, errors, source_col)
+
+    frames = {
+        key: pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+        for key, dfs in all_dfs.items()
     }
-
-    for path in df_path["path"]:
-        parsed = parse_single_log(path)
-        for key, df in parsed.items():
+    report = pd.DataFrame(errors, columns=["path", "stage", "error"])
+    print(f"LOG 解析完成：{n_files} 檔，失敗 {len(report)} 檔")
+    return frames, report
+
+
+def _collect(parsed: Iterable[tuple], all_dfs: dict, errors: list, source_col: Optional[str] = None) -> int:
+    """把解析結果分到 all_dfs / errors，回傳檔案數。"""
+    n_files = 0
+    for path, frames, error in parsed:
+        n_files += 1
+        if error is not None:
+            errors.append(error)
+            continue
+        for key, df in frames.items():
             if df is not None and not df.empty:
+                if source_col is not None:
+                    df[source_col] = path
                 all_dfs[key].append(df)
+    return n_files
 
-    # 將各批次結果 concat 起來
-    def _concat(key: str) -> pd.DataFrame:
-        return (
-            pd.concat(all_dfs[key], ignore_index=True)
-            if all_dfs[key]
-            else pd.DataFrame()
-        )
-
-    dgisinput_excel = _concat("dgisinput")
-    lvr_out_excel = _concat("lvr_out")
-    ctbc_inside_out_excel = _concat("ctbc_inside_out")
-    pcsm_input_excel = _concat("pcsm_input")
-    pcsm_output_excel = _concat("pcsm_output")
-    result_excel = _concat("result")
+
+# ----------------------------------------------------------------------
+# 主程式
+# ----------------------------------------------------------------------
+
+
+def main(
+    base_path: str = BASE_LOG_PATH,
+    n_workers: Optional[int] = None,
+    io_workers: int = 8,
+    incremental: bool = False,
+    output_format: str = OUTPUT_FORMAT,
+    to_excel: bool = EXPORT_EXCEL,
+) -> None:
+    # 掃描所有 .txt LOG 檔
+    df_path = PathWalk_df(base_path, fileinclude=[".txt"])
+
+    if incremental:
+        store = LogStore(join(base_path, LOG_STORE_DIR), FRAME_KEYS)
+        errors = store.update(df_path["path"], ingest_logs, io_workers=io_workers, n_workers=n_workers)
+        frames = store.frames()
+    else:
+        frames, errors = ingest_logs(df_path["path"], n_workers=n_workers, io_workers=io_workers)
+    if not errors.empty:
+        print(errors.to_string(index=False))
 
     # -----------------------------
-    # 輸出 Excel
+    # 輸出
     # -----------------------------
-    # Collateral + CompareCase 結果
-    with pd.ExcelWriter(join(base_path, "LOG_Collateral_uat.xlsx")) as writer:
-        dgisinput_excel.to_excel(writer, sheet_name="Collateral", index=False)
-        lvr_out_excel.to_excel(writer, sheet_name="LVR", index=False)
-        ctbc_inside_out_excel.to_excel(writer, sheet_name="ctbc_inside", index=False)
-
-    # PCSM Input / Output / Result
-    with pd.ExcelWriter(join(base_path, "LOG_PCSM_uat.xlsx")) as writer:
-        pcsm_input_excel.to_excel(writer, sheet_name="pcsm_input", index=False)
-        pcsm_output_excel.to_excel(writer, sheet_name="pcsm_output", index=False)
-        result_excel.to_excel(writer, sheet_name="result", index=False)
+    outputs = {
+        # Collateral + CompareCase 結果
+        "LOG_Collateral_uat": {
+            "Collateral": frames["dgisinput"],
+            "LVR": frames["lvr_out"],
+            "ctbc_inside": frames["ctbc_inside_out"],
+        },
+        # PCSM Input / Output / Result
+        "LOG_PCSM_uat": {
+            "pcsm_input": frames["pcsm_input"],
+            "pcsm_output": frames["pcsm_output"],
+            "result": frames["result"],
+        },
+    }
+    for name, sheets in outputs.items():
+        path = write_frames(sheets, join(base_path, name), fmt=output_format)
+        if output_format != "excel" and to_excel:
+            export_excel(path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+自適應併發控制（AIMD）
+
+API 回放原本固定 max_workers = 10：UAT 閒的時候用不滿，忙的時候又一直 timeout。
+AimdLimiter 依實際觀察到的延遲與錯誤動態調整「同時在途的請求數」：
+    - 加法增加：連續一個 window（= 目前上限筆數）都正常 → 上限 + increase
+    - 乘法減少：出現錯誤或延遲超過 latency_target → 上限 × decrease
+      （同一個 window 內只減一次，避免一波 timeout 直接把上限壓到最低）
+    - 上限介於 [min_limit, max_limit]，max_limit 依環境（sit / uat）設定
+
+執行緒版本：每個 worker 呼叫 limiter.call(func, ...)，超過上限的 worker 會等待。
+結束時 summary() / report() 提供延遲百分位數、錯誤率與上限變化。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_PERCENTILES: Tuple[int, ...] = (50, 90, 95, 99)
+
+
+class AimdLimiter:
+    """
+    Parameters
+    ----------
+    initial : int
+        起始上限。
+    min_limit / max_limit : int
+        上限的範圍。
+    increase : float
+        每個正常 window 增加的數量。
+    decrease : float
+        發生壅塞時乘上的比例（0 ~ 1）。
+    latency_target : float, optional
+        單筆延遲超過此秒數視為壅塞；None 時只看錯誤。
+    is_error : callable, optional
+        依回傳值判斷是否為錯誤（例如連線失敗的結果）；func 丟出例外一律視為錯誤。
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target: Optional[float] = None,
+        is_error: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"需 1 <= min_limit <= max_limit：{min_limit}, {max_limit}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"decrease 需介於 0 ~ 1：{decrease}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.is_error = is_error
+
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        # (經過秒數, 新上限)
+        self.history: List[Tuple[float, int]] = [(0.0, int(self.limit))]
+
+        self._cond = threading.Condition()
+        self._successes = 0
+        self._last_decrease = -1
+        self._start = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return f"AimdLimiter(limit={int(self.limit)}, in_flight={self.in_flight}, range=[{self.min_limit}, {self.max_limit}])"
+
+    # ------------------------------------------------------------------
+    # 取得 / 歸還名額
+    # ------------------------------------------------------------------
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, error: bool) -> None:
+        """歸還名額並依本次延遲 / 錯誤調整上限。"""
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self.errors += error
+            self.latencies.append(latency)
+
+            before = int(self.limit)
+            congested = error or (self.latency_target is not None and latency > self.latency_target)
+            if congested:
+                self._successes = 0
+                # 同一個 window 內只減一次
+                if self._last_decrease < 0 or self.completed - self._last_decrease >= before:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._last_decrease = self.completed
+            else:
+                self._successes += 1
+                if self._successes >= before:
+                    self.limit = min(float(self.max_limit), self.limit + self.increase)
+                    self._successes = 0
+
+            if int(self.limit) != before:
+                self.history.append((round(time.perf_counter() - self._start, 2), int(self.limit)))
+            self._cond.notify_all()
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在名額內執行 func，並以執行時間與結果回饋上限。"""
+        self.acquire()
+        start = time.perf_counter()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = bool(self.is_error(result)) if self.is_error is not None else False
+            return result
+        finally:
+            self.release(time.perf_counter() - start, error)
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+    def summary(self, percentiles: Sequence[int] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """延遲百分位數（秒）、錯誤率與上限變化。"""
+        lat = np.asarray(self.latencies, dtype=float)
+        res: Dict[str, Any] = {
+            "count": self.completed,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.completed, 4) if self.completed else 0.0,
+            "elapsed": round(time.perf_counter() - self._start, 1),
+            "final_limit": int(self.limit),
+            "peak_limit": max(limit for _, limit in self.history),
+            "adjustments": len(self.history) - 1,
+        }
+        for p in percentiles:
+            res[f"p{p}"] = round(float(np.percentile(lat, p)), 3) if len(lat) else None
+        res["max"] = round(float(lat.max()), 3) if len(lat) else None
+        return res
+
+    def report(self, printer: Callable = print) -> Dict[str, Any]:
+        s = self.summary()
+        lat = "、".join(f"p{p}={s[f'p{p}']}s" for p in DEFAULT_PERCENTILES)
+        printer(
+            f"[aimd] {s['count']} 筆，錯誤率 {s['error_rate']:.2%}，{lat}，max={s['max']}s；"
+            f"上限 最終 {s['final_limit']} / 最高 {s['peak_limit']}（調整 {s['adjustments']} 次）"
+        )
+        return s
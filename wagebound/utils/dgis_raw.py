@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+DGIS 原始下載檔（list_*.xls，各縣市一檔）平行讀取
+
+HPM_verify.main 與 HPM_half_year_renew 原本都是：
+    for 每個 list_*.xls：
+        pd.read_excel(sheet_name=None)   # 讀整本、所有 sheet、所有欄位
+        只留「建物」「不動產買賣」→ drop / rename / 加 City → 逐次 concat
+
+這裡改成：
+    - 每本 workbook 交給一個 process 讀取（n_workers=1 時在本程序依序讀）
+    - 只讀「建物」「不動產買賣」開頭的 sheet，且只讀 COLNAME 有對應的欄位
+    - 各檔結果依輸入順序一次 concat
+    - 逐檔記錄縣市、sheet、筆數、秒數與錯誤
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from os.path import basename
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# 要讀的 sheet（sheet 名可能是「不動產買賣_50000」，只比對底線前段）
+RAW_SHEETS = ("建物", "不動產買賣")
+
+REPORT_COLS = ["path", "city", "sheets", "rows", "seconds", "error"]
+
+
+def city_of(path: str, cityname: Mapping[str, str]) -> Optional[str]:
+    """由檔名（list_a.xls → A）找縣市名稱，找不到回傳 None。"""
+    for vol, city in cityname.items():
+        if f"list_{vol.lower()}" in path:
+            return city
+    return None
+
+
+def sheet_kind(sheet_name: str) -> str:
+    return sheet_name.split("_")[0]
+
+
+def split_completion_date(df: pd.DataFrame) -> pd.DataFrame:
+    """建物完成日期「82年4月12日」→ Building_Completion_Date_v「0820412」（3+2+2 碼字串）。"""
+    temp = (
+        df["Building_Completion_Date"]
+        .astype(str)
+        .str.split("年|月|日", expand=True)
+        .rename(columns={0: "year", 1: "month", 2: "day"})
+    )
+    temp["year"] = temp["year"].str.zfill(3)
+    temp["month"] = temp["month"].str.zfill(2)
+    temp["day"] = temp["day"].str.zfill(2)
+    df["Building_Completion_Date_v"] = temp["year"] + temp["month"] + temp["day"]
+    return df
+
+
+def read_raw_workbook(
+    path: str,
+    colname: Mapping[str, Mapping[str, str]],
+    dropcol: Mapping[str, Sequence[str]],
+    cityname: Mapping[str, str],
+    only_mapped: bool = True,
+) -> Dict[str, List[pd.DataFrame]]:
+    """
+    讀一本縣市 workbook，回傳 {"建物": [df, ...], "不動產買賣": [df, ...]}（空的 sheet 不列入）。
+
+    清理步驟與原本相同：drop 雜訊欄 → rename（colname）→ drop（dropcol）→ 加 City → 建物完成日期拆碼。
+    only_mapped=True 時只讀 colname 有對應的欄位。
+    """
+    city = city_of(path, cityname)
+    res: Dict[str, List[pd.DataFrame]] = {}
+
+    with pd.ExcelFile(path) as book:
+        for sheet in book.sheet_names:
+            kind = sheet_kind(sheet)
+            if kind not in RAW_SHEETS:
+                continue
+
+            mapping = colname.get(kind, {})
+            usecols = (lambda col, keep=frozenset(mapping): col in keep) if only_mapped and mapping else None
+            df = book.parse(sheet, usecols=usecols)
+
+            df = df.drop(columns=["Unnamed: 35", "Unnamed: 0"], errors="ignore")
+            if mapping:
+                df = df.rename(columns=mapping)
+            if kind in dropcol:
+                df = df.drop(columns=list(dropcol[kind]), errors="ignore")
+            if df.empty:
+                continue
+
+            df.insert(0, "City", city)
+            if kind == "建物" and "Building_Completion_Date" in df:
+                df = split_completion_date(df)
+            res.setdefault(kind, []).append(df)
+    return res
+
+
+def _workbook_task(path: str, **kwargs) -> Tuple[str, Dict[str, List[pd.DataFrame]], float, Optional[str]]:
+    start = time.perf_counter()
+    try:
+        frames = read_raw_workbook(path, **kwargs)
+        error = None
+    except Exception as e:  # 單檔失敗不影響其他縣市，彙整後再處理
+        frames, error = {}, f"{type(e).__name__}: {e}"
+    return path, frames, time.perf_counter() - start, error
+
+
+def ingest_raw_excels(
+    paths: Iterable[str],
+    colname: Mapping[str, Mapping[str, str]],
+    dropcol: Mapping[str, Sequence[str]],
+    cityname: Mapping[str, str],
+    n_workers: Optional[int] = None,
+    only_mapped: bool = True,
+    skip_unknown_city: bool = False,
+    raise_on_error: bool = True,
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    平行讀取各縣市 list_*.xls。
+
+    Parameters
+    ----------
+    paths : iterable of str
+        workbook 路徑。
+    colname / dropcol / cityname : mapping
+        欄位對照、要 drop 的欄位、縣市代碼（config 的 COLNAME / DROPCOL / CITYNAME）。
+    n_workers : int, optional
+        程序數，預設 min(檔案數, CPU 核心數)；1 表示在本程序依序讀取。
+    only_mapped : bool
+        只讀 colname 有對應的欄位。
+    skip_unknown_city : bool
+        檔名對不到縣市代碼時跳過該檔（HPM_half_year_renew 的行為）；False 時 City 為空值。
+    raise_on_error : bool
+        有檔案讀取失敗時，在全部讀完後丟 RuntimeError（列出失敗檔案）。
+
+    Returns
+    -------
+    (frames, report)
+        frames：{"建物": df, "不動產買賣": df}，依 paths 順序 concat
+        report：逐檔 path / city / sheets / rows / seconds / error
+    """
+    paths = list(paths)
+    if skip_unknown_city:
+        skipped = [p for p in paths if city_of(p, cityname) is None]
+        for p in skipped:
+            print(f"[DGIS raw] 找不到縣市代碼，略過：{basename(p)}")
+        paths = [p for p in paths if p not in skipped]
+
+    n_workers = min(len(paths), os.cpu_count() or 1) if n_workers is None else int(n_workers)
+    task = partial(_workbook_task, colname=colname, dropcol=dropcol, cityname=cityname, only_mapped=only_mapped)
+
+    start = time.perf_counter()
+    if n_workers <= 1:
+        results = [task(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(task, paths))
+
+    parts: Dict[str, List[pd.DataFrame]] = {kind: [] for kind in RAW_SHEETS}
+    rows = []
+    for path, frames, seconds, error in results:
+        for kind, dfs in frames.items():
+            parts[kind].extend(dfs)
+        rows.append({
+            "path": path,
+            "city": city_of(path, cityname),
+            "sheets": ",".join(f"{kind}×{len(dfs)}" for kind, dfs in frames.items()),
+            "rows": sum(len(df) for dfs in frames.values() for df in dfs),
+            "seconds": round(seconds, 3),
+            "error": error,
+        })
+    report = pd.DataFrame(rows, columns=REPORT_COLS)
+
+    combined = {kind: pd.concat(dfs, ignore_index=True) for kind, dfs in parts.items() if dfs}
+    failed = report.loc[report["error"].notna()]
+    print(
+        f"[DGIS raw] {len(report)} 檔（{n_workers} 程序），失敗 {len(failed)} 檔，"
+        f"耗時 {time.perf_counter() - start:.1f}s（逐檔合計 {report['seconds'].sum():.1f}s）"
+    )
+    if raise_on_error and not failed.empty:
+        detail = "\n".join(f"  {p}：{e}" for p, e in zip(failed["path"], failed["error"]))
+        raise RuntimeError(f"DGIS 原始檔讀取失敗：\n{detail}")
+    return combined, report
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+AccurateEstimation 回傳結果的串流解析
+
+HPM_verify_API 第 5 段原本在迴圈內對每一筆結果
+    pcsm_input = pd.concat([pcsm_input, pcsm_in_tmp])
+（PCSM output / LVR / CTBC_Inside 也一樣），每次 concat 都複製整張表，案件數一多就是平方成長。
+
+這裡改成：
+    - ColumnBuffer：逐筆把 dict 放進「欄位 → list」的緩衝區，最後一次建成 DataFrame
+    - ApiResultParser：吃 call_api 的回傳 tuple，同時累加 PCSM input / output、LVR、CTBC_Inside
+      consume() 為 generator，可直接接在 ThreadPoolExecutor.map 後面，API 還在跑就開始解析
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+from wagebound.config.config import comparecase_select
+
+# 缺欄位時補的值（與 pd.concat 對齊欄位時補 NaN 相同）
+MISSING = np.nan
+
+
+class ColumnBuffer:
+    """以欄位為單位累加 dict 紀錄，最後一次建成 DataFrame（欄位順序依首次出現）。"""
+
+    def __init__(self) -> None:
+        self._cols: Dict[str, List[Any]] = {}
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, record: Mapping[str, Any], **extra: Any) -> None:
+        """加入一筆紀錄；extra 會覆蓋 / 追加欄位（例如 applno、CollateralNo）。"""
+        row = {**record, **extra} if extra else record
+        for key in row:
+            if key not in self._cols:
+                self._cols[key] = [MISSING] * self._n
+        for key, col in self._cols.items():
+            col.append(row.get(key, MISSING))
+        self._n += 1
+
+    def extend(self, records: Iterable[Mapping[str, Any]], **extra: Any) -> None:
+        for record in records:
+            self.append(record, **extra)
+
+    def to_frame(self) -> pd.DataFrame:
+        if not self._n:
+            return pd.DataFrame()
+        return pd.DataFrame(self._cols)
+
+
+class ApiResultParser:
+    """
+    call_api 結果 (caseno, collateralno, output_json, input_json, conn) 的累加器。
+
+    Parameters
+    ----------
+    verbose : bool
+        True 時與原本腳本一樣印出連線失敗 / PCSM 結構錯誤的案件。
+    """
+
+    STATUS_OK = "ok"
+    STATUS_CONN_FAIL = "conn_fail"
+    STATUS_PCSM_ERROR = "pcsm_error"
+
+    def __init__(self, verbose: bool = True) -> None:
+        self.verbose = verbose
+        self.pcsm_input = ColumnBuffer()
+        self.pcsm_output = ColumnBuffer()
+        self.lvr = ColumnBuffer()
+        self.ctbc_inside = ColumnBuffer()
+        # (caseno, collateralno, status)，非 ok 的案件
+        self.skipped: List[Tuple[Any, Any, str]] = []
+
+    def add(self, result: Tuple[Any, ...]) -> str:
+        """解析單筆 call_api 結果，回傳狀態（ok / conn_fail / pcsm_error）。"""
+        caseno, collateralno, apioutput, _input_data, conn = result
+        if not conn:
+            if self.verbose:
+                print("連線失敗：", caseno)
+            self.skipped.append((caseno, collateralno, self.STATUS_CONN_FAIL))
+            return self.STATUS_CONN_FAIL
+
+        pcsm = apioutput.get("PerformanceStatistic", {})
+        if "PCSMINPUT" not in pcsm or "PCSMOUTPUT" not in pcsm:
+            if self.verbose:
+                print("PCSM 結構錯誤：", caseno)
+            self.skipped.append((caseno, collateralno, self.STATUS_PCSM_ERROR))
+            return self.STATUS_PCSM_ERROR
+
+        key = {"applno": caseno, "CollateralNo": collateralno}
+        self.pcsm_input.append(pcsm["PCSMINPUT"], **key)
+        self.pcsm_output.append(pcsm["PCSMOUTPUT"], **key)
+
+        comparecase = comparecase_select(apioutput["Result"]["CompareCase"])
+        self.lvr.extend((f.get("properties", {}) for f in comparecase.get("LVR", [])), **key)
+        self.ctbc_inside.extend((f.get("properties", {}) for f in comparecase.get("CTBC_Inside", [])), **key)
+        return self.STATUS_OK
+
+    def consume(self, results: Iterable[Tuple[Any, ...]]) -> Iterator[Tuple[Tuple[Any, ...], str]]:
+        """逐筆解析並 yield (原始結果, 狀態)；results 可為還在產生中的 iterator。"""
+        for result in results:
+            yield result, self.add(result)
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        """建出四張表：pcsm_input / pcsm_output / lvr / ctbc_inside。"""
+        return {
+            "pcsm_input": self.pcsm_input.to_frame(),
+            "pcsm_output": self.pcsm_output.to_frame(),
+            "lvr": self.lvr.to_frame(),
+            "ctbc_inside": self.ctbc_inside.to_frame(),
+        }
+
+
+def parse_api_results(results: Iterable[Tuple[Any, ...]], verbose: bool = True) -> Dict[str, pd.DataFrame]:
+    """一次解析全部 call_api 結果，回傳 ApiResultParser.frames()。"""
+    parser = ApiResultParser(verbose=verbose)
+    for _ in parser.consume(results):
+        pass
+    return parser.frames()
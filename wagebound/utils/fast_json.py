@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 解碼層
+
+AccurateEstimation 回傳的 CompareCase / FeatureData 動輒數 MB，
+原本一律用 resp.json() / json.loads，MultiLOG 的 Input 行更是走 ast.literal_eval。
+
+本模組提供可替換的解碼後端：
+    - 後端依序嘗試 orjson → ujson → 標準庫 json（set_backend 可手動指定）
+    - loads(data)                ：整份解碼（回應會整份寫入快取 / checkpoint，不做只取子樹的局部解碼；
+                                   CompareCase 本身就佔回應大半，局部解碼省不了多少）
+    - loads_log_literal(raw)     ：LOG 的 Input 行先試 JSON，失敗才退回 ast.literal_eval
+    - benchmark(...)             ：比較各後端的解碼耗時（python -m wagebound.utils.fast_json）
+"""
+
+from __future__ import annotations
+
+import ast
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+Raw = Union[str, bytes, bytearray]
+
+
+# ----------------------------------------------------------------------
+# 後端
+# ----------------------------------------------------------------------
+def _stdlib_loads(data: Raw) -> Any:
+    return json.loads(data)
+
+
+def _available_backends() -> Dict[str, Callable[[Raw], Any]]:
+    backends: Dict[str, Callable[[Raw], Any]] = {}
+    try:
+        import orjson
+
+        backends["orjson"] = orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+
+        backends["ujson"] = ujson.loads
+    except ImportError:
+        pass
+    backends["json"] = _stdlib_loads
+    return backends
+
+
+BACKENDS: Dict[str, Callable[[Raw], Any]] = _available_backends()
+_backend_name: str = next(iter(BACKENDS))
+
+
+def set_backend(name: str) -> None:
+    """指定解碼後端（orjson / ujson / json），未安裝時丟 KeyError。"""
+    global _backend_name
+    if name not in BACKENDS:
+        raise KeyError(f"JSON 後端未安裝：{name}（可用：{list(BACKENDS)}）")
+    _backend_name = name
+
+
+def backend_name() -> str:
+    return _backend_name
+
+
+def loads(data: Raw) -> Any:
+    """以目前的後端整份解碼。"""
+    return BACKENDS[_backend_name](data)
+
+
+# ----------------------------------------------------------------------
+# LOG Input 行
+# ----------------------------------------------------------------------
+def loads_log_literal(raw: str) -> Any:
+    """
+    LOG Input 行：若是 JSON（雙引號 key）直接用快速後端，
+    否則（Python dict 字面值，單引號 / True / None）退回 ast.literal_eval。
+    """
+    head = raw.lstrip()[:2]
+    if head.startswith("{") and head != "{'":
+        try:
+            return loads(raw)
+        except ValueError:
+            pass
+    return ast.literal_eval(raw)
+
+
+# ----------------------------------------------------------------------
+# benchmark
+# ----------------------------------------------------------------------
+def sample_response(
+    n_features: int = 2000,
+    seed: int = 0,
+    case_no: str = "20230802EI00023_0",
+    collateral_no: str = "30201",
+    zip_code: str = "100",
+) -> Dict[str, Any]:
+    """
+    產生與 AccurateEstimation 回傳結構相同的假資料（dict）：
+        Success / Message / Result（CaseNo、CollateralNo、ZipCode、ResultFile、CompareCase）/ PerformanceStatistic
+    CompareCase 為 LVR 與 CTBC_Inside 兩組，共 n_features 筆；同樣的參數產生同樣的內容。
+    """
+    import random
+
+    rng = random.Random(seed)
+
+    def feature(i: int) -> Dict[str, Any]:
+        return {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [rng.uniform(1.6e5, 3.5e5), rng.uniform(2.4e6, 2.8e6)]},
+            "properties": {
+                "CaseNo": f"CASE{i:08d}",
+                "Address": f"台北市中正區某某路{i}號{rng.randint(1, 20)}樓",
+                "UnitPrice": round(rng.uniform(20, 120), 4),
+                "BuildingArea": round(rng.uniform(10, 90), 2),
+                "Age": round(rng.uniform(0, 50), 1),
+                "FloorCode": str(rng.randint(1, 30)),
+                "Distance": round(rng.uniform(0, 1500), 2),
+                "CommunityNbr": rng.choice(["", "C0001", "C0002"]),
+            },
+        }
+
+    half = n_features // 2
+    return {
+        "Success": True,
+        "Message": "",
+        "Result": {
+            "CaseNo": case_no,
+            "CollateralNo": collateral_no,
+            "ZipCode": zip_code,
+            "ResultFile": {"Files": [f"file{i}.png" for i in range(20)]},
+            "CompareCase": [
+                {"CaseType": "LVR", "FeatureData": {"type": "FeatureCollection", "features": [feature(i) for i in range(half)]}},
+                {
+                    "CaseType": "CTBC_Inside",
+                    "FeatureData": {"type": "FeatureCollection", "features": [feature(i) for i in range(half, n_features)]},
+                },
+            ],
+        },
+        "PerformanceStatistic": {
+            "PCSMINPUT": {f"X{i:02d}": rng.random() for i in range(60)},
+            "PCSMOUTPUT": {f"Y{i:02d}": rng.random() for i in range(30)},
+        },
+    }
+
+
+def make_sample_response(n_features: int = 2000, seed: int = 0) -> bytes:
+    """sample_response 的 JSON bytes（benchmark 用）。"""
+    return json.dumps(sample_response(n_features, seed), ensure_ascii=False).encode("utf8")
+
+
+def benchmark(samples: Optional[List[Raw]] = None, repeat: int = 5):
+    """
+    各後端的解碼耗時（毫秒，取 repeat 次中最快的一次）。
+    samples 不給時使用 make_sample_response 產生 200 / 2000 / 20000 筆 features 的樣本。
+    """
+    import pandas as pd
+
+    if samples is None:
+        samples = [make_sample_response(n) for n in (200, 2000, 20000)]
+
+    rows = []
+    for data in samples:
+        for name, func in BACKENDS.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(data)
+                best = min(best, time.perf_counter() - start)
+            rows.append({"size_kb": round(len(data) / 1024), "backend": name, "ms": round(best * 1000, 2)})
+    return pd.DataFrame(rows).pivot_table(index="size_kb", columns="backend", values="ms")
+
+
+if __name__ == "__main__":
+    print(f"目前後端：{backend_name()}")
+    print(benchmark())
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+FishID 網格查詢（整數索引）
+
+HPM_verify.fishID_get 原本的做法：
+    1. X / Y 取千位以下的餘數，分四輪 boolean mask 對齊到 100 / 300 / 500 / 700 / 900
+    2. 座標轉字串
+    3. 與 import 時讀入的 FishID.xlsx（P_X / P_Y / FishID，全部字串）merge
+
+這裡改成：
+    - snap_coordinate：以比較運算一次算出對齊後的座標，結果與四輪 mask 相同
+    - pack_keys      ：(P_X, P_Y) 打包成一個 int64
+    - FishIDGrid     ：排序好的 int64 key 與對應的 FishID，查詢為一次 searchsorted
+    - load_fishid_grid：第一次從 Excel 建立索引並存成 .npz（檔名帶來源 mtime / size），之後直接讀 .npz
+    - compare_fishid ：與其他來源（例如以前 SAS 算的結果）逐筆比對
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from glob import escape, glob
+from os.path import basename, dirname, exists, join
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# 千位以下對齊的格點（200 m 網格中心）
+SNAP_POINTS = (100, 300, 500, 700, 900)
+
+# 查不到時的 FishID（與原本 merge 後 fillna("0") 相同）
+MISSING_FISHID = "0"
+
+# P_Y 佔低 32 位元
+_KEY_SHIFT = 32
+_KEY_LIMIT = 1 << 31
+
+
+# ----------------------------------------------------------------------
+# 座標對齊 / key
+# ----------------------------------------------------------------------
+def snap_coordinate(values) -> np.ndarray:
+    """
+    把 TWD97 座標對齊到千位內的 SNAP_POINTS，回傳 float64（NaN 保留）。
+
+    與原本規則相同：餘數 < 100 為 100、> 900 為 900，
+    其餘落在 (100, 300]、(300, 500] ... 區間時，超過中點取上界、否則取下界。
+    """
+    v = pd.to_numeric(pd.Series(values)).to_numpy(dtype="float64")
+    base = np.floor(v * 0.001)
+    # 與原本相同的浮點運算取餘數，邊界值的判斷才會一致
+    rest = (v * 0.001 - base) * 1000
+
+    # 超過幾個中點（200 / 400 / 600 / 800）就往上跳幾格
+    steps = sum((rest > (lo + hi) / 2).astype("int64") for lo, hi in zip(SNAP_POINTS[:-1], SNAP_POINTS[1:]))
+    snapped = SNAP_POINTS[0] + (SNAP_POINTS[1] - SNAP_POINTS[0]) * steps
+    return np.where(np.isnan(v), np.nan, base * 1000 + snapped)
+
+
+def pack_keys(px, py) -> np.ndarray:
+    """(P_X, P_Y) → int64 key；缺值或超出範圍的座標為 -1（查不到）。"""
+    px = np.asarray(px, dtype="float64")
+    py = np.asarray(py, dtype="float64")
+    ok = ~np.isnan(px) & ~np.isnan(py) & (px >= 0) & (py >= 0) & (px < _KEY_LIMIT) & (py < _KEY_LIMIT)
+    keys = np.full(len(px), -1, dtype="int64")
+    keys[ok] = (px[ok].astype("int64") << _KEY_SHIFT) | py[ok].astype("int64")
+    return keys
+
+
+# ----------------------------------------------------------------------
+# 索引
+# ----------------------------------------------------------------------
+class FishIDGrid:
+    """
+    排序好的 (P_X, P_Y) key 與 FishID。
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        pack_keys 的結果（已排序、不重複）。
+    fishids : np.ndarray
+        對應的 FishID（字串）。
+    """
+
+    def __init__(self, keys: np.ndarray, fishids: np.ndarray) -> None:
+        self.keys = np.asarray(keys, dtype="int64")
+        self.fishids = np.asarray(fishids, dtype=str)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __repr__(self) -> str:
+        return f"FishIDGrid({len(self):,} cells)"
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, col_x: str = "P_X", col_y: str = "P_Y", col_id: str = "FishID") -> "FishIDGrid":
+        """由 FishID 對照表（P_X / P_Y / FishID）建立；同一格重複時保留第一筆（原本 merge 會多出列）。"""
+        keys = pack_keys(pd.to_numeric(df[col_x], errors="coerce"), pd.to_numeric(df[col_y], errors="coerce"))
+        fishids = df[col_id].astype(str).to_numpy()
+
+        valid = keys >= 0
+        if (~valid).any():
+            print(f"[FishID] 對照表有 {int((~valid).sum())} 筆座標無法轉成整數，已略過")
+        keys, fishids = keys[valid], fishids[valid]
+
+        order = np.argsort(keys, kind="stable")
+        keys, fishids = keys[order], fishids[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        if (~first).any():
+            print(f"[FishID] 對照表有 {int((~first).sum())} 筆重複座標，保留第一筆")
+        return cls(keys[first], fishids[first])
+
+    @classmethod
+    def load(cls, path: str) -> "FishIDGrid":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["keys"], data["fishids"])
+
+    def save(self, path: str) -> None:
+        np.savez(path, keys=self.keys, fishids=self.fishids)
+
+    def lookup_keys(self, keys: np.ndarray, default: str = MISSING_FISHID) -> np.ndarray:
+        """int64 key → FishID（object 陣列），查不到為 default。"""
+        keys = np.asarray(keys, dtype="int64")
+        out = np.full(len(keys), default, dtype=object)
+        if not len(self.keys):
+            return out
+        pos = np.searchsorted(self.keys, keys).clip(0, len(self.keys) - 1)
+        hit = (self.keys[pos] == keys) & (keys >= 0)
+        out[hit] = self.fishids[pos[hit]]
+        return out
+
+    def lookup(self, x, y, default: str = MISSING_FISHID) -> np.ndarray:
+        """原始 X / Y 座標 → FishID（先對齊網格再查）。"""
+        return self.lookup_keys(pack_keys(snap_coordinate(x), snap_coordinate(y)), default)
+
+
+# ----------------------------------------------------------------------
+# 讀取 / 快取
+# ----------------------------------------------------------------------
+def grid_cache_path(path: str, cache_dir: Optional[str] = None) -> str:
+    """快取檔名：{來源檔名}.grid.{mtime_ns}_{size}.npz"""
+    st = os.stat(path)
+    return join(cache_dir or dirname(path), f"{basename(path)}.grid.{st.st_mtime_ns}_{st.st_size}.npz")
+
+
+def load_fishid_grid(path: str, cache: bool = True, cache_dir: Optional[str] = None) -> FishIDGrid:
+    """
+    讀取 FishID 對照表（FishID.xlsx）並建立 FishIDGrid。
+    cache=True 時使用 / 建立 .npz 快取，來源 mtime 或 size 改變時自動重建。
+    """
+    start = time.perf_counter()
+    cache_path = grid_cache_path(path, cache_dir) if cache else None
+    if cache_path and exists(cache_path):
+        grid = FishIDGrid.load(cache_path)
+        source = "npz"
+    else:
+        grid = FishIDGrid.from_frame(pd.read_excel(path, dtype=str))
+        source = "excel"
+        if cache_path:
+            for old in glob(join(dirname(cache_path), f"{escape(basename(path))}.grid.*.npz")):
+                os.remove(old)
+            grid.save(cache_path)
+    print(f"[FishID] {basename(path)}：{len(grid):,} 格（{source}，{time.perf_counter() - start:.1f}s）")
+    return grid
+
+
+# ----------------------------------------------------------------------
+# 比對
+# ----------------------------------------------------------------------
+FISHID_STATUS = ("match", "mismatch", "only_native", "only_reference")
+
+
+def compare_fishid(
+    native: pd.DataFrame,
+    reference: pd.DataFrame,
+    key: str = "DRPD_Number",
+    col: str = "DRPD_FishId",
+) -> pd.DataFrame:
+    """
+    比對兩份 FishID 結果（例如程式內計算 vs 舊的 SAS 輸出），每個 key 一列：
+        key / native / reference / status（FISHID_STATUS）
+    缺值視為 MISSING_FISHID；同一個 key 重複時各自保留第一筆。
+    """
+    sides = {}
+    for name, df in (("native", native), ("reference", reference)):
+        part = df[[key, col]].astype(str).where(df[[key, col]].notna())
+        dup = part[key].duplicated()
+        if dup.any():
+            print(f"[FishID] {name} 有 {int(dup.sum())} 筆重複 {key}，保留第一筆")
+        sides[name] = part.loc[~dup].rename(columns={col: name})
+
+    res = sides["native"].merge(sides["reference"], on=key, how="outer", indicator=True)
+    native_id = res["native"].fillna(MISSING_FISHID).str.strip()
+    reference_id = res["reference"].fillna(MISSING_FISHID).str.strip()
+    res["status"] = np.select(
+        [res["_merge"] == "left_only", res["_merge"] == "right_only", native_id == reference_id],
+        ["only_native", "only_reference", "match"],
+        default="mismatch",
+    )
+    res = res.drop(columns="_merge")
+
+    counts = res["status"].value_counts().reindex(FISHID_STATUS, fill_value=0)
+    print("[FishID] 比對結果：" + "，".join(f"{k} {v:,}" for k, v in counts.items()))
+    return res
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+多表輸出（Excel / Parquet / Feather）
+
+HPM_verify_API、MultiLOG、SimilarityAnalysisJson 都用 pd.ExcelWriter 寫多個 sheet，
+aggregate_similarity_excels 再把這些 Excel 全部讀回來 concat；資料量一大，時間幾乎都花在 Excel 讀寫。
+
+這裡把「一組表」的輸出抽成一層：
+    - fmt="excel"          ：{out_path}.xlsx，每張表一個 sheet（原本的行為）
+    - fmt="parquet"/"feather"：{out_path}/ 資料夾，每張表一個檔案，另存 _sheets.json 記錄表的順序
+    - read_frames          ：依路徑自動判斷格式讀回 {表名: DataFrame}
+    - export_excel         ：把欄式資料夾轉成 Excel（最後交付時才做）
+欄式格式中 dict / list 欄以 JSON 字串儲存、混雜型別欄以 JSON / pickle 儲存，讀回時還原。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+from os.path import exists, isdir, join, splitext
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+OUTPUT_FORMATS = ("excel", "parquet", "feather")
+_EXT = {"parquet": ".parquet", "feather": ".feather"}
+_SHEETS_FILE = "_sheets.json"
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"不支援的輸出格式：{fmt}（可用：{OUTPUT_FORMATS}）")
+
+
+# 寫檔前編碼過的欄位記在 schema metadata：{欄名: "json" | "pickle"}，讀回時還原
+_ENCODED_KEY = b"frame_store.encoded"
+
+# JSON 能原樣還原的純量型別（bool 要放在 int 前判斷，這裡用 type() 精確比對）
+_JSON_SCALARS = frozenset({str, int, float, bool})
+_NESTED = (dict, list, tuple)
+
+
+def _column_encoding(values: pd.Series) -> Optional[str]:
+    """
+    object 欄（已去掉缺值）需要的編碼：
+        - 含 dict / list / tuple      → "json"（讀回為 dict / list；寫 Excel 時是可讀的 JSON 字串）
+        - 混雜多種純量型別（10 與 "x"）→ 全為 str / int / float / bool 時 "json"，否則 "pickle"
+        - 單一型別                     → None（直接交給 pyarrow）
+    """
+    kinds = {type(v) for v in values}
+    if any(issubclass(k, _NESTED) for k in kinds):
+        return "json"
+    if len(kinds) <= 1:
+        return None
+    return "json" if kinds <= _JSON_SCALARS else "pickle"
+
+
+def _encode_column(s: pd.Series, how: str) -> pd.Series:
+    """非缺值逐格編碼，缺值保留為 None。"""
+    if how == "json":
+        encode = lambda v: json.dumps(v, ensure_ascii=False, default=str)
+    else:
+        encode = pickle.dumps
+    out = s.astype(object).where(s.notna(), None)
+    mask = out.notna()
+    out[mask] = out[mask].map(encode)
+    return out
+
+
+def _decode_column(s: pd.Series, how: str) -> pd.Series:
+    decode = json.loads if how == "json" else pickle.loads
+    out = s.astype(object).where(s.notna(), None)
+    mask = out.notna()
+    out[mask] = out[mask].map(decode)
+    return out
+
+
+def _nested_to_json(df: pd.DataFrame) -> pd.DataFrame:
+    """Excel 輸出用：dict / list 欄轉成 JSON 字串，其餘欄位不動。"""
+    out = df
+    for col in df.columns:
+        if df[col].dtype == object and any(isinstance(v, _NESTED) for v in df[col].dropna()):
+            if out is df:
+                out = df.copy()
+            out[col] = _encode_column(df[col], "json")
+    return out
+
+
+def _encode_objects(df: pd.DataFrame, pickle_all: bool = False) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    pyarrow 無法原樣保存的 object 欄先編碼，回傳 (新的 DataFrame, {欄名: 編碼})。
+    pickle_all=True 時其餘 object 欄一律 pickle（直接寫入失敗時的退路）。
+    """
+    encoded: Dict[str, str] = {}
+    out = df
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        how = _column_encoding(df[col].dropna())
+        if how is None and pickle_all:
+            how = "pickle"
+        if how is None:
+            continue
+        if out is df:
+            out = df.copy()
+        out[col] = _encode_column(df[col], how)
+        encoded[str(col)] = how
+    return out, encoded
+
+
+def _to_arrow(df: pd.DataFrame, encoded: Mapping[str, str], index: bool):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=index)
+    if encoded:
+        meta = dict(table.schema.metadata or {})
+        meta[_ENCODED_KEY] = json.dumps(dict(encoded), ensure_ascii=False).encode("utf8")
+        table = table.replace_schema_metadata(meta)
+    return table
+
+
+def write_table(df: pd.DataFrame, path: str, fmt: str = "parquet") -> None:
+    """
+    寫單一張表（parquet / feather）。
+    含 dict / list 或混雜型別的 object 欄先編碼（JSON / pickle）並記在 schema metadata，
+    read_table 讀回時還原成原本的值。
+    """
+    try:
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("寫入 Parquet / Feather 需要安裝 pyarrow") from e
+
+    if fmt == "feather":
+        # feather 不存 index
+        df = df.reset_index(drop=True)
+
+    def write(pickle_all: bool) -> None:
+        data, encoded = _encode_objects(df, pickle_all=pickle_all)
+        table = _to_arrow(data, encoded, index=False)
+        if fmt == "parquet":
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+
+    try:
+        write(pickle_all=False)
+    except (TypeError, ValueError, NotImplementedError):
+        # 單一型別但 pyarrow 不認得的物件（例如自訂類別）
+        write(pickle_all=True)
+
+
+def _encoded_columns(path: str) -> Dict[str, str]:
+    """讀 schema metadata 中記錄的編碼欄位（只讀 footer / schema，不讀資料）。"""
+    if path.endswith(".feather"):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            meta = pa.ipc.open_file(source).schema.metadata
+    else:
+        import pyarrow.parquet as pq
+
+        meta = pq.read_schema(path).metadata
+    raw = (meta or {}).get(_ENCODED_KEY)
+    return json.loads(raw) if raw else {}
+
+
+def read_table(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """讀 write_table 的輸出，編碼過的 object 欄還原成原本的值（dict / list / 混雜型別）。"""
+    cols = list(columns) if columns else None
+    if path.endswith(".feather"):
+        df = pd.read_feather(path, columns=cols)
+    else:
+        df = pd.read_parquet(path, columns=cols)
+    encoded = _encoded_columns(path)
+    for col in df.columns:
+        how = encoded.get(str(col))
+        if how is not None:
+            df[col] = _decode_column(df[col], how)
+    return df
+
+
+def output_path(out_path: str, fmt: str) -> str:
+    """去掉副檔名後，Excel 加 .xlsx，欄式格式為資料夾。"""
+    _check_format(fmt)
+    stem = splitext(out_path)[0] if out_path.lower().endswith(".xlsx") else out_path
+    return f"{stem}.xlsx" if fmt == "excel" else stem
+
+
+def write_frames(frames: Mapping[str, pd.DataFrame], out_path: str, fmt: str = "excel") -> str:
+    """
+    把 {表名: DataFrame} 寫成 Excel（多 sheet）或欄式資料夾，回傳實際寫入的路徑。
+    out_path 可帶或不帶 .xlsx。
+    """
+    path = output_path(out_path, fmt)
+    if fmt == "excel":
+        with pd.ExcelWriter(path) as writer:
+            for sheet, df in frames.items():
+                _nested_to_json(df).to_excel(writer, sheet_name=sheet, index=False)
+        return path
+
+    os.makedirs(path, exist_ok=True)
+    for sheet, df in frames.items():
+        write_table(df, join(path, f"{sheet}{_EXT[fmt]}"), fmt)
+    with open(join(path, _SHEETS_FILE), "w", encoding="utf8") as f:
+        json.dump({"format": fmt, "sheets": list(frames)}, f, ensure_ascii=False)
+    return path
+
+
+def is_frame_dir(path: str) -> bool:
+    return isdir(path) and exists(join(path, _SHEETS_FILE))
+
+
+def read_frames(path: str, sheets: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+    """讀回 write_frames 的輸出（.xlsx 或欄式資料夾），sheets 可只讀部分表。"""
+    if not is_frame_dir(path):
+        return pd.read_excel(path, sheet_name=list(sheets) if sheets else None)
+
+    with open(join(path, _SHEETS_FILE), encoding="utf8") as f:
+        meta = json.load(f)
+    ext = _EXT[meta["format"]]
+    names = list(sheets) if sheets else meta["sheets"]
+    return {name: read_table(join(path, f"{name}{ext}")) for name in names}
+
+
+def export_excel(frame_dir: str, excel_path: Optional[str] = None) -> str:
+    """欄式資料夾 → Excel（預設為同名 .xlsx），回傳 Excel 路徑。"""
+    excel_path = excel_path or f"{frame_dir.rstrip(os.sep)}.xlsx"
+    return write_frames(read_frames(frame_dir), excel_path, fmt="excel")
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+LOG 增量解析（已處理檔案清單 + 欄式儲存）
+
+MultiLOG 每次執行都重新解析資料夾內全部 LOG，再從頭寫兩個 Excel。
+LogStore 把解析結果留在 store_dir：
+    - manifest.parquet ：已解析檔案的 path / size / mtime_ns / sha256
+    - {key}.parquet    ：六張表各一個檔，多一欄 SOURCE_COL 記錄來源 LOG
+
+重跑時：
+    - size 與 mtime 都沒變 → 視為未變更，不讀檔
+    - size 或 mtime 有變 → 計算 sha256，與 manifest 相同只更新 mtime，不同才重新解析
+    - 資料夾中已不存在的檔案 → 從各表移除
+解析失敗的檔案不寫進 manifest，下次會再試一次。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, join
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import pandas as pd
+
+from wagebound.utils.frame_store import read_table, write_table
+
+# 各表記錄來源 LOG 路徑的欄位
+SOURCE_COL = "_log_path"
+
+MANIFEST_NAME = "manifest.parquet"
+MANIFEST_COLS = ["path", "size", "mtime_ns", "sha256"]
+
+# ingest(paths, source_col=...) -> (frames, errors)，即 MultiLOG.ingest_logs
+Ingest = Callable[..., Tuple[Dict[str, pd.DataFrame], pd.DataFrame]]
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_files(paths: Iterable[str]) -> pd.DataFrame:
+    """回傳 path / size / mtime_ns，不存在的檔案略過。"""
+    rows = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        rows.append({"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+    return pd.DataFrame(rows, columns=["path", "size", "mtime_ns"])
+
+
+class LogStore:
+    """
+    Parameters
+    ----------
+    store_dir : str
+        manifest 與各表 parquet 的存放位置（不存在時自動建立）。
+    keys : sequence of str
+        表名（MultiLOG.FRAME_KEYS）。
+    """
+
+    def __init__(self, store_dir: str, keys: Sequence[str]) -> None:
+        self.store_dir = store_dir
+        self.keys = list(keys)
+        os.makedirs(store_dir, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"LogStore({self.store_dir!r})"
+
+    @property
+    def manifest_path(self) -> str:
+        return join(self.store_dir, MANIFEST_NAME)
+
+    def _frame_path(self, key: str) -> str:
+        return join(self.store_dir, f"{key}.parquet")
+
+    def load_manifest(self) -> pd.DataFrame:
+        if not exists(self.manifest_path):
+            return pd.DataFrame(columns=MANIFEST_COLS)
+        return read_table(self.manifest_path)
+
+    def load_frame(self, key: str, with_source: bool = False) -> pd.DataFrame:
+        path = self._frame_path(key)
+        if not exists(path):
+            return pd.DataFrame()
+        df = read_table(path)
+        return df if with_source else df.drop(columns=[SOURCE_COL], errors="ignore")
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        """目前儲存的六張表（不含 SOURCE_COL），可直接輸出 Excel。"""
+        return {key: self.load_frame(key) for key in self.keys}
+
+    # ------------------------------------------------------------------
+    # 比對
+    # ------------------------------------------------------------------
+    def plan(self, paths: Iterable[str], io_workers: int = 8) -> Dict[str, pd.DataFrame]:
+        """
+        比對 manifest，回傳：
+            parse    ：需要解析的檔案（新增 / 內容有變），含 sha256
+            touched  ：size / mtime 變了但內容相同的檔案（只更新 manifest）
+            unchanged：未變更的 manifest 紀錄
+            removed  ：manifest 有、資料夾已不存在的 path
+            order    ：目前資料夾內的檔案順序
+        """
+        current = scan_files(paths)
+        manifest = self.load_manifest()
+        merged = current.merge(manifest, on="path", how="left", suffixes=("", "_old"))
+
+        same = (merged["size"] == merged["size_old"]) & (merged["mtime_ns"] == merged["mtime_ns_old"])
+        unchanged = manifest[manifest["path"].isin(merged.loc[same, "path"])]
+
+        check = merged.loc[~same, ["path", "size", "mtime_ns", "sha256"]].rename(columns={"sha256": "sha256_old"})
+        with ThreadPoolExecutor(max_workers=io_workers) as pool:
+            check["sha256"] = list(pool.map(file_sha256, check["path"]))
+        same_content = check["sha256"] == check["sha256_old"]
+
+        return {
+            "parse": check.loc[~same_content, MANIFEST_COLS].reset_index(drop=True),
+            "touched": check.loc[same_content, MANIFEST_COLS].reset_index(drop=True),
+            "unchanged": unchanged.reset_index(drop=True),
+            "removed": manifest.loc[~manifest["path"].isin(current["path"]), ["path"]].reset_index(drop=True),
+            "order": current[["path"]],
+        }
+
+    # ------------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------------
+    def update(self, paths: Iterable[str], ingest: Ingest, io_workers: int = 8, **ingest_kwargs) -> pd.DataFrame:
+        """
+        只解析新增 / 變更的 LOG，更新各表與 manifest，回傳本次的錯誤報告。
+        ingest_kwargs 直接傳給 ingest（例如 n_workers）。
+        """
+        known = set(self.load_manifest()["path"])
+        plan = self.plan(paths, io_workers=io_workers)
+        to_parse = plan["parse"]
+        print(
+            f"LOG 增量：新增/變更 {len(to_parse)}，內容未變 {len(plan['touched'])}，"
+            f"未變更 {len(plan['unchanged'])}，已移除 {len(plan['removed'])}"
+        )
+
+        frames, errors = ingest(list(to_parse["path"]), source_col=SOURCE_COL, io_workers=io_workers, **ingest_kwargs)
+        # 之前解析過、現在要換掉或移除的檔案
+        drop = (set(to_parse["path"]) & known) | set(plan["removed"]["path"])
+
+        if drop or any(not df.empty for df in frames.values()):
+            # 依目前資料夾的檔案順序排列，與全量解析的輸出順序一致
+            order = {path: i for i, path in enumerate(plan["order"]["path"])}
+            for key in self.keys:
+                old = self.load_frame(key, with_source=True)
+                if not old.empty:
+                    old = old[~old[SOURCE_COL].isin(drop)]
+                parts: List[pd.DataFrame] = [df for df in (old, frames.get(key)) if df is not None and not df.empty]
+                if not parts:
+                    if exists(self._frame_path(key)):
+                        os.remove(self._frame_path(key))
+                    continue
+                df = pd.concat(parts, ignore_index=True)
+                rank = df[SOURCE_COL].map(order)
+                df = df.iloc[rank.argsort(kind="stable")].reset_index(drop=True)
+                write_table(df, self._frame_path(key))
+
+        failed = set(errors["path"])
+        parsed = to_parse[~to_parse["path"].isin(failed)]
+        manifest = pd.concat(
+            [df for df in (plan["unchanged"], plan["touched"], parsed) if not df.empty] or [pd.DataFrame(columns=MANIFEST_COLS)],
+            ignore_index=True,
+        )
+        write_table(manifest[MANIFEST_COLS], self.manifest_path)
+        return errors
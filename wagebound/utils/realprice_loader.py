@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+實價明細（GEOM_CTBC_RealPriceDetail*.csv）共用讀取器
+
+原本各腳本各讀各的：
+    - SimilarityAnalysisJson.load_actualprice：整份讀入（預設型別推斷）再只留兩欄
+    - landsplit / landsplit_python          ：low_memory=False 整份讀入
+    - actualprice_check                     ：dtype=str 整份讀入
+
+load_realprice 統一處理：
+    - columns      ：只解析需要的欄位（usecols）
+    - typed        ：依 DRPD 欄位型別表讀取（數值欄 float64、其餘字串，郵遞區號等代碼不會掉前導 0）；
+                     False 時全部讀成字串（欄位檢核用）
+    - parse_dates  ：讀入後轉日期的欄位
+    - cache        ：第一次讀取時把整份檔案存成 parquet（檔名帶來源 mtime / size），
+                     來源沒變就直接讀 parquet 並只取需要的欄位；快取放在 config_dgis.PATH_REALPRICE_CACHE，
+                     不會寫進來源資料夾（「上傳DGIS」會整包上傳）。只讀一次的檔案不要開快取，
+                     否則只是多寫一份完整的 parquet
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from glob import escape, glob
+from os.path import abspath, basename, dirname, exists, join
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from wagebound.config.config_dgis import PATH_REALPRICE_CACHE
+from wagebound.utils.frame_store import read_table, write_table
+
+# ----------------------------------------------------------------------
+# DRPD 欄位型別
+# ----------------------------------------------------------------------
+# 數值欄位（面積、價格、座標、屋齡、格局、樓層旗標）
+DRPD_NUMERIC_COLS: List[str] = [
+    "DRPD_LandTransArea",
+    "DRPD_TransArea",
+    "DRPD_TotalPrice",
+    "DRPD_UnitPrice",
+    "DRPD_UnitPriceRevised",
+    "DRPD_TargetX",
+    "DRPD_TargetY",
+    "DRPD_BuildingAge",
+    "DRPD_LayoutBedroom",
+    "DRPD_LayoutLivroom",
+    "DRPD_LayoutBathroom",
+    "DRPD_TransFloorFlag",
+    "DRPD_TotalFloorFlag",
+]
+
+# 日期欄位：讀成字串，parse_dates 指定時才轉 datetime
+DRPD_DATE_COLS: List[str] = ["DRPD_TradeDate", "DRPD_CompletionDate"]
+
+
+def realprice_dtypes(columns: Sequence[str], typed: bool = True) -> Dict[str, object]:
+    """
+    依欄位名稱給 read_csv 的 dtype：
+    typed=True 時 DRPD_NUMERIC_COLS 為 float64，其餘（代碼、名稱、編號、日期、Geom ...）皆為字串；
+    typed=False 時全部為字串。
+    """
+    numeric = set(DRPD_NUMERIC_COLS) if typed else set()
+    return {col: ("float64" if col in numeric else str) for col in columns}
+
+
+# ----------------------------------------------------------------------
+# 讀取
+# ----------------------------------------------------------------------
+def _read_csv(path: str, columns: Sequence[str], typed: bool, sep: str, encoding: str) -> pd.DataFrame:
+    dtype = realprice_dtypes(columns, typed)
+    try:
+        # usecols 不保留順序，依 columns 重新排列
+        return pd.read_csv(path, sep=sep, usecols=list(columns), dtype=dtype, encoding=encoding)[list(columns)]
+    except ValueError:
+        # 數值欄混到無法轉換的值：先讀成字串，再把無法轉換的值設為 NaN
+        numeric = [col for col, t in dtype.items() if t == "float64"]
+        df = pd.read_csv(path, sep=sep, usecols=list(columns), dtype=str, encoding=encoding)
+        for col in numeric:
+            converted = pd.to_numeric(df[col], errors="coerce")
+            bad = int((converted.isna() & df[col].notna()).sum())
+            if bad:
+                print(f"[realprice] {col} 有 {bad} 筆無法轉成數值，已設為 NaN")
+            df[col] = converted
+        return df[list(columns)]
+
+
+def _cache_prefix(path: str, typed: bool) -> str:
+    """
+    {來源檔名}.{來源資料夾雜湊}.{typed|str}：各月份的檔名相同（GEOM_CTBC_RealPriceDetail.csv），
+    以資料夾雜湊區分，清舊快取時才不會刪到別的月份。
+    """
+    folder = hashlib.sha256(dirname(abspath(path)).encode("utf8")).hexdigest()[:8]
+    return f"{basename(path)}.{folder}.{'typed' if typed else 'str'}"
+
+
+def _cache_path(path: str, cache_dir: Optional[str], typed: bool) -> str:
+    """快取檔名：{_cache_prefix}.{mtime_ns}_{size}.parquet，預設放在 PATH_REALPRICE_CACHE。"""
+    st = os.stat(path)
+    return join(cache_dir or PATH_REALPRICE_CACHE, f"{_cache_prefix(path, typed)}.{st.st_mtime_ns}_{st.st_size}.parquet")
+
+
+def _parse_dates(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """與 read_csv(parse_dates=...) 相同：無法轉換的欄位保留原值。"""
+    for col in columns:
+        if col in df.columns:
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except (ValueError, TypeError):
+                print(f"[realprice] {col} 無法轉成日期，保留原值")
+    return df
+
+
+def load_realprice(
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    typed: bool = True,
+    parse_dates: Sequence[str] = (),
+    cache: bool = False,
+    cache_dir: Optional[str] = None,
+    sep: str = "|",
+    encoding: str = "utf8",
+) -> pd.DataFrame:
+    """
+    讀取實價明細。
+
+    Parameters
+    ----------
+    path : str
+        來源 csv（| 分隔）。
+    columns : sequence of str, optional
+        只讀這些欄位，None 為全部；不存在的欄位丟 KeyError。
+    typed : bool
+        True 依 realprice_dtypes 讀取；False 全部讀成字串。
+    parse_dates : sequence of str
+        要轉成 datetime 的欄位（例如 DRPD_DATE_COLS）。
+    cache : bool
+        使用 / 建立 parquet 快取（來源 mtime 或 size 改變時自動重建），適合會重複讀取的檔案。
+    cache_dir : str, optional
+        快取位置，預設 PATH_REALPRICE_CACHE（不存在時自動建立）。
+    """
+    start = time.perf_counter()
+    header = list(pd.read_csv(path, sep=sep, nrows=0, encoding=encoding).columns)
+    if columns is not None:
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise KeyError(f"{basename(path)} 缺少欄位：{missing}")
+    wanted = list(columns) if columns is not None else header
+
+    source = "csv"
+    if cache:
+        cache_path = _cache_path(path, cache_dir, typed)
+        if exists(cache_path):
+            df = read_table(cache_path, columns=wanted)
+            source = "parquet"
+        else:
+            # 快取存整份檔案，之後不同的 columns 都能共用
+            full = _read_csv(path, header, typed, sep, encoding)
+            os.makedirs(dirname(cache_path), exist_ok=True)
+            for old in glob(join(dirname(cache_path), f"{escape(_cache_prefix(path, typed))}.*.parquet")):
+                os.remove(old)
+            write_table(full, cache_path)
+            df = full if columns is None else full[wanted].copy()
+    else:
+        df = _read_csv(path, wanted, typed, sep, encoding)
+
+    df = _parse_dates(df, parse_dates)
+    print(f"[realprice] {basename(path)}：{len(df):,} 筆 × {df.shape[1]} 欄（{source}，{time.perf_counter() - start:.1f}s）")
+    return df
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+參考資料（FishID 網格、郵遞區號表、建築成本參數表 ...）延遲載入
+
+原本這些表在 import 或程式一開始就 pd.read_excel：
+    - HPM_verify          ：import 時讀 FishID.xlsx
+    - HPM_verify / HPM_half_year_renew：讀 ZIP.xlsx
+    - landsplit*          ：讀策略系統參數表（全部 sheet）與建築工程總指數
+只要 import 就得等 Excel I/O，離開公司環境（路徑不存在）甚至無法 import。
+
+ReferenceRegistry 只記錄「怎麼讀」，第一次 get 時才真的讀：
+    - Excel 表第一次讀取後存成 parquet（多 sheet 存成 frame_store 資料夾），
+      檔名帶來源 mtime / size，來源沒變就直接讀快取
+    - FishID 網格使用 fishid_grid 的 .npz 快取
+    - timings() 列出各表的來源（快取 / 原始檔）與讀取秒數
+
+get 回傳的是共用物件，需要修改時請先 copy()。
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from glob import escape, glob
+from os.path import basename, dirname, exists, isdir, join
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from wagebound.config.config_buildcost import PATH_BUILDINDEX, PATH_VARTABLE
+from wagebound.config.config_dgis import PATH_XY, PATH_ZIP
+from wagebound.utils.fishid_grid import grid_cache_path, load_fishid_grid
+from wagebound.utils.frame_store import read_frames, read_table, write_frames, write_table
+
+# loader() -> (資料, 來源說明)
+Loader = Callable[[], Tuple[object, str]]
+
+TIMING_COLS = ["name", "path", "source", "seconds", "loaded_at"]
+
+# 快取格式版本：改變時舊快取視為過期（v2：混雜型別欄保留原值，之前會被轉成字串）
+EXCEL_CACHE_VERSION = 2
+
+
+# ----------------------------------------------------------------------
+# Excel + parquet 快取
+# ----------------------------------------------------------------------
+def _excel_cache_path(path: str, sheet_name: Union[str, int, None], dtype: object, cache_dir: Optional[str]) -> str:
+    """
+    快取檔名：{來源檔名}.{sheet}.{str|raw}.{mtime_ns}_{size}_v{版本}[.parquet]
+    sheet_name=None（全部 sheet）為資料夾。
+    """
+    st = os.stat(path)
+    sheet = "all" if sheet_name is None else str(sheet_name)
+    kind = "str" if dtype is str else "raw"
+    stem = join(cache_dir or dirname(path), f"{basename(path)}.{sheet}.{kind}.{st.st_mtime_ns}_{st.st_size}_v{EXCEL_CACHE_VERSION}")
+    return stem if sheet_name is None else f"{stem}.parquet"
+
+
+def _remove_stale(cache_path: str) -> None:
+    """刪掉同一張表舊版本（mtime / size 不同）的快取。"""
+    name = basename(cache_path)
+    prefix = name.rsplit(".", 2 if name.endswith(".parquet") else 1)[0]
+    for old in glob(join(dirname(cache_path), f"{escape(prefix)}.*")):
+        if old == cache_path:
+            continue
+        if isdir(old):
+            shutil.rmtree(old)
+        else:
+            os.remove(old)
+
+
+def _cacheable(df: pd.DataFrame) -> bool:
+    """parquet 只能存字串欄名，數字欄名（例如年份表頭）寫進去會變成字串，這種表不快取。"""
+    return all(isinstance(col, str) for col in df.columns)
+
+
+def load_excel_table(
+    path: str,
+    sheet_name: Union[str, int, None] = 0,
+    dtype: object = None,
+    cache: bool = True,
+    cache_dir: Optional[str] = None,
+) -> Tuple[Union[pd.DataFrame, Dict[str, pd.DataFrame]], str]:
+    """
+    讀 Excel（參數同 pd.read_excel），回傳 (資料, 來源)。
+    sheet_name=None 時回傳 {sheet: DataFrame}。
+
+    快取以 parquet 儲存，讀回的值與 pd.read_excel 相同：dtype=None 時混雜數字與字串的 object 欄
+    由 frame_store.write_table 編碼（JSON / pickle）後寫入，讀回時還原（[10, "x"] 不會變成 ["10", "x"]）。
+    欄名不全是字串的表（任一 sheet）不快取，每次都讀 Excel。
+    """
+    if not cache:
+        return pd.read_excel(path, sheet_name=sheet_name, dtype=dtype), "excel"
+
+    cache_path = _excel_cache_path(path, sheet_name, dtype, cache_dir)
+    if sheet_name is None:
+        if exists(cache_path):
+            return read_frames(cache_path), "parquet"
+        data = pd.read_excel(path, sheet_name=None, dtype=dtype)
+        _remove_stale(cache_path)
+        if not all(_cacheable(df) for df in data.values()):
+            return data, "excel（欄名非字串，未快取）"
+        write_frames(data, cache_path, fmt="parquet")
+        return data, "excel"
+
+    if exists(cache_path):
+        return read_table(cache_path), "parquet"
+    data = pd.read_excel(path, sheet_name=sheet_name, dtype=dtype)
+    _remove_stale(cache_path)
+    if not _cacheable(data):
+        return data, "excel（欄名非字串，未快取）"
+    write_table(data, cache_path)
+    return data, "excel"
+
+
+# ----------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------
+class _Entry:
+    def __init__(self, loader: Loader, path: str, spec: tuple) -> None:
+        self.loader = loader
+        self.path = path
+        self.spec = spec
+        self.value: object = None
+        self.loaded = False
+        self.source = ""
+        self.seconds = float("nan")
+        self.loaded_at: Optional[pd.Timestamp] = None
+
+
+class ReferenceRegistry:
+    """
+    參考資料登記表：register 只記錄讀取方式，get 第一次呼叫才載入並保留在記憶體。
+
+    Examples
+    --------
+    >>> REFERENCE.get("zip")                      # 第一次：讀 Excel 並建立 parquet 快取
+    >>> REFERENCE.get("zip")                      # 之後：直接回傳記憶體中的表
+    >>> REFERENCE.timings()
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        loaded = sum(e.loaded for e in self._entries.values())
+        return f"ReferenceRegistry({len(self._entries)} tables, {loaded} loaded)"
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    # ------------------------------------------------------------------
+    # 登記
+    # ------------------------------------------------------------------
+    def register(self, name: str, loader: Loader, path: str = "", spec: tuple = ()) -> None:
+        """
+        登記一張表；loader() 回傳 (資料, 來源說明)。
+        同名且 path / spec 相同時保留已載入的資料，不同時覆蓋（下次 get 重新載入）。
+        """
+        with self._lock:
+            old = self._entries.get(name)
+            if old is not None and old.path == path and old.spec == spec and spec:
+                return
+            self._entries[name] = _Entry(loader, path, spec)
+
+    def register_excel(
+        self,
+        name: str,
+        path: str,
+        sheet_name: Union[str, int, None] = 0,
+        dtype: object = None,
+        cache_dir: Optional[str] = None,
+    ) -> None:
+        """登記 Excel 表（parquet 快取），參數同 load_excel_table。"""
+        self.register(
+            name,
+            lambda: load_excel_table(path, sheet_name=sheet_name, dtype=dtype, cache_dir=cache_dir),
+            path=path,
+            spec=("excel", sheet_name, dtype, cache_dir),
+        )
+
+    def register_fishid_grid(self, name: str, path: str, cache_dir: Optional[str] = None) -> None:
+        """登記 FishID 網格（FishID.xlsx → FishIDGrid，.npz 快取）。"""
+
+        def loader() -> Tuple[object, str]:
+            cached = exists(grid_cache_path(path, cache_dir))
+            return load_fishid_grid(path, cache_dir=cache_dir), "npz" if cached else "excel"
+
+        self.register(name, loader, path=path, spec=("fishid_grid", cache_dir))
+
+    # ------------------------------------------------------------------
+    # 取用
+    # ------------------------------------------------------------------
+    def get(self, name: str) -> object:
+        """取得資料，第一次呼叫時載入；未登記的名稱丟 KeyError。"""
+        if name not in self._entries:
+            raise KeyError(f"未登記的參考資料：{name}（已登記：{self.names}）")
+        entry = self._entries[name]
+        if entry.loaded:
+            return entry.value
+        with self._lock:
+            if not entry.loaded:
+                start = time.perf_counter()
+                entry.value, entry.source = entry.loader()
+                entry.seconds = time.perf_counter() - start
+                entry.loaded_at = pd.Timestamp.now()
+                entry.loaded = True
+                print(f"[reference] {name}：{entry.source}，{entry.seconds:.2f}s")
+        return entry.value
+
+    __getitem__ = get
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._entries and self._entries[name].loaded
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """清掉記憶體中的資料（name=None 為全部），下次 get 重新載入（磁碟快取仍保留）。"""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if name is None or key == name:
+                    entry.value, entry.loaded = None, False
+                    entry.source, entry.seconds, entry.loaded_at = "", float("nan"), None
+
+    def timings(self) -> pd.DataFrame:
+        """各表的讀取紀錄：name / path / source / seconds / loaded_at（尚未載入的 source 為空）。"""
+        rows = [
+            {"name": key, "path": e.path, "source": e.source, "seconds": e.seconds, "loaded_at": e.loaded_at}
+            for key, e in self._entries.items()
+        ]
+        return pd.DataFrame(rows, columns=TIMING_COLS)
+
+
+# ----------------------------------------------------------------------
+# 預設登記（只記錄路徑，不會讀檔）
+# ----------------------------------------------------------------------
+REFERENCE = ReferenceRegistry()
+REFERENCE.register_fishid_grid("fishid_grid", PATH_XY)
+REFERENCE.register_excel("zip", PATH_ZIP, dtype=str)
+REFERENCE.register_excel("vartable", PATH_VARTABLE, sheet_name=None)
+REFERENCE.register_excel("buildindex", PATH_BUILDINDEX, sheet_name="月")
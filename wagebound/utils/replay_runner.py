@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+可續跑的 API 回放（checkpoint）
+
+HPM_verify_API 原本整批跑完才 pickleio 存檔，跑到一半中斷就全部白費。
+這裡改成：
+    - ReplayCheckpoint：每完成一筆就 append 一行 JSON（JSON Lines），寫完立即 flush
+      （中斷時最多損失最後一行，讀取時自動略過不完整的行）；整批跑完後 finish() 改名為 .done，
+      下一次執行不會再沿用（checkpoint 只用於中斷續跑）
+    - payload_case_key：key 帶 payload 的 sha256，中斷後來源有改的列會重打，不會沿用舊結果
+    - iter_replay：跳過 checkpoint 中已完成的 (CaseNo, CollateralNo)，其餘丟進 ThreadPoolExecutor，
+      完成一筆就寫一筆；依輸入順序 yield 結果（已完成的直接從 checkpoint 取出）
+    - ReplayProgress：定期印出完成數、每秒筆數與預估剩餘時間
+    - 可搭配 adaptive_limit.AimdLimiter，依延遲 / 錯誤自動調整同時在途的請求數；
+      lookup（例如回應快取）在 limiter 之外先查，命中的不佔名額、也不列入延遲統計
+
+結果格式沿用 call_api 的 tuple：(caseno, collateralno, output_json, input_json, conn)。
+conn 為 False 的結果也會記錄，但 retry_failed=True（預設）時續跑會重打。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from os import replace
+from os.path import exists
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Sequence, Tuple
+
+from wagebound.utils.adaptive_limit import AimdLimiter
+from wagebound.utils.response_cache import payload_key
+
+Result = Tuple[Any, ...]
+
+
+def case_key(payload: Dict[str, Any]) -> Tuple[Any, Any]:
+    """預設 key：CollateralData 的 (CaseNo, CollateralNo)。"""
+    cdata = payload.get("CollateralData", {})
+    return cdata.get("CaseNo"), cdata.get("CollateralNo")
+
+
+def payload_case_key(payload: Dict[str, Any], endpoint: str = "") -> Tuple[Any, Any, str]:
+    """(CaseNo, CollateralNo, payload hash)：與 ResponseCache 相同的 payload_key，payload 有改就視為未完成。"""
+    return (*case_key(payload), payload_key(payload, endpoint))
+
+
+def _key_str(key: Hashable) -> str:
+    return json.dumps(list(key) if isinstance(key, tuple) else key, ensure_ascii=False, default=str)
+
+
+# ----------------------------------------------------------------------
+# checkpoint
+# ----------------------------------------------------------------------
+class ReplayCheckpoint:
+    """append-only 的 JSON Lines checkpoint 檔，可多執行緒同時寫入。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def __repr__(self) -> str:
+        return f"ReplayCheckpoint({self.path!r})"
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """讀出 {key 字串: 紀錄}；同一 key 有多筆時以最後一筆為準，不完整的行略過。"""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["key"]] = record
+        return records
+
+    def append(self, key: Hashable, result: Result) -> None:
+        """寫入一筆完成結果並 flush。"""
+        line = json.dumps(
+            {"key": _key_str(key), "ts": time.time(), "result": list(result)},
+            ensure_ascii=False,
+            default=str,
+        )
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a", encoding="utf8")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def finish(self) -> Optional[str]:
+        """
+        整批完成後呼叫：checkpoint 改名為 {path}.done（覆蓋前一次的），回傳新路徑；沒有 checkpoint 時回傳 None。
+        之後重跑會從頭開始（未變動的 payload 由 ResponseCache 取用），不會重播舊結果。
+        """
+        self.close()
+        if not exists(self.path):
+            return None
+        done_path = f"{self.path}.done"
+        replace(self.path, done_path)
+        return done_path
+
+    def __enter__(self) -> "ReplayCheckpoint":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ----------------------------------------------------------------------
+# 進度
+# ----------------------------------------------------------------------
+class ReplayProgress:
+    """統計完成數、throughput 與 ETA，每 report_every 秒印一次。"""
+
+    def __init__(self, total: int, skipped: int = 0, report_every: float = 30.0, printer: Callable = print) -> None:
+        self.total = total
+        self.skipped = skipped
+        self.report_every = report_every
+        self.printer = printer
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+        self._lock = threading.Lock()
+
+    def tick(self, ok: bool = True) -> None:
+        with self._lock:
+            self.done += 1
+            self.failed += not ok
+            now = time.perf_counter()
+            due = now - self._last >= self.report_every or self.done == self.total
+            if due:
+                self._last = now
+        if due:
+            self.report()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        return {
+            "done": self.done,
+            "total": self.total,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": round(elapsed, 1),
+            "rate": round(rate, 2),
+            "eta": round(remaining / rate, 1) if rate > 0 else None,
+        }
+
+    def report(self) -> None:
+        s = self.snapshot()
+        eta = "-" if s["eta"] is None else time.strftime("%H:%M:%S", time.gmtime(s["eta"]))
+        self.printer(
+            f"[replay] {s['done']}/{s['total']}（略過已完成 {s['skipped']}，失敗 {s['failed']}）"
+            f" {s['rate']} 筆/秒，剩餘約 {eta}"
+        )
+
+
+# ----------------------------------------------------------------------
+# 執行
+# ----------------------------------------------------------------------
+def iter_replay(
+    payloads: Sequence[Dict[str, Any]],
+    func: Callable[[Dict[str, Any]], Result],
+    checkpoint: ReplayCheckpoint,
+    max_workers: int = 10,
+    key_func: Callable[[Dict[str, Any]], Hashable] = case_key,
+    retry_failed: bool = True,
+    report_every: float = 30.0,
+    progress: Optional[ReplayProgress] = None,
+    limiter: Optional[AimdLimiter] = None,
+    lookup: Optional[Callable[[Dict[str, Any]], Optional[Result]]] = None,
+) -> Iterator[Result]:
+    """
+    依輸入順序 yield 每個 payload 的結果。
+
+    Parameters
+    ----------
+    payloads : list of dict
+        要回放的 payload。
+    func : callable
+        單筆呼叫函式（例如 HPM_verify_API.call_api），回傳 call_api 格式的 tuple。
+    checkpoint : ReplayCheckpoint
+        完成結果的寫入位置，也是續跑時判斷已完成的依據。
+    max_workers : int
+        執行緒數（有 limiter 時改為 limiter.max_limit）。
+    key_func : callable
+        payload → key，預設 (CaseNo, CollateralNo)。
+    retry_failed : bool
+        True 時 checkpoint 中 conn=False 的案件會重打。
+    report_every : float
+        進度回報間隔秒數。
+    progress : ReplayProgress, optional
+        自訂進度物件（不給時自動建立）。
+    limiter : AimdLimiter, optional
+        自適應併發控制，同時在途的請求數由 limiter 決定。
+    lookup : callable, optional
+        payload → 結果或 None（例如回應快取）。在 limiter 之外先查，命中時不呼叫 func；
+        快取命中幾乎不花時間，列入 limiter 會把上限推高、延遲百分位數也失真。
+    """
+    done = checkpoint.load()
+    raw_keys = [key_func(p) for p in payloads]
+    keys = [_key_str(k) for k in raw_keys]
+
+    def finished(k: str) -> bool:
+        record = done.get(k)
+        return record is not None and (bool(record["result"][4]) or not retry_failed)
+
+    pending = [i for i, k in enumerate(keys) if not finished(k)]
+    if progress is None:
+        progress = ReplayProgress(len(pending), skipped=len(payloads) - len(pending), report_every=report_every)
+
+    def record(key: Hashable, fut: Future) -> None:
+        # 在 worker 執行緒內呼叫：失敗（丟錯）的不寫入，交給主執行緒 .result() 時丟出
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        result = fut.result()
+        checkpoint.append(key, result)
+        progress.tick(bool(result[4]))
+
+    if limiter is not None:
+        max_workers = limiter.max_limit
+
+    def run(payload: Dict[str, Any]) -> Result:
+        if lookup is not None:
+            hit = lookup(payload)
+            if hit is not None:
+                return hit
+        return func(payload) if limiter is None else limiter.call(func, payload)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures: Dict[int, Future] = {}
+        for i in pending:
+            fut = pool.submit(run, payloads[i])
+            fut.add_done_callback(lambda f, k=raw_keys[i]: record(k, f))
+            futures[i] = fut
+
+        try:
+            for i, k in enumerate(keys):
+                if i in futures:
+                    yield futures[i].result()
+                else:
+                    yield tuple(done[k]["result"])
+        finally:
+            # 呼叫端中途停止或出錯時，不再啟動尚未開始的請求（已完成的都已寫入 checkpoint）
+            for fut in futures.values():
+                fut.cancel()
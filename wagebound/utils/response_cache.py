@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+API 回應快取（以 payload 內容雜湊為 key）
+
+HPM_verify_API 過去把整批結果存成一個 {Type}Result.pkl，
+來源 Excel 只要改一列就得整批重打 UAT。
+ResponseCache 改成「每個 payload 一個檔案」：
+    - key = sha256(端點類型 + 正規化 JSON)（key 排序、固定分隔符，欄位順序不同也視為同一個 payload）
+    - 存放：cache_dir/ab/abcdef....json（前兩碼分資料夾，避免單一資料夾檔案過多）
+    - ttl         ：寫入超過秒數視為過期（讀取時刪除）
+    - max_entries / max_bytes ：超過時依寫入時間（mtime）淘汰最舊的檔案，一次清到上限的 EVICT_RATIO
+    - stats       ：hits / misses / writes / expired / evictions
+
+寫入採「暫存檔 → os.replace」，多執行緒同時寫同一個 key 也不會留下半個檔案。
+
+各呼叫端（HPM_verify_API / SimilarityAPI / similarity_api_async）使用同一套規則：
+    - 端點類型一律用 API 的 url
+    - 只快取 cacheable_response 為 True（Success 為真）的回應
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from os.path import join
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+Payload = Union[Dict[str, Any], bytes, str]
+
+# 超過上限時一次淘汰到上限的比例，避免每寫一筆就掃一次資料夾
+EVICT_RATIO = 0.9
+
+
+def canonical_json(payload: Payload) -> bytes:
+    """payload 正規化成 bytes：key 排序、不含多餘空白（bytes / str 會先解析）。"""
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+
+
+def payload_key(payload: Payload, endpoint: str = "") -> str:
+    """回傳 payload + 端點類型的 sha256 十六進位字串。"""
+    h = hashlib.sha256(endpoint.encode("utf8") + b"\n")
+    h.update(canonical_json(payload))
+    return h.hexdigest()
+
+
+def cacheable_response(response: Any) -> bool:
+    """只快取 Success 為真的回應；Success=False（業務面錯誤、暫時性失敗）下次要重打。"""
+    return isinstance(response, dict) and bool(response.get("Success"))
+
+
+class ResponseCache:
+    """
+    以 payload 雜湊為 key 的磁碟快取。
+
+    Parameters
+    ----------
+    cache_dir : str
+        快取資料夾（不存在時自動建立）。
+    ttl : float, optional
+        有效秒數，None 為永不過期。
+    max_entries : int, optional
+        最多保留的筆數。
+    max_bytes : int, optional
+        最多佔用的位元組數。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        # 目前用量（筆數, 位元組），第一次寫入時才掃描資料夾，之後累加
+        self._usage: Optional[List[int]] = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"ResponseCache({self.cache_dir!r}, stats={self.stats})"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += n
+
+    def _path(self, key: str) -> str:
+        return join(self.cache_dir, key[:2], f"{key}.json")
+
+    # ------------------------------------------------------------------
+    # 讀 / 寫
+    # ------------------------------------------------------------------
+    def get(self, payload: Payload, endpoint: str = "", default: Any = None) -> Any:
+        """取快取的回應；沒有或已過期時回傳 default。"""
+        path = self._path(payload_key(payload, endpoint))
+        try:
+            mtime = os.path.getmtime(path)
+            if self.ttl is not None and time.time() - mtime > self.ttl:
+                self._remove(path)
+                self._count("expired")
+                self._count("misses")
+                return default
+            with open(path, "r", encoding="utf8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count("misses")
+            return default
+        self._count("hits")
+        return record["response"]
+
+    def set(self, payload: Payload, response: Any, endpoint: str = "") -> None:
+        """寫入一筆回應，寫入後依上限淘汰舊資料。"""
+        key = payload_key(payload, endpoint)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf8") as f:
+            json.dump({"endpoint": endpoint, "created": time.time(), "response": response}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._count("writes")
+        if self.max_entries is not None or self.max_bytes is not None:
+            if self._over_limit(os.path.getsize(path)):
+                self.evict()
+
+    def _over_limit(self, written: int) -> bool:
+        with self._lock:
+            if self._usage is None:
+                usage = self.size()
+                self._usage = [usage["entries"], usage["bytes"]]
+            else:
+                # 覆寫同一個 key 也會被多算一筆，evict 重新掃描時會修正
+                self._usage[0] += 1
+                self._usage[1] += written
+            return (self.max_entries is not None and self._usage[0] > self.max_entries) or (
+                self.max_bytes is not None and self._usage[1] > self.max_bytes
+            )
+
+    def cached_call(
+        self,
+        func: Callable[[Payload], Any],
+        payload: Payload,
+        endpoint: str = "",
+        should_store: Callable[[Any], bool] = cacheable_response,
+    ) -> Any:
+        """有快取直接回傳，否則呼叫 func(payload)，should_store 為 True（預設：Success 為真）時寫入快取。"""
+        cached = self.get(payload, endpoint)
+        if cached is not None:
+            return cached
+        response = func(payload)
+        if should_store(response):
+            self.set(payload, response, endpoint)
+        return response
+
+    # ------------------------------------------------------------------
+    # 維護
+    # ------------------------------------------------------------------
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """回傳 (mtime, size, path) list。"""
+        entries = []
+        for sub in os.listdir(self.cache_dir):
+            folder = join(self.cache_dir, sub)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if not name.endswith(".json"):
+                    continue
+                path = join(folder, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """刪除過期檔案，再依 mtime 由舊到新淘汰至上限的 EVICT_RATIO，回傳刪除筆數。"""
+        entries = sorted(self._entries())
+        removed = 0
+        now = time.time()
+        if self.ttl is not None:
+            alive = []
+            for mtime, size, path in entries:
+                if now - mtime > self.ttl:
+                    self._remove(path)
+                    removed += 1
+                    self._count("expired")
+                else:
+                    alive.append((mtime, size, path))
+            entries = alive
+
+        total = sum(size for _, size, _ in entries)
+        max_entries = None if self.max_entries is None else int(self.max_entries * EVICT_RATIO)
+        max_bytes = None if self.max_bytes is None else int(self.max_bytes * EVICT_RATIO)
+        drop = 0
+        while drop < len(entries) and (
+            (max_entries is not None and len(entries) - drop > max_entries)
+            or (max_bytes is not None and total > max_bytes)
+        ):
+            _, size, path = entries[drop]
+            self._remove(path)
+            total -= size
+            drop += 1
+        removed += drop
+        self._count("evictions", drop)
+        with self._lock:
+            self._usage = [len(entries) - drop, total]
+        return removed
+
+    def clear(self) -> None:
+        """刪除全部快取檔案。"""
+        for _, _, path in self._entries():
+            self._remove(path)
+        with self._lock:
+            self._usage = [0, 0]
+
+    def size(self) -> Dict[str, int]:
+        """目前的筆數與位元組數。"""
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+民國年月日（ROC）日期轉換（向量化）
+
+HPM_verify / HPM_half_year_renew / actualprice_check 各有一份相同的 strtodate，
+以 applymap 逐格處理 Trading_Date / Completion_Date：每格都做字串切割與一次 pd.to_datetime。
+
+這裡改成整欄處理，規則與原本的 strtodate 相同：
+    - 去掉小數部分、空白與 '-'
+    - 6 ~ 7 碼才處理（補零成 7 碼），其餘為 None
+    - 年 = 前 3 碼 + 1911，月 / 日為 00 時視為 01
+    - 不合法的日期（例如 2 月 30 日）為 None
+    - 輸出「YYYY/MM/DD」字串
+同一欄的重複值很多（交易日期），先 factorize 只轉換不重複的值，再依代碼展開。
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def _roc_uniques_to_datetime(uniques: Iterable) -> pd.Series:
+    """不重複值 → datetime64（無法轉換為 NaT）。"""
+    s = pd.Series(list(uniques), dtype=object).astype(str)
+    s = s.str.split(".", n=1).str[0].str.replace(" ", "", regex=False).str.replace("-", "", regex=False)
+    valid = s.str.len().between(6, 7) & s.str.fullmatch(r"[0-9]+").fillna(False)
+
+    # 以整數運算拆出年月日：YYYMMDD
+    n = pd.to_numeric(s.where(valid), errors="coerce").fillna(0).astype("int64")
+    year = n // 10000 + 1911
+    month = (n // 100 % 100).replace(0, 1)
+    day = (n % 100).replace(0, 1)
+
+    dates = pd.to_datetime(pd.DataFrame({"year": year, "month": month, "day": day}), errors="coerce")
+    return dates.where(valid)
+
+
+def roc_to_datetime(values: Sequence) -> pd.Series:
+    """ROC 日期 → datetime64 Series（無法轉換為 NaT），保留原本的 index。"""
+    index = values.index if isinstance(values, pd.Series) else None
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object) if index is None else values.astype(object))
+    # 代碼 -1（缺值）對不到任何不重複值 → NaT；不轉 ns，保留 2262 年以後的日期
+    out = _roc_uniques_to_datetime(uniques).reindex(codes)
+    out.index = index if index is not None else pd.RangeIndex(len(codes))
+    return out
+
+
+def roc_to_str(values: Sequence, fmt: str = DATE_FORMAT) -> pd.Series:
+    """ROC 日期 → 「YYYY/MM/DD」字串 Series（object，無法轉換為 None），與 strtodate 逐格結果相同。"""
+    index = values.index if isinstance(values, pd.Series) else None
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object) if index is None else values.astype(object))
+    dates = _roc_uniques_to_datetime(uniques)
+    text = np.array([None if pd.isna(d) else d.strftime(fmt) for d in dates], dtype=object)
+    out = np.full(len(codes), None, dtype=object)
+    hit = codes >= 0
+    out[hit] = text[codes[hit]]
+    return pd.Series(out, index=index, dtype=object)
+
+
+def roc_frame_to_str(df: pd.DataFrame, fmt: str = DATE_FORMAT) -> pd.DataFrame:
+    """逐欄套用 roc_to_str，取代 df.applymap(strtodate)。"""
+    return pd.DataFrame({col: roc_to_str(df[col], fmt) for col in df.columns}, index=df.index)
+
+
+def strtodate(x: object) -> Optional[str]:
+    """單一值版本（例：0820412 → '1993/04/12'），無法解析時回傳 None。"""
+    return roc_to_str([x]).iloc[0]
@@ -9,6 +9,10 @@ from typing import Optional
 from wagebound.config.config import cityname, colname, dropcol, dgiskey_lis, dgiskey
 from StevenTricks.io.file_utils import PathWalk_df, pickleio
 from StevenTricks.core.convert_utils import stringtodate
+from wagebound.utils.dgis_raw import ingest_raw_excels
+from wagebound.utils.fishid_grid import compare_fishid
+from wagebound.utils.reference_data import REFERENCE
+from wagebound.utils.roc_date import roc_frame_to_str
 
 from copy import deepcopy
 from os import makedirs
@@ -16,383 +20,308 @@ from os.path import join
 
 import pandas as pd
 
-def strtodate(x: object) -> Optional[str]:
-    """
-    將民國年月日（例：0820412）字串轉成「YYYY/MM/DD」格式。
-
-    規則與原始版相同：
-        - 補零成 7 碼
-        - 年份 +1911
-        - 月 / 日為 00 時補 01
-        - 無法解析時回傳 None
-    """
-    if pd.isna(x):
-        return None
-
-    s = str(x).split(".")[0]          # 去掉小數
-    s = s.replace(" ", "").replace("-", "")
-    if not (6 <= len(s) <= 7):
-        return None
-
-    s = s.zfill(7)
-    d = s[-2:]
-    m = s[-4:-2]
-    y = str(int(s[:-4]) + 1911)
-
-    if d == "00":
-        d = "01"
-    if m == "00":
-        m = "01"
-
-    dt = pd.to_datetime("-".join([y, m, d]), errors="coerce")
-    if pd.isna(dt):
-        return None
-    return dt.strftime("%Y/%m/%d")
 # =============================================================================
-# 日期區間與路徑設定
+# 檔名設定（日期、路徑與整個流程都在 main 裡，import 時不讀任何檔案）
 # =============================================================================
 
-# 要 + 一個月，所以 periods 設 38
-d = pd.date_range(start="2021-4", periods=38, freq="MS")
-d_start = d.min()
-d_end = d.max()
-d_end_str = d_end.strftime("%Y-%m-%d")
-
-# 最近 3 個月起算日（建物明細匯出用）
-date_3m = (d_end - pd.DateOffset(months=3)).strftime("%Y-%m-%d")
-
-raw_dir = fr"D:\DGIS\原始資料\{d_end.strftime('%Y%m')}"
-wb_dir = fr"D:\DGIS\workbench\{d_end.strftime('%Y%m')}"
-wb_processing_dir = join(wb_dir, "processing")
-
-for p in (raw_dir, wb_dir, wb_processing_dir):
-    makedirs(p, exist_ok=True)
-
 FILE_TOTAL = "GEOM_CTBC_RealPriceDetail.csv"
-FILE_BD = "building_{}_{}_v.xlsx".format(
-    d[33].strftime("%Y%m")[2:],  # 起始年月（舊規則）
-    d_end_str.replace("-", "")[2:6],  # 結束年月（YYMM）
-)
-FILE_XY = "GEOM_CTBC_RealPriceDetail_XY.csv"
 FILE_SEND = "GEOM_CTBC_RealPriceDetail_send.csv"
+# 以前本機 SAS 算的 fishID 結果（比對用）
 FILE_FISHID_XLSX = "GEOM_CTBC_RealPriceDetail_fishid.xlsx"
+FILE_FISHID_DIFF = "GEOM_CTBC_RealPriceDetail_fishid_diff.csv"
 
-ZIP_PATH = r"D:\Users\z00188600\AppData\Local\anaconda3\Lib\site-packages\ctbc_project\ZIP.xlsx"
-
-
-# =============================================================================
-# 讀取原始 Excel，依縣市／檔別整併
-# =============================================================================
-
-excel_paths = PathWalk_df(raw_dir, fileinclude=[".xls"], level=0)
-excel_paths = excel_paths.loc[excel_paths["level"] == 0]
-
-# 暫存各檔別的 DataFrame list，最後再 concat 一次
-res = {}
-
-for file_path in excel_paths["path"]:
-    file_dict = pd.read_excel(file_path, sheet_name=None)
-
-    # 判斷目前檔案對應哪個縣市
-    city = None
-    for vol, city_name in cityname.items():
-        if f"list_{vol.lower()}" in file_path:
-            city = city_name
-            break
-    if city is None:
-        # 找不到縣市代碼就跳過（避免後面 City 欄位爆掉）
-        continue
-
-    # 開始處理此 Excel 中各 sheet
-    for sheet_name, df in file_dict.items():
-        # sheet 名可能是「不動產買賣_50000」→ 只取前段
-        newkey = sheet_name.split("_")[0]
-
-        if newkey not in ["建物", "不動產買賣"]:
-            continue
-
-        # 1) 先 drop 通用多餘欄
-        df = df.drop(columns=["Unnamed: 35", "Unnamed: 0"], errors="ignore")
-
-        # 2) 欄位 rename
-        if newkey in colname:
-            df = df.rename(columns=colname[newkey])
-
-        # 3) 依檔別再 drop 一些欄位
-        if newkey in dropcol:
-            df = df.drop(columns=dropcol[newkey], errors="ignore")
-
-        if df.empty:
-            continue
-
-        # 4) 加上 City 欄位
-        df.insert(0, "City", city)
-
-        # 5) 建物檔：把「民國年月日」拆成年月日並轉成 3+2+2 的字串
-        if newkey == "建物" and "Building_Completion_Date" in df:
-            temp = (
-                df["Building_Completion_Date"]
-                .astype(str)
-                .str.split("年|月|日", expand=True)
-                .rename(columns={0: "year", 1: "month", 2: "day"})
-            )
-            temp["year"] = temp["year"].str.zfill(3)
-            temp["month"] = temp["month"].str.zfill(2)
-            temp["day"] = temp["day"].str.zfill(2)
-            df["Building_Completion_Date_v"] = (
-                temp["year"] + temp["month"] + temp["day"]
-            )
-
-        # 6) 收進暫存 dict
-        res.setdefault(newkey, []).append(df)
-
-# 將同類別的 DataFrame list 合併
-for key in list(res.keys()):
-    res[key] = pd.concat(res[key], ignore_index=True)
-
-# =============================================================================
-# 存原始不動產買賣，並建立最近三個月建物明細 Excel
-# =============================================================================
-
-pickleio( join(wb_dir, "realestate_original"),res["不動產買賣"],"save")
-
-# 注意：這裡假設 Trading_Date 已經是可比較的日期或一致格式字串
-real_estate_3m = deepcopy(
-    res["不動產買賣"].loc[
-        res["不動產買賣"]["Trading_Date"] >= date_3m, :
-    ]
-)
-
-building_3m = deepcopy(
-    res["建物"].loc[
-        res["建物"]["Number"].isin(real_estate_3m["Number"].tolist()),
-        :,
-    ]
-)
-
-with pd.ExcelWriter(join(wb_dir, FILE_BD), engine="xlsxwriter") as writer:
-    building_3m.to_excel(writer, sheet_name="building", index=False)
-
-# 主資料改用 data 變數後續處理
-data = deepcopy(res["不動產買賣"])
-del res, real_estate_3m, building_3m
-
-
-# =============================================================================
-# 日期欄位正規化 & 寫出原始 CSV / PKL（含日期）
-# =============================================================================
-
-data[["Trading_Date", "Completion_Date"]] = data[
-    ["Trading_Date", "Completion_Date"]
-].applymap(strtodate)
-
-pickleio( join(wb_dir, "realestate_date"),data,"save")
-data.to_csv(join(wb_dir, FILE_TOTAL), sep="|", index=False, encoding="utf8")
-
-
-# =============================================================================
-# 主體篩選與欄位清理
-# =============================================================================
-
-# 排除土地與特定建物型態
-data = data.loc[data["Trading_Target"] != "土地", :]
-data = data.loc[~data["Building_Type"].isin(["工廠", "倉庫", "農舍"]), :]
-
-# 必須要有完工年月
-data = data.loc[~data["Completion_Date"].isna(), :]
-
-# 交易日限制在 d_start ~ d_end 之間
-data["Trading_Date"] = pd.to_datetime(data["Trading_Date"])
-data = data.loc[data["Trading_Date"].between(d_start, d_end, inclusive="both"), :]
-
-# 地址只留前 30 字
-data["Address"] = data["Address"].str.slice(stop=30)
-data = data.loc[~data["Address"].isna(), :]
-
-# 格局隔間、管理組織 → Y/N
-data.loc[data["Partition_YN"] == "有", "DRPD_Partition"] = "Y"
-data.loc[data["DRPD_Partition"] != "Y", "DRPD_Partition"] = "N"
-
-data.loc[data["Management_YN"] == "有", "DRPD_Management"] = "Y"
-data.loc[data["DRPD_Management"] != "Y", "DRPD_Management"] = "N"
-
-# 備註欄是否有資料 → HasNote
-data.loc[data["Note"].isna(), "DRPD_HasNote"] = "N"
-data.loc[data["DRPD_HasNote"] != "N", "DRPD_HasNote"] = "Y"
-
-# 建物屋齡：交易年 - 完工年；負值視為 0，空值視為 10000
-build_year = pd.to_datetime(
-    data["Completion_Date"], errors="coerce", infer_datetime_format=True
-).dt.year
-trade_year = data["Trading_Date"].dt.year
-
-data["DRPD_BuildingAge"] = trade_year - build_year
-data.loc[data["DRPD_BuildingAge"] < 0, "DRPD_BuildingAge"] = 0
-data["DRPD_BuildingAge"] = data["DRPD_BuildingAge"].fillna(10000)
-
-
-# =============================================================================
-# 單位換算（地坪 / 建坪 / 總價 / 單價）
-# =============================================================================
+# FishID 改在程式內用 FishID 網格計算（與 HPM_verify.fishID_get 相同規則），不再匯出 XY 給 SAS。
+# 指定 SAS 輸出檔路徑時（例如 join(wb_dir, FILE_FISHID_XLSX)）會逐筆比對，不一致的寫到 FILE_FISHID_DIFF。
+FISHID_VERIFY_PATH: Optional[str] = None
 
-data["Land_Trans_Area"] = (data["Land_Trans_Area"] * 0.3025).round(2)
-data["Trans_Area"] = (data["Trans_Area"] * 0.3025).round(2)
-data["Total_Price"] = (data["Total_Price"] / 10000).round(4)
-data["Unit_Price"] = (data["Unit_Price"] / (10000 * 0.3025)).round(4)
-data["Unit_Price"] = data["Unit_Price"].fillna(0)
 
-# XY 座標取到小數點四位
-data["DRPD_TargetX"] = data["Trading_Target_X"].round(4)
-data["DRPD_TargetY"] = data["Trading_Target_Y"].round(4)
+def main(fishid_verify_path: Optional[str] = None) -> None:
+    # =============================================================================
+    # 日期區間與路徑設定
+    # =============================================================================
 
+    # 要 + 一個月，所以 periods 設 38
+    d = pd.date_range(start="2021-4", periods=38, freq="MS")
+    d_start = d.min()
+    d_end = d.max()
+    d_end_str = d_end.strftime("%Y-%m-%d")
 
-# =============================================================================
-# 建物類型旗標（五樓公寓 / 大樓 / 透天 / 其他）
-# =============================================================================
+    # 最近 3 個月起算日（建物明細匯出用）
+    date_3m = (d_end - pd.DateOffset(months=3)).strftime("%Y-%m-%d")
 
-# 預設先給 na（如果前段沒有設過的話）
-if "DRPD_BuildingTypeFlag" not in data.columns:
-    data["DRPD_BuildingTypeFlag"] = "na"
+    raw_dir = fr"D:\DGIS\原始資料\{d_end.strftime('%Y%m')}"
+    wb_dir = fr"D:\DGIS\workbench\{d_end.strftime('%Y%m')}"
+    wb_processing_dir = join(wb_dir, "processing")
 
-mask_not_land_or_car = ~data["Trading_Target"].isin(["土地", "車位"])
+    for p in (raw_dir, wb_dir, wb_processing_dir):
+        makedirs(p, exist_ok=True)
 
-mask_apartment = mask_not_land_or_car & data["Building_Type"].isin(
-    ["公寓(5樓含以下無電梯)"]
-)
-mask_tower = mask_not_land_or_car & data["Building_Type"].isin(
-    ["住宅大樓(11層含以上有電梯)", "華廈(10層含以下有電梯)"]
-)
-mask_townhouse = mask_not_land_or_car & data["Building_Type"].isin(["透天厝"])
+    file_bd = "building_{}_{}_v.xlsx".format(
+        d[33].strftime("%Y%m")[2:],  # 起始年月（舊規則）
+        d_end_str.replace("-", "")[2:6],  # 結束年月（YYMM）
+    )
 
-data.loc[mask_apartment, "DRPD_BuildingTypeFlag"] = "01"
-data.loc[mask_tower & (data["DRPD_BuildingTypeFlag"] == "na"), "DRPD_BuildingTypeFlag"] = "02"
-data.loc[mask_townhouse & (data["DRPD_BuildingTypeFlag"] == "na"), "DRPD_BuildingTypeFlag"] = "03"
-data.loc[data["DRPD_BuildingTypeFlag"] == "na", "DRPD_BuildingTypeFlag"] = "04"
 
+    # =============================================================================
+    # 讀取原始 Excel，依縣市／檔別整併
+    # =============================================================================
 
-# =============================================================================
-# 建物分群（屋齡 × 類型）
-# =============================================================================
+    excel_paths = PathWalk_df(raw_dir, fileinclude=[".xls"], level=0)
+    excel_paths = excel_paths.loc[excel_paths["level"] == 0]
 
-if "DRPD_BuildingSeg" not in data.columns:
-    data["DRPD_BuildingSeg"] = "na"
-
-age = data["DRPD_BuildingAge"]
-
-# 公寓
-mask_btype_01 = data["DRPD_BuildingTypeFlag"] == "01"
-data.loc[mask_btype_01 & age.between(0, 10, inclusive="both"), "DRPD_BuildingSeg"] = "01"
-data.loc[
-    mask_btype_01 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "03"
-data.loc[
-    mask_btype_01 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "04"
-
-# 大樓
-mask_btype_02 = data["DRPD_BuildingTypeFlag"] == "02"
-data.loc[
-    mask_btype_02 & age.between(0, 10, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "06"
-data.loc[
-    mask_btype_02 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "08"
-data.loc[
-    mask_btype_02 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "09"
-
-# 透天
-mask_btype_03 = data["DRPD_BuildingTypeFlag"] == "03"
-data.loc[
-    mask_btype_03 & age.between(0, 10, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "16"
-data.loc[
-    mask_btype_03 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "18"
-data.loc[
-    mask_btype_03 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
-    "DRPD_BuildingSeg",
-] = "19"
-
-# 其他類型統一成 99
-data.loc[data["DRPD_BuildingSeg"] == "na", "DRPD_BuildingSeg"] = "99"
+    # 各縣市 workbook 平行讀取（只讀「建物」「不動產買賣」與 colname 有對應的欄位），
+    # 找不到縣市代碼的檔案跳過（避免後面 City 欄位爆掉）
+    res, ingest_report = ingest_raw_excels(
+        excel_paths["path"], colname=colname, dropcol=dropcol, cityname=cityname, skip_unknown_city=True
+    )
+    ingest_report.to_csv(join(wb_dir, "raw_ingest_report.csv"), index=False, encoding="utf8")
 
+    # =============================================================================
+    # 存原始不動產買賣，並建立最近三個月建物明細 Excel
+    # =============================================================================
 
-# =============================================================================
-# 郵遞區號併入 & 欄位整理
-# =============================================================================
+    pickleio( join(wb_dir, "realestate_original"),res["不動產買賣"],"save")
 
-zip_code = (
-    pd.read_excel(ZIP_PATH, dtype=str)
-    .rename(columns={"city": "City", "town": "District"})
-)
+    # 注意：這裡假設 Trading_Date 已經是可比較的日期或一致格式字串
+    real_estate_3m = deepcopy(
+        res["不動產買賣"].loc[
+            res["不動產買賣"]["Trading_Date"] >= date_3m, :
+        ]
+    )
 
-data = pd.merge(data, zip_code, on=["City", "District"], how="left")
+    building_3m = deepcopy(
+        res["建物"].loc[
+            res["建物"]["Number"].isin(real_estate_3m["Number"].tolist()),
+            :,
+        ]
+    )
 
-# 加上流水號
-data = data.reset_index(drop=True).rename(columns={"index": "DRPD_Sequence"})
+    with pd.ExcelWriter(join(wb_dir, file_bd), engine="xlsxwriter") as writer:
+        building_3m.to_excel(writer, sheet_name="building", index=False)
 
-# 改欄位名稱為 DRPD_* 格式
-data = data.rename(columns=dgiskey)
+    # 主資料改用 data 變數後續處理
+    data = deepcopy(res["不動產買賣"])
+    del res, real_estate_3m, building_3m
 
-# 只保留 dgiskey_lis 指定欄位，多的都丟掉
-data = data.drop(columns=[c for c in data.columns if c not in dgiskey_lis], errors="ignore")
 
-# 若有缺欄位，補空字串
-for col in dgiskey_lis:
-    if col not in data.columns:
-        data[col] = ""
+    # =============================================================================
+    # 日期欄位正規化 & 寫出原始 CSV / PKL（含日期）
+    # =============================================================================
 
-# 匯出 XY，給本機 SAS 算 fishID
-data[["DRPD_Number", "DRPD_TargetX", "DRPD_TargetY"]].to_csv(
-    join(wb_dir, FILE_XY), sep="|", index=False, encoding="utf8"
-)
+    data[["Trading_Date", "Completion_Date"]] = roc_frame_to_str(
+        data[["Trading_Date", "Completion_Date"]]
+    )
 
-# =============================================================================
-# 讀取本機 SAS 算好的 fishID，回併
-# =============================================================================
+    pickleio( join(wb_dir, "realestate_date"),data,"save")
+    data.to_csv(join(wb_dir, FILE_TOTAL), sep="|", index=False, encoding="utf8")
 
-fishid = pd.read_excel(join(wb_dir, FILE_FISHID_XLSX), dtype=str)
-data = pd.merge(
-    data,
-    fishid[["DRPD_Number", "DRPD_FishId"]],
-    on="DRPD_Number",
-    how="left",
-)
 
-# =============================================================================
-# 最終送出檢查 & 匯出
-# =============================================================================
+    # =============================================================================
+    # 主體篩選與欄位清理
+    # =============================================================================
 
-if (data["DRPD_BuildingSeg"] == "na").any():
-    print("Column DRPD_BuildingSeg is ERROR")
-elif (data["DRPD_BuildingTypeFlag"] == "na").any():
-    print("Column DRPD_BuildingTypeFlag is ERROR")
-elif len(data.columns) != 36:
-    print("Column length is ERROR")
-else:
-    data.to_csv(join(wb_dir, FILE_SEND), sep="|", index=False, encoding="utf8")
-    pickleio( join(wb_dir, "realestate_send"),data,"save")
+    # 排除土地與特定建物型態
+    data = data.loc[data["Trading_Target"] != "土地", :]
+    data = data.loc[~data["Building_Type"].isin(["工廠", "倉庫", "農舍"]), :]
 
-# =============================================================================
-# 加工回來後，再次檢查（由外部系統處理後）
-# =============================================================================
+    # 必須要有完工年月
+    data = data.loc[~data["Completion_Date"].isna(), :]
 
-data_complete = pd.read_csv(
-    join(wb_processing_dir, FILE_TOTAL),
-    dtype=str,
-    delimiter="|",
-    encoding="utf8",
-)
-
-# 下列三行通常在互動模式下看結果（Spyder / console）
-data_complete["DRPD_EParkingPrice"].unique()      # 不能有 N、Y 以外值
-data_complete["DRPD_ModifyFlag"].unique()         # 只能有 N、Y
-data_complete["DRPD_SpecialTradeFlag"].unique()   # 只能有 N、Y
+    # 交易日限制在 d_start ~ d_end 之間
+    data["Trading_Date"] = pd.to_datetime(data["Trading_Date"])
+    data = data.loc[data["Trading_Date"].between(d_start, d_end, inclusive="both"), :]
+
+    # 地址只留前 30 字
+    data["Address"] = data["Address"].str.slice(stop=30)
+    data = data.loc[~data["Address"].isna(), :]
+
+    # 格局隔間、管理組織 → Y/N
+    data.loc[data["Partition_YN"] == "有", "DRPD_Partition"] = "Y"
+    data.loc[data["DRPD_Partition"] != "Y", "DRPD_Partition"] = "N"
+
+    data.loc[data["Management_YN"] == "有", "DRPD_Management"] = "Y"
+    data.loc[data["DRPD_Management"] != "Y", "DRPD_Management"] = "N"
+
+    # 備註欄是否有資料 → HasNote
+    data.loc[data["Note"].isna(), "DRPD_HasNote"] = "N"
+    data.loc[data["DRPD_HasNote"] != "N", "DRPD_HasNote"] = "Y"
+
+    # 建物屋齡：交易年 - 完工年；負值視為 0，空值視為 10000
+    build_year = pd.to_datetime(
+        data["Completion_Date"], errors="coerce", infer_datetime_format=True
+    ).dt.year
+    trade_year = data["Trading_Date"].dt.year
+
+    data["DRPD_BuildingAge"] = trade_year - build_year
+    data.loc[data["DRPD_BuildingAge"] < 0, "DRPD_BuildingAge"] = 0
+    data["DRPD_BuildingAge"] = data["DRPD_BuildingAge"].fillna(10000)
+
+
+    # =============================================================================
+    # 單位換算（地坪 / 建坪 / 總價 / 單價）
+    # =============================================================================
+
+    data["Land_Trans_Area"] = (data["Land_Trans_Area"] * 0.3025).round(2)
+    data["Trans_Area"] = (data["Trans_Area"] * 0.3025).round(2)
+    data["Total_Price"] = (data["Total_Price"] / 10000).round(4)
+    data["Unit_Price"] = (data["Unit_Price"] / (10000 * 0.3025)).round(4)
+    data["Unit_Price"] = data["Unit_Price"].fillna(0)
+
+    # XY 座標取到小數點四位
+    data["DRPD_TargetX"] = data["Trading_Target_X"].round(4)
+    data["DRPD_TargetY"] = data["Trading_Target_Y"].round(4)
+
+
+    # =============================================================================
+    # 建物類型旗標（五樓公寓 / 大樓 / 透天 / 其他）
+    # =============================================================================
+
+    # 預設先給 na（如果前段沒有設過的話）
+    if "DRPD_BuildingTypeFlag" not in data.columns:
+        data["DRPD_BuildingTypeFlag"] = "na"
+
+    mask_not_land_or_car = ~data["Trading_Target"].isin(["土地", "車位"])
+
+    mask_apartment = mask_not_land_or_car & data["Building_Type"].isin(
+        ["公寓(5樓含以下無電梯)"]
+    )
+    mask_tower = mask_not_land_or_car & data["Building_Type"].isin(
+        ["住宅大樓(11層含以上有電梯)", "華廈(10層含以下有電梯)"]
+    )
+    mask_townhouse = mask_not_land_or_car & data["Building_Type"].isin(["透天厝"])
+
+    data.loc[mask_apartment, "DRPD_BuildingTypeFlag"] = "01"
+    data.loc[mask_tower & (data["DRPD_BuildingTypeFlag"] == "na"), "DRPD_BuildingTypeFlag"] = "02"
+    data.loc[mask_townhouse & (data["DRPD_BuildingTypeFlag"] == "na"), "DRPD_BuildingTypeFlag"] = "03"
+    data.loc[data["DRPD_BuildingTypeFlag"] == "na", "DRPD_BuildingTypeFlag"] = "04"
+
+
+    # =============================================================================
+    # 建物分群（屋齡 × 類型）
+    # =============================================================================
+
+    if "DRPD_BuildingSeg" not in data.columns:
+        data["DRPD_BuildingSeg"] = "na"
+
+    age = data["DRPD_BuildingAge"]
+
+    # 公寓
+    mask_btype_01 = data["DRPD_BuildingTypeFlag"] == "01"
+    data.loc[mask_btype_01 & age.between(0, 10, inclusive="both"), "DRPD_BuildingSeg"] = "01"
+    data.loc[
+        mask_btype_01 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "03"
+    data.loc[
+        mask_btype_01 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "04"
+
+    # 大樓
+    mask_btype_02 = data["DRPD_BuildingTypeFlag"] == "02"
+    data.loc[
+        mask_btype_02 & age.between(0, 10, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "06"
+    data.loc[
+        mask_btype_02 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "08"
+    data.loc[
+        mask_btype_02 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "09"
+
+    # 透天
+    mask_btype_03 = data["DRPD_BuildingTypeFlag"] == "03"
+    data.loc[
+        mask_btype_03 & age.between(0, 10, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "16"
+    data.loc[
+        mask_btype_03 & age.between(11, 20, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "18"
+    data.loc[
+        mask_btype_03 & age.between(21, 999, inclusive="both") & (data["DRPD_BuildingSeg"] == "na"),
+        "DRPD_BuildingSeg",
+    ] = "19"
+
+    # 其他類型統一成 99
+    data.loc[data["DRPD_BuildingSeg"] == "na", "DRPD_BuildingSeg"] = "99"
+
+
+    # =============================================================================
+    # 郵遞區號併入 & 欄位整理
+    # =============================================================================
+
+    # 郵遞區號表走參考資料 registry（第一次使用才讀，parquet 快取）
+    zip_code = REFERENCE.get("zip").rename(columns={"city": "City", "town": "District"})
+
+    data = pd.merge(data, zip_code, on=["City", "District"], how="left")
+
+    # 加上流水號
+    data = data.reset_index(drop=True).rename(columns={"index": "DRPD_Sequence"})
+
+    # 改欄位名稱為 DRPD_* 格式
+    data = data.rename(columns=dgiskey)
+
+    # 只保留 dgiskey_lis 指定欄位，多的都丟掉
+    data = data.drop(columns=[c for c in data.columns if c not in dgiskey_lis], errors="ignore")
+
+    # 若有缺欄位，補空字串
+    for col in dgiskey_lis:
+        if col not in data.columns:
+            data[col] = ""
+
+    # =============================================================================
+    # FishID：程式內以網格索引計算（原本匯出 XY 給本機 SAS 算，再讀回 Excel 合併）
+    # =============================================================================
+
+    data["DRPD_FishId"] = REFERENCE.get("fishid_grid").lookup(data["DRPD_TargetX"], data["DRPD_TargetY"])
+
+    # 比對模式：與以前 SAS 算的結果逐筆比對
+    fishid_verify_path = fishid_verify_path or FISHID_VERIFY_PATH
+    if fishid_verify_path:
+        fishid_sas = pd.read_excel(fishid_verify_path, dtype=str)
+        fishid_diff = compare_fishid(data, fishid_sas)
+        fishid_diff = fishid_diff.loc[fishid_diff["status"] != "match"]
+        fishid_diff.to_csv(join(wb_dir, FILE_FISHID_DIFF), sep="|", index=False, encoding="utf8")
+        print(f"FishID 與 SAS 不一致 {len(fishid_diff):,} 筆，明細：{join(wb_dir, FILE_FISHID_DIFF)}")
+
+    # =============================================================================
+    # 最終送出檢查 & 匯出
+    # =============================================================================
+
+    if (data["DRPD_BuildingSeg"] == "na").any():
+        print("Column DRPD_BuildingSeg is ERROR")
+    elif (data["DRPD_BuildingTypeFlag"] == "na").any():
+        print("Column DRPD_BuildingTypeFlag is ERROR")
+    elif len(data.columns) != 36:
+        print("Column length is ERROR")
+    else:
+        data.to_csv(join(wb_dir, FILE_SEND), sep="|", index=False, encoding="utf8")
+        pickleio( join(wb_dir, "realestate_send"),data,"save")
+
+    # =============================================================================
+    # 加工回來後，再次檢查（由外部系統處理後）
+    # =============================================================================
+
+    data_complete = pd.read_csv(
+        join(wb_processing_dir, FILE_TOTAL),
+        dtype=str,
+        delimiter="|",
+        encoding="utf8",
+    )
+
+    # 下列三行通常在互動模式下看結果（Spyder / console）
+    data_complete["DRPD_EParkingPrice"].unique()      # 不能有 N、Y 以外值
+    data_complete["DRPD_ModifyFlag"].unique()         # 只能有 N、Y
+    data_complete["DRPD_SpecialTradeFlag"].unique()   # 只能有 N、Y
+
+    # 參考資料讀取時間（快取 / 原始檔）
+    print(REFERENCE.timings())
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ DGIS 實價登錄清理流程：
 3. 日期轉換、過濾標的
 4. 算建物年齡、建物型態分段、坪數/單價轉換
 5. merge 郵遞區號
-6. 算 FishID
+6. 算 FishID（整數網格索引）
 7. 匯出送 DGIS 檔案 + 加工回寫檔檢查
 
 原始版本：2023-10-19
@@ -19,17 +19,19 @@ from os.path import abspath, dirname, isfile, join, pardir, samefile
 
 import datetime as dt
 import pickle
+from typing import Optional
 
 import pandas as pd
-from numpy import floor
 
+from wagebound.utils.dgis_raw import ingest_raw_excels
+from wagebound.utils.fishid_grid import FishIDGrid
+from wagebound.utils.reference_data import REFERENCE
+from wagebound.utils.roc_date import roc_frame_to_str
 from wagebound.config.config_dgis import (
     DGIS_RAW_ROOT,
     DGIS_WB_ROOT,
     DATE_START,
     DATE_PERIODS,
-    PATH_XY,
-    PATH_ZIP,
     FILE_TOTAL,
     FILE_SEND,
     EXCEL_EXT,
@@ -122,76 +124,17 @@ def PathWalk_df(
     return res.reset_index(drop=True)
 
 
-def strtodate(x):
-    """
-    將 ROC 7 碼（例如 0820412）轉成 'YYYY/MM/DD'
-    - 允許有小數、空白、'-' 等雜訊
-    """
-    if pd.isna(x):
-        return None
-
-    x = str(x).split(".")[0]
-    x = x.replace(" ", "").replace("-", "")
-
-    if 6 <= len(x) <= 7:
-        x = x.zfill(7)
-    else:
-        return None
-
-    d = x[-2:]
-    m = x[-4:-2]
-    y = str(int(x[:-4]) + 1911)
-
-    if d == "00":
-        d = "01"
-    if m == "00":
-        m = "01"
-
-    res = pd.to_datetime("-".join([y, m, d]), errors="coerce")
-    if pd.isna(res):
-        return None
-    return res.strftime("%Y/%m/%d")
-
-
-# FishID 相關：預先載入座標對應表
-DATA_XY = pd.read_excel(PATH_XY, dtype=str)
-
-
-def fishID_get(source: pd.DataFrame, col_x: str, col_y: str) -> pd.DataFrame:
+def fishID_get(
+    source: pd.DataFrame, col_x: str, col_y: str, grid: Optional[FishIDGrid] = None
+) -> pd.DataFrame:
     """
     依 X/Y 座標計算 FishID，並回填到 source['DRPD_FishId']
+    - grid 未指定時使用參考資料 registry 的 fishid_grid（第一次使用才載入，.npz 快取）
+    - 查不到的座標為 "0"
     """
-    lis = list(range(100, 1100, 200))
-
-    x = (pd.to_numeric(source[col_x]) * 0.001 - floor(pd.to_numeric(source[col_x]) * 0.001)) * 1000
-    y = (pd.to_numeric(source[col_y]) * 0.001 - floor(pd.to_numeric(source[col_y]) * 0.001)) * 1000
-
-    x[x < 100] = 100
-    y[y < 100] = 100
-
-    for n in [0, 1, 2, 3]:
-        mid = (lis[n] + lis[n + 1]) / 2
-        x[x.between(lis[n], lis[n + 1], inclusive="right") & (x > mid)] = lis[n + 1]
-        x[x.between(lis[n], lis[n + 1], inclusive="right") & (x <= mid)] = lis[n]
-        y[y.between(lis[n], lis[n + 1], inclusive="right") & (y > mid)] = lis[n + 1]
-        y[y.between(lis[n], lis[n + 1], inclusive="right") & (y <= mid)] = lis[n]
-
-    x[x > 900] = 900
-    y[y > 900] = 900
-
-    x = floor(pd.to_numeric(source[col_x]) * 0.001) * 1000 + x
-    y = floor(pd.to_numeric(source[col_y]) * 0.001) * 1000 + y
-
-    df_temp = pd.DataFrame(
-        {
-            "P_X": x.map(lambda v: str(v).split(".")[0]),
-            "P_Y": y.map(lambda v: str(v).split(".")[0]),
-        }
-    )
-
-    df_temp = df_temp.merge(DATA_XY, on=["P_X", "P_Y"], how="left").fillna("0")
-    source["DRPD_FishId"] = df_temp["FishID"]
-
+    if grid is None:
+        grid = REFERENCE.get("fishid_grid")
+    source["DRPD_FishId"] = grid.lookup(source[col_x], source[col_y])
     return source
 
 
@@ -215,57 +158,11 @@ def main():
     # 2. 讀所有縣市 Excel
     excel_paths = PathWalk_df(path_raw, fileinclude=[EXCEL_EXT], level=0)
     excel_paths = excel_paths.loc[excel_paths["level"] == 0, :]
-    res = {}
-
-    for file_path in excel_paths["path"]:
-        file_dict = pd.read_excel(file_path, sheet_name=None)
-
-        # 找出城市代碼
-        city = None
-        for vol in CITYNAME:
-            if f"list_{vol.lower()}" in file_path:
-                city = CITYNAME[vol]
-                break
-
-        # 清理每一個 sheet
-        for key, df in file_dict.items():
-            newkey = key.split("_")[0]
-            if newkey not in ["建物", "不動產買賣"]:
-                continue
-
-            # drop 雜訊欄
-            df = df.drop(columns=["Unnamed: 35", "Unnamed: 0"], errors="ignore")
-
-            # rename
-            if newkey in COLNAME:
-                df = df.rename(columns=COLNAME[newkey])
-
-            # 針對「不動產買賣」再 drop 一些欄
-            if newkey in DROPCOL:
-                df = df.drop(columns=DROPCOL[newkey], errors="ignore")
-
-            if not df.empty:
-                df.insert(0, "City", city)
-
-                # 建物完成日期轉成整數字串（例如 0820412）
-                if newkey == "建物" and "Building_Completion_Date" in df:
-                    temp = (
-                        df["Building_Completion_Date"]
-                        .astype(str)
-                        .str.split("年|月|日", expand=True)
-                        .rename(columns={0: "year", 1: "month", 2: "day"})
-                    )
-                    temp["year"] = temp["year"].str.zfill(3)
-                    temp["month"] = temp["month"].str.zfill(2)
-                    temp["day"] = temp["day"].str.zfill(2)
-                    df["Building_Completion_Date_v"] = (
-                        temp["year"] + temp["month"] + temp["day"]
-                    )
-
-            if newkey not in res:
-                res[newkey] = df
-            else:
-                res[newkey] = pd.concat([res[newkey], df], ignore_index=True)
+    # 各縣市 workbook 平行讀取（只讀「建物」「不動產買賣」與 COLNAME 有對應的欄位）
+    res, ingest_report = ingest_raw_excels(
+        excel_paths["path"], colname=COLNAME, dropcol=DROPCOL, cityname=CITYNAME
+    )
+    ingest_report.to_csv(join(path_wb, "raw_ingest_report.csv"), index=False, encoding="utf8")
 
     # 3. 只保留「不動產買賣」，存原始檔
     realestate_raw = res["不動產買賣"].copy()
@@ -275,9 +172,9 @@ def main():
     del res, realestate_raw
 
     # 4. 轉換日期欄位
-    data[["Trading_Date", "Completion_Date"]] = data[
-        ["Trading_Date", "Completion_Date"]
-    ].applymap(strtodate)
+    data[["Trading_Date", "Completion_Date"]] = roc_frame_to_str(
+        data[["Trading_Date", "Completion_Date"]]
+    )
     picklesave(data, join(path_wb, "realestate_date"))
 
     # 5. 篩選標的種類與建物型態
@@ -367,7 +264,7 @@ def main():
     data.loc[data["DRPD_BuildingSeg"] == "na", "DRPD_BuildingSeg"] = "99"
 
     # 12. 郵遞區號 merge
-    zip_code = pd.read_excel(PATH_ZIP, dtype=str).rename(columns={"city": "City", "town": "District"})
+    zip_code = REFERENCE.get("zip").rename(columns={"city": "City", "town": "District"})
     data = data.merge(zip_code, on=["City", "District"], how="left")
 
     # 13. 排序欄位、掛流水號
@@ -412,6 +309,9 @@ def main():
     print("DRPD_ModifyFlag unique:", data_complete["DRPD_ModifyFlag"].unique())
     print("DRPD_SpecialTradeFlag unique:", data_complete["DRPD_SpecialTradeFlag"].unique())
 
+    # 參考資料讀取時間（快取 / 原始檔）
+    print(REFERENCE.timings())
+
 
 if __name__ == "__main__":
     main()
@@ -5,7 +5,7 @@ DGIS AccurateEstimation API 測試 & Log 產出
 - 組 API payload
 - 並行呼叫 AccurateEstimation
 - 拆出 PCSMINPUT / PCSMOUTPUT / CompareCase(LVR、CTBC_Inside)
-- 匯出 Excel log
+- 匯出 log（parquet / feather 資料夾，需要時再轉 Excel）
 
 Created on Mon Sep 23 14:13:18 2024
 @author: Z00051711
@@ -14,14 +14,19 @@ Created on Mon Sep 23 14:13:18 2024
 import json
 from os.path import join, exists
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import requests
-from tqdm import tqdm
 
 from StevenTricks.io.file_utils import pickleio
-from wagebound.config.config import comparecase_select, clean_colname
+from wagebound.config.config import clean_colname
+from wagebound.similarity.collateral_index import CollateralIndex
+from wagebound.utils.adaptive_limit import AimdLimiter
+from wagebound.utils.dgis_result import ApiResultParser
+from wagebound.utils.fast_json import loads
+from wagebound.utils.frame_store import export_excel, write_frames
+from wagebound.utils.replay_runner import ReplayCheckpoint, iter_replay, payload_case_key
+from wagebound.utils.response_cache import ResponseCache, cacheable_response
 
 
 # =============================================================================
@@ -39,34 +44,37 @@ url_dict = {
     "sit": r"http://dgisapiuat.ctbcbank.com:8080/dgis/dgisapi/AccurateEstimation",
     "uat": r"http://dgisapiuat.ctbcbank.com/dgis/dgisapi/AccurateEstimation",
 }
+api_url = url_dict[Type]
+
+# 各環境同時在途請求數的上限；實際數量由 AIMD 依延遲 / 錯誤在 1 ~ 上限間自動調整
+max_concurrency_dict = {
+    "sit": 8,
+    "uat": 24,
+}
+LATENCY_TARGET = 5.0  # 秒，單筆超過視為壅塞（call_api timeout 為 10 秒）
 
 source_pkl = join(datapath, "source.pkl")
 apiresult_pkl = join(datapath, f"{Type}Result.pkl")
+# 逐筆完成就寫入的 checkpoint，中斷後重跑會跳過已完成且 payload 未變動的 (CaseNo, CollateralNo)
+# 整批跑完後改名為 .done，下一次執行從頭開始（未變動的 payload 由 response_cache 取用）
+checkpoint_path = join(datapath, f"{Type}Result_checkpoint.jsonl")
+
+# 逐筆 payload 的回應快取：來源只改幾列時，只有變動的 payload 會重打 API
+# 與 SimilarityAPI / similarity_api_async 相同：以 url 為端點類型，只快取 Success 的回應
+CACHE_TTL_DAYS = 30
+response_cache = ResponseCache(join(datapath, f"{Type}_api_cache"), ttl=CACHE_TTL_DAYS * 86400)
+
+# log 輸出格式：excel / parquet / feather；欄式格式時 EXPORT_EXCEL 決定是否另外轉出 Excel
+OUTPUT_FORMAT = "parquet"
+EXPORT_EXCEL = True
 
 
 # =============================================================================
 # 1. 小工具
 # =============================================================================
 
-def call_api(payload: dict):
-    """
-    打 AccurateEstimation API，回傳：
-    (caseno, collateralno, output_json, input_json, conn_flag)
-    """
-    try:
-        resp = requests.post(url_dict[Type], json=payload, timeout=10)
-        resp.raise_for_status()
-        resjson = resp.json()
-    except Exception as e:
-        cdata = payload.get("CollateralData", {})
-        return (
-            cdata.get("CaseNo"),
-            cdata.get("CollateralNo"),
-            {"Success": False, "Error": str(e)},
-            payload,
-            False,
-        )
-
+def to_result(payload: dict, resjson: dict):
+    """API 回應 → (caseno, collateralno, output_json, input_json, conn_flag)"""
     success = resjson.get("Success", False)
     if not success:
         cdata = payload.get("CollateralData", {})
@@ -82,11 +90,43 @@ def call_api(payload: dict):
     return caseno, collateralno, resjson, payload, conn
 
 
-def dict_to_df(features: list) -> pd.DataFrame:
-    """將 comparecase 裡的 features 轉成 DataFrame（只取 properties）。"""
-    if not features:
-        return pd.DataFrame()
-    return pd.DataFrame([f.get("properties", {}) for f in features])
+def cached_result(payload: dict):
+    """response_cache 有這個 payload（同 url）時回傳 call_api 格式的結果，否則回傳 None。"""
+    resjson = response_cache.get(payload, api_url)
+    return None if resjson is None else to_result(payload, resjson)
+
+
+def fetch_api(payload: dict):
+    """
+    實際打 AccurateEstimation API（不查快取），回傳 call_api 格式的結果。
+    Success 的回應寫入 response_cache。
+    """
+    try:
+        resp = requests.post(api_url, json=payload, timeout=10)
+        resp.raise_for_status()
+        resjson = loads(resp.content)
+    except Exception as e:
+        cdata = payload.get("CollateralData", {})
+        return (
+            cdata.get("CaseNo"),
+            cdata.get("CollateralNo"),
+            {"Success": False, "Error": str(e)},
+            payload,
+            False,
+        )
+    if cacheable_response(resjson):
+        response_cache.set(payload, resjson, api_url)
+    return to_result(payload, resjson)
+
+
+def call_api(payload: dict):
+    """
+    打 AccurateEstimation API，回傳：
+    (caseno, collateralno, output_json, input_json, conn_flag)
+    相同 payload（同 url）有 Success 的快取時直接取用，否則呼叫 fetch_api。
+    """
+    hit = cached_result(payload)
+    return hit if hit is not None else fetch_api(payload)
 
 
 # =============================================================================
@@ -121,21 +161,44 @@ for applno, inputjson in data[["ApplNo", "InputJson"]].itertuples(index=False):
 dgisinput = pd.DataFrame(dgis_rows)
 
 # =============================================================================
-# 4. 準備 / 取得 API 結果（可重複使用 cache）
+# 4. 取得 API 結果並同步解析（逐筆 payload 快取，只有快取沒有的才打 API）
+#    解析 PCSMINPUT / PCSMOUTPUT / CompareCase（LVR & CTBC_Inside）
+#    結果一回來就放進欄位緩衝區，不再於迴圈內反覆 pd.concat
 # =============================================================================
 
-if exists(apiresult_pkl):
-    apiresult = pickleio(apiresult_pkl)
-else:
-    max_workers = 10
-    targets = apiinput if MAX_CASES is None else apiinput[:MAX_CASES]
+targets = apiinput if MAX_CASES is None else apiinput[:MAX_CASES]
+parser = ApiResultParser()
+limiter = AimdLimiter(
+    initial=4,
+    max_limit=max_concurrency_dict[Type],
+    latency_target=LATENCY_TARGET,
+    # 只有連線例外 / timeout（call_api 回傳帶 Error）才算壅塞，業務面 Success=False 不算
+    is_error=lambda result: "Error" in result[2],
+)
 
-    print("AccurateEstimation API 呼叫開始:", datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        apiresult = list(tqdm(pool.map(call_api, targets), total=len(targets)))
-    print("AccurateEstimation API 呼叫結束:", datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
+print("AccurateEstimation API 呼叫開始:", datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
+with ReplayCheckpoint(checkpoint_path) as checkpoint:
+    apiresult = [
+        result
+        for result, _status in parser.consume(
+            iter_replay(
+                targets,
+                fetch_api,
+                checkpoint,
+                key_func=lambda payload: payload_case_key(payload, api_url),
+                limiter=limiter,
+                # 快取命中在 limiter 之外處理，不影響 AIMD 上限與延遲統計
+                lookup=cached_result,
+            )
+        )
+    ]
+    checkpoint.finish()
+print("AccurateEstimation API 呼叫結束:", datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
+limiter.report()
+print("API 快取：", response_cache.stats)
 
-    pickleio(apiresult_pkl,apiresult, "save")
+# 整批結果仍另存一份，方便事後查詢
+pickleio(apiresult_pkl, apiresult, "save")
 
 # 有需要查單筆時，可以用這個 DataFrame filter
 apiresult_df = pd.DataFrame(
@@ -144,50 +207,14 @@ apiresult_df = pd.DataFrame(
 )
 
 # =============================================================================
-# 5. 解析 API 結果：PCSMINPUT / PCSMOUTPUT / CompareCase（LVR & CTBC_Inside）
+# 5. 解析結果建表（每張表只建一次）
 # =============================================================================
 
-lvr_out = pd.DataFrame()
-ctbc_inside_out = pd.DataFrame()
-pcsm_input = pd.DataFrame()
-pcsm_output = pd.DataFrame()
-
-for caseno, collateralno, apioutput, input_data, conn in apiresult:
-    if not conn:
-        print("連線失敗：", caseno)
-        continue
-
-    pcsm = apioutput.get("PerformanceStatistic", {})
-    if "PCSMINPUT" not in pcsm or "PCSMOUTPUT" not in pcsm:
-        print("PCSM 結構錯誤：", caseno)
-        continue
-
-    # ---- PCSM input / output ----
-    pcsm_in_tmp = pd.DataFrame([pcsm["PCSMINPUT"]])
-    pcsm_out_tmp = pd.DataFrame([pcsm["PCSMOUTPUT"]])
-
-    pcsm_in_tmp["applno"] = caseno
-    pcsm_in_tmp["CollateralNo"] = collateralno
-    pcsm_out_tmp["applno"] = caseno
-    pcsm_out_tmp["CollateralNo"] = collateralno
-
-    pcsm_input = pd.concat([pcsm_input, pcsm_in_tmp], ignore_index=True)
-    pcsm_output = pd.concat([pcsm_output, pcsm_out_tmp], ignore_index=True)
-
-    # ---- CompareCase：LVR & CTBC_Inside ----
-    comparecase = comparecase_select(apioutput["Result"]["CompareCase"])
-    lvr_df = dict_to_df(comparecase.get("LVR", []))
-    ctbc_inside_df = dict_to_df(comparecase.get("CTBC_Inside", []))
-
-    if not lvr_df.empty:
-        lvr_df["applno"] = caseno
-        lvr_df["CollateralNo"] = collateralno
-        lvr_out = pd.concat([lvr_out, lvr_df], ignore_index=True)
-
-    if not ctbc_inside_df.empty:
-        ctbc_inside_df["applno"] = caseno
-        ctbc_inside_df["CollateralNo"] = collateralno
-        ctbc_inside_out = pd.concat([ctbc_inside_out, ctbc_inside_df], ignore_index=True)
+frames = parser.frames()
+pcsm_input = frames["pcsm_input"]
+pcsm_output = frames["pcsm_output"]
+lvr_out = frames["lvr"]
+ctbc_inside_out = frames["ctbc_inside"]
 
 # =============================================================================
 # 6. 去除 PCSM input/output 重複列（排除 dict 欄位）
@@ -207,17 +234,19 @@ pcsm_output = pcsm_output.drop_duplicates(
     ignore_index=True,
 )
 
-# 各筆案件以 applno + CollateralNo 當 key
-pcsm_keys = pd.unique(
-    pd.concat(
-        [
-            pcsm_input["applno"].astype(str) + pcsm_input["CollateralNo"].astype(str),
-            pcsm_output["applno"].astype(str) + pcsm_output["CollateralNo"].astype(str),
-        ],
-        ignore_index=True,
-    )
+# 各筆案件以 (applno, CollateralNo) 當 key，建成 hash 索引給後面篩選共用
+PCSM_KEY = ["applno", "CollateralNo"]
+pcsm_index = CollateralIndex(
+    pd.concat([pcsm_input[PCSM_KEY], pcsm_output[PCSM_KEY]], ignore_index=True).astype(str),
+    key=PCSM_KEY,
 )
 
+
+def in_pcsm(df: pd.DataFrame, on: list) -> pd.Series:
+    """df 的 key 欄位（轉字串後）是否出現在 PCSM 結果中。"""
+    return pd.Series(pcsm_index.contains(df[on].astype(str), on=on), index=df.index)
+
+
 # =============================================================================
 # 7. 匯出 PCSM log
 # =============================================================================
@@ -225,23 +254,20 @@ pcsm_keys = pd.unique(
 pcsm_input_renamed = pcsm_input.rename(columns=clean_colname)
 pcsm_output_renamed = pcsm_output.rename(columns=clean_colname)
 
-with pd.ExcelWriter(join(datapath, f"LOG_PCSM_{Type}.xlsx")) as writer:
-    pcsm_input_renamed.to_excel(writer, sheet_name="pcsm_input", index=False)
-    pcsm_output_renamed.to_excel(writer, sheet_name="pcsm_output", index=False)
+pcsm_log_path = write_frames(
+    {"pcsm_input": pcsm_input_renamed, "pcsm_output": pcsm_output_renamed},
+    join(datapath, f"LOG_PCSM_{Type}"),
+    fmt=OUTPUT_FORMAT,
+)
 
 # =============================================================================
 # 8. 匯出 Collateral / LVR / CTBC_Inside log
 # =============================================================================
 
-# dgisinput：CaseNo + CollateralNo 組 key
-dgis_keys = dgisinput["CaseNo"].astype(str) + dgisinput["CollateralNo"].astype(str)
-dgisinput_part = dgisinput.loc[dgis_keys.isin(pcsm_keys)].copy()
-
-lvr_keys = lvr_out["applno"].astype(str) + lvr_out["CollateralNo"].astype(str)
-lvr_out_part = lvr_out.loc[lvr_keys.isin(pcsm_keys)].copy()
-
-ctbc_inside_keys = ctbc_inside_out["applno"].astype(str) + ctbc_inside_out["CollateralNo"].astype(str)
-ctbc_inside_out_part = ctbc_inside_out.loc[ctbc_inside_keys.isin(pcsm_keys)].copy()
+# dgisinput：CaseNo + CollateralNo 對應 PCSM 的 applno + CollateralNo
+dgisinput_part = dgisinput.loc[in_pcsm(dgisinput, ["CaseNo", "CollateralNo"])].copy()
+lvr_out_part = lvr_out.loc[in_pcsm(lvr_out, PCSM_KEY)].copy()
+ctbc_inside_out_part = ctbc_inside_out.loc[in_pcsm(ctbc_inside_out, PCSM_KEY)].copy()
 
 # dgisinput 去重時排除 list 欄位
 dgisinput_part = dgisinput_part.drop_duplicates(
@@ -255,7 +281,12 @@ dgisinput_renamed = dgisinput_part.rename(columns=clean_colname)
 lvr_out_renamed = lvr_out_part.rename(columns=clean_colname)
 ctbc_inside_out_renamed = ctbc_inside_out_part.rename(columns=clean_colname)
 
-with pd.ExcelWriter(join(datapath, f"LOG_Collateral_{Type}.xlsx")) as writer:
-    dgisinput_renamed.to_excel(writer, sheet_name="Collateral", index=False)
-    lvr_out_renamed.to_excel(writer, sheet_name="LVR", index=False)
-    ctbc_inside_out_renamed.to_excel(writer, sheet_name="ctbc_inside", index=False)
+collateral_log_path = write_frames(
+    {"Collateral": dgisinput_renamed, "LVR": lvr_out_renamed, "ctbc_inside": ctbc_inside_out_renamed},
+    join(datapath, f"LOG_Collateral_{Type}"),
+    fmt=OUTPUT_FORMAT,
+)
+
+if OUTPUT_FORMAT != "excel" and EXPORT_EXCEL:
+    for log_path in (pcsm_log_path, collateral_log_path):
+        export_excel(log_path)
@@ -20,6 +20,9 @@ from typing import Dict, Tuple, Optional
 import pandas as pd
 
 from wagebound.config.config import checkinterval, colname, maxlength
+from wagebound.config.config_dgis import PATH_REALPRICE_CACHE
+from wagebound.utils.realprice_loader import load_realprice
+from wagebound.utils.roc_date import roc_frame_to_str
 
 
 # ---------------------------------------------------------------------------
@@ -125,40 +128,6 @@ def build_group_table(
     return _build_diff_from_counts(c1, c2)
 
 
-def strtodate(x: object) -> Optional[str]:
-    """
-    將民國年月日（例：0820412）字串轉成「YYYY/MM/DD」格式。
-
-    規則與原始版相同：
-        - 補零成 7 碼
-        - 年份 +1911
-        - 月 / 日為 00 時補 01
-        - 無法解析時回傳 None
-    """
-    if pd.isna(x):
-        return None
-
-    s = str(x).split(".")[0]          # 去掉小數
-    s = s.replace(" ", "").replace("-", "")
-    if not (6 <= len(s) <= 7):
-        return None
-
-    s = s.zfill(7)
-    d = s[-2:]
-    m = s[-4:-2]
-    y = str(int(s[:-4]) + 1911)
-
-    if d == "00":
-        d = "01"
-    if m == "00":
-        m = "01"
-
-    dt = pd.to_datetime("-".join([y, m, d]), errors="coerce")
-    if pd.isna(dt):
-        return None
-    return dt.strftime("%Y/%m/%d")
-
-
 # ---------------------------------------------------------------------------
 # 欄位檢核（完整性 / 型態 / 長度）
 # ---------------------------------------------------------------------------
@@ -324,8 +293,10 @@ def main() -> None:
     path_building = join(path_wb, month[1].strftime("%Y%m"), "building.pkl")
 
     # 讀取本月 / 上月檔案
-    file = pd.read_csv(path, dtype=str, sep="|", encoding="utf8")
-    file_last = pd.read_csv(path_last, dtype=str, sep="|", encoding="utf8")
+    # 欄位檢核需要原始字串，typed=False 全部讀成字串
+    # 本月檔案每次執行只讀一次，不建快取；上月檔案不會再變，parquet 快取（PATH_REALPRICE_CACHE）可重複使用
+    file = load_realprice(path, typed=False)
+    file_last = load_realprice(path_last, typed=False, cache=True, cache_dir=PATH_REALPRICE_CACHE)
     file_zipcode = pd.read_excel(path_zipcode, dtype=str).rename(
         columns={"city": "DRPD_City", "town": "DRPD_District", "zip": "zip_check"}
     )
@@ -426,9 +397,9 @@ def main() -> None:
 
     # 不動產買賣欄位改名 + 日期轉換
     file_ttl = file_ttl.rename(columns=colname["不動產買賣"])
-    file_ttl[["Trading_Date", "Completion_Date"]] = file_ttl[
-        ["Trading_Date", "Completion_Date"]
-    ].applymap(strtodate)
+    file_ttl[["Trading_Date", "Completion_Date"]] = roc_frame_to_str(
+        file_ttl[["Trading_Date", "Completion_Date"]]
+    )
 
     # 輸出 csv 供 DGIS / 上傳使用
     file_ttl.to_csv(join(path_wb, month[1].strftime("%Y%m"), file_name_old),
@@ -446,8 +417,9 @@ def main() -> None:
     path_upload_last = join(path_wb, month[0].strftime("%Y%m"), r"上傳DGIS", file_name_old)
     path_upload = join(path_wb, month[1].strftime("%Y%m"), r"上傳DGIS", file_name_old)
 
-    file_upload_last = pd.read_csv(path_upload_last, dtype=str, sep="|", encoding="utf8")
-    file_upload = pd.read_csv(path_upload, dtype=str, sep="|", encoding="utf8")
+    # 快取不可寫進「上傳DGIS」資料夾，統一放在 PATH_REALPRICE_CACHE；本月上傳檔只讀一次，不建快取
+    file_upload_last = load_realprice(path_upload_last, typed=False, cache=True, cache_dir=PATH_REALPRICE_CACHE)
+    file_upload = load_realprice(path_upload, typed=False)
 
     has_nan_last, is_float_last = profile_upload_file(file_upload_last)
     has_nan_curr, is_float_curr = profile_upload_file(file_upload)